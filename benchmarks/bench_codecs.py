@@ -0,0 +1,95 @@
+""" Compare the codecs of src.file_handler on synthetic lists
+
+Writes and reads a list of every size with every codec, the way JsonStorage
+does (tasks are read into src.task_record.Task), and prints the best time
+of a few runs and the size of the file.
+
+    python -m benchmarks.bench_codecs
+    python -m benchmarks.bench_codecs --sizes 1000,200000 --repeat 5
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from pathlib import Path
+from src import file_handler
+from src.file_handler import JsonFile, atomic_write_bytes
+from src.task_record import task_from_json_object, encode_task
+from src.constants import CATEGORIES
+
+
+def make_list(size: int) -> dict:
+    data = {'id_count': size, 'todo': {}, 'active': {}, 'done': {}}
+    for number in range(1, size + 1):
+        done = number % 3 == 0
+        data[CATEGORIES[number % 3]][str(number)] = {
+            'issue': f'ABC-{number}' if number % 5 == 0 else None,
+            'title': f'Task number {number}',
+            'description': f'Synthetic description of task {number}, with a few more words in it',
+            'priority': ('low', 'medium', 'high', 'critical')[number % 4],
+            'size': ('small', 'medium', 'large')[number % 3],
+            'create_date': f'2026-{number % 12 + 1:02}-{number % 28 + 1:02}',
+            'done_date': '2026-10-01' if done else None,
+            'is_done': 'yes' if done else 'no',
+        }
+    return data
+
+
+def best_of(repeat: int, function) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def variants() -> dict:
+    """ {name: (codec, orjson allowed)}, 'json (indent=4)' is the format of earlier versions """
+    return {
+        'json (indent=4)': (None, False),
+        'json': ('json', False),
+        'json + orjson': ('json', True),
+        'msgpack': ('msgpack', True),
+    }
+
+
+def run(sizes: list, repeat: int) -> list:
+    results = []
+    orjson = file_handler.get_optional_module('orjson')
+    msgpack = file_handler.get_optional_module('msgpack')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'list.json'
+        for size in sizes:
+            data = make_list(size)
+            for name, (codec, use_orjson) in variants().items():
+                if (use_orjson and codec == 'json' and orjson is None) or (codec == 'msgpack' and msgpack is None):
+                    continue
+                file_handler._optional_modules['orjson'] = orjson if use_orjson else None
+                if codec is None:
+                    write = lambda: atomic_write_bytes(path, json.dumps(data, indent=4).encode('utf-8'))
+                else:
+                    write = lambda: JsonFile.write(path, data, default=encode_task, codec=codec)
+                write_time = best_of(repeat, write)
+                read_time = best_of(repeat, lambda: JsonFile.read(path, object_hook=task_from_json_object))
+                results.append({'tasks': size, 'codec': name, 'write': write_time, 'read': read_time,
+                                'bytes': path.stat().st_size})
+            file_handler._optional_modules['orjson'] = orjson
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma separated numbers of tasks')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every measurement, the best one is shown')
+    arguments = parser.parse_args()
+    sizes = [int(size) for size in arguments.sizes.split(',')]
+    print(f'{"tasks":>8}  {"codec":<16}{"write ms":>10}{"read ms":>10}{"size kB":>10}')
+    for result in run(sizes, arguments.repeat):
+        print(f'{result["tasks"]:>8}  {result["codec"]:<16}{result["write"] * 1000:>10.1f}'
+              f'{result["read"] * 1000:>10.1f}{result["bytes"] / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+""" Time every command of check on synthetic lists of growing size
+
+Every size gets a list with that many tasks in a temporary data directory,
+then add, start, done, change, move, delete, list and search are run on it
+end to end through the click group (what a user runs) and through the
+Create/Read/Update/Delete classes (without click). Every run starts a new
+Session, so the list is read and written like by a new check process. The
+best time of a few runs is kept, and one more run is made with tracemalloc
+for the memory high-water mark of Python objects (memory that SQLite takes
+itself is not counted).
+
+list and search show one page (PAGE tasks) so the numbers show how the
+cost of reading the list grows and not the cost of writing to the terminal.
+start, done and move use --only-check, Jira is not part of the benchmark,
+and archiving is turned off so the size of the list stays the same.
+
+    python -m benchmarks.bench_commands
+    python -m benchmarks.bench_commands --sizes 1000,10000 --repeat 5 --output results.json
+    python -m benchmarks.bench_commands --baseline benchmarks/baseline.json
+
+With --baseline the results are compared to the results of an earlier run
+(saved with --output) and the command fails if an operation got slower or
+took more memory than the tolerance allows.
+
+src is only imported after HOME points to the temporary directory, its
+paths (src.constants) are computed when it is imported.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+
+
+OPERATIONS = ('add', 'start', 'done', 'change', 'move', 'delete', 'list', 'search')
+LEVELS = ('cli', 'class')
+PAGE = 100
+MIN_DIFFERENCE = 0.002  # Seconds, smaller differences are noise and never a regression
+
+
+def use_temp_appdata(home: str) -> None:
+    """ Make src put its data directory in home, before src is imported """
+    if 'src.constants' in sys.modules:
+        raise RuntimeError('src was imported before the data directory was moved, run this as its own process')
+    os.environ['HOME'] = home
+    os.environ['LOCALAPPDATA'] = home
+
+
+class IdPool:
+    """ Task IDs by category, every run of an operation takes a task that no run has changed yet """
+    def __init__(self, data: dict) -> None:
+        from src.constants import CATEGORIES
+        self.ids = {category: sorted(data[category], key=int) for category in CATEGORIES}
+
+    def take(self, category: str) -> str:
+        return self.ids[category].pop()
+
+
+def prepare(size: int, engine: str) -> IdPool:
+    """ Write a list with size tasks and make it the active list """
+    from benchmarks.bench_codecs import make_list
+    from src.file_handler import JsonFile
+    from src.setup_data import Files
+    from src.storage import create_storage, open_storage
+    from src.task_record import Task
+    from src.constants import APPDATA_DIR, DELETED_DIR, JIRA_CONFIG_PATH, SETTINGS_PATH, TODO_PATH, CATEGORIES
+
+    list_name = f'bench_{size}'
+    data = make_list(size)
+    for path in (APPDATA_DIR, TODO_PATH, DELETED_DIR):
+        Path(path).mkdir(parents=True, exist_ok=True)
+    path = create_storage(TODO_PATH, list_name, engine)
+    if engine == 'json':
+        JsonFile.write(path, data)
+    else:
+        storage = open_storage(TODO_PATH, list_name)
+        for category in CATEGORIES:
+            for task_id, task in data[category].items():
+                storage.add_task(category, task_id, Task.from_json(task))
+        storage.set_id_count(size)
+        storage.flush()
+        storage.close()
+
+    files = Files()
+    settings = files.settings_dict
+    settings['lists'] = {'active': list_name, 'inactive': []}
+    settings['archive'] = {'after_days': 0}
+    JsonFile.write(SETTINGS_PATH, settings)
+    JIRA_CONFIG_PATH.write_text(json.dumps(files.jira_config_dict))
+    files.mark_setup_complete()
+    return IdPool(data)
+
+
+def cli_operations(ids: IdPool, size: int) -> dict:
+    """ {operation: function that runs it once} through the click group """
+    from click.testing import CliRunner
+    from cli import check
+    runner = CliRunner()
+
+    def invoke(*args):
+        result = runner.invoke(check, args, catch_exceptions=False)
+        if result.exit_code != 0:
+            raise RuntimeError(f'check {" ".join(args)} failed: {result.output}')
+
+    return {
+        'add': lambda: invoke('add', '-t', 'Benchmark task', '-ds', 'Added by the benchmark'),
+        'start': lambda: invoke('start', '-i', ids.take('todo'), '--only-check'),
+        'done': lambda: invoke('done', '-i', ids.take('active'), '--only-check'),
+        'change': lambda: invoke('change', '-i', ids.take('active'), '-t', 'Changed by the benchmark'),
+        'move': lambda: invoke('move', '-i', ids.take('todo'), '-d', 'active', '--only-check'),
+        'delete': lambda: invoke('delete', '-i', ids.take('done')),
+        'list': lambda: invoke('list', '--all', '--limit', str(PAGE), '--format', 'jsonl'),
+        'search': lambda: invoke('search', '--query', str(size // 2), '--limit', str(PAGE), '--format', 'jsonl'),
+    }
+
+
+def class_operations(ids: IdPool, size: int) -> dict:
+    """ {operation: function that runs it once} with the classes of src.task and a new Session """
+    from src.session import Session
+    from src.task import Create, Read, Update, Delete
+
+    def run(function):
+        def run_once():
+            session = Session()
+            with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+                function(session)
+            session.close()
+        return run_once
+
+    return {
+        'add': run(lambda session: Create('Benchmark task', 'Added by the benchmark', 'medium', 'medium', None, session).new_task()),
+        'start': run(lambda session: Update(session).start_task(ids.take('todo'))),
+        'done': run(lambda session: Update(session).end_task(ids.take('active'))),
+        'change': run(lambda session: Update(session).change_task(ids.take('active'), title='Changed by the benchmark')),
+        'move': run(lambda session: Update(session).move_task(ids.take('todo'), 'active')),
+        'delete': run(lambda session: Delete(session).task(ids.take('done'))),
+        'list': run(lambda session: Read(session).tasks('all', limit=PAGE, file_format='jsonl')),
+        'search': run(lambda session: Read(session).search_task(str(size // 2), limit=PAGE, file_format='jsonl')),
+    }
+
+
+def measure(function, repeat: int) -> tuple:
+    """ (best time in seconds, peak of traced memory in bytes) """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run(sizes: list, repeat: int, engine: str, operations: tuple = OPERATIONS) -> list:
+    """ Measure every operation on every size at both levels
+
+    Must run in the process in which use_temp_appdata was called.
+    """
+    results = []
+    for size in sizes:
+        ids = prepare(size, engine)
+        levels = {'cli': cli_operations(ids, size), 'class': class_operations(ids, size)}
+        levels['cli']['search']()  # Builds the search index, a new list does that once
+        for operation in operations:
+            for level in LEVELS:
+                seconds, peak = measure(levels[level][operation], repeat)
+                results.append({'tasks': size, 'level': level, 'operation': operation,
+                                'seconds': seconds, 'peak_bytes': peak})
+                print(f'{size:>9}  {level:<6}{operation:<8}{seconds * 1000:>10.1f}{peak / 1024 / 1024:>10.1f}', flush=True)
+    return results
+
+
+def get_max_rss() -> int:
+    """ High-water mark of the memory of the whole process in bytes, None where it cannot be read """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """ Find the results that are worse than their baseline
+
+    :param tolerance: float
+        Allowed growth, 0.2 allows 20 % more time or memory
+    :return: list
+        (result, baseline result, 'seconds' or 'peak_bytes') of every regression
+    """
+    baseline_results = {(result['tasks'], result['level'], result['operation']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = baseline_results.get((result['tasks'], result['level'], result['operation']))
+        if before is None:
+            continue
+        if (result['seconds'] > before['seconds'] * (1 + tolerance)
+                and result['seconds'] - before['seconds'] > MIN_DIFFERENCE):
+            regressions.append((result, before, 'seconds'))
+        if result['peak_bytes'] > before['peak_bytes'] * (1 + tolerance):
+            regressions.append((result, before, 'peak_bytes'))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Comma separated numbers of tasks')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every measurement, the best one is kept')
+    parser.add_argument('--engine', choices=('json', 'sqlite'), default='json', help='How the list is stored')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='Comma separated operations to run')
+    parser.add_argument('--output', type=Path, help='Save the results as json, e.g. as the next baseline')
+    parser.add_argument('--baseline', type=Path, help='Results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed growth over the baseline, 0.2 is 20 %%')
+    arguments = parser.parse_args()
+    sizes = [int(size) for size in arguments.sizes.split(',')]
+    operations = tuple(arguments.operations.split(','))
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f'unknown operations: {", ".join(sorted(unknown))}')
+
+    with tempfile.TemporaryDirectory() as home:
+        use_temp_appdata(home)
+        print(f'{"tasks":>9}  {"level":<6}{"command":<8}{"ms":>10}{"peak MB":>10}')
+        results = run(sizes, arguments.repeat, arguments.engine, operations)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': arguments.engine,
+        'repeat': arguments.repeat,
+        'max_rss_bytes': get_max_rss(),
+        'results': results,
+    }
+    if arguments.output:
+        arguments.output.write_text(json.dumps(report, indent=4))
+    if arguments.baseline:
+        baseline = json.loads(arguments.baseline.read_text())
+        if baseline.get('engine') != arguments.engine:
+            print(f'The baseline was made with the {baseline.get("engine")} engine, not {arguments.engine}')
+        regressions = compare(results, baseline['results'], arguments.tolerance)
+        for result, before, key in regressions:
+            print(f'Regression: {result["operation"]} ({result["level"]}, {result["tasks"]} tasks) '
+                  f'{key} {before[key]:.4g} -> {result[key]:.4g}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
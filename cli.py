@@ -5,36 +5,67 @@ __author__ = "Ilari Silander"
 Using Click for the CLI arguments and commands.
 Using Rich for the console output (the visuals).
 """
+from src import tracing  # First, the time until a command starts is the import time
+
 import click
+import datetime
 import json
+import importlib.util
+import os
+import signal
+import socket
+import subprocess
+import sys
 
-from rich.console import Console
 from src.task import Create, Read, Update, Delete
 from src.setup_data import Files
 from src.configuration import Jira
 from src.settings_handler import Todo
-from src.constants import APP_VERSION, TODO_PATH
-from src.file_handler import JsonFile
-from src.view import Display
+from src.constants import APP_VERSION, TODO_PATH, SOCKET_PATH, LOCK_DIR, CATEGORIES
+from src.file_handler import JsonFile, FileLock, CODECS
 from src.validate import Priority, Size
 from src.todo import List
-# Import simple_vira if it exists
-try:
-    from simple_vira import Api
-    JIRA_PLUGIN = True
-except ImportError:
-    JIRA_PLUGIN = False
+from src.batch import Batch
+from src.jira_bulk import JiraBulk
+from src.sync import JiraSync, PREFER
+from src.outbox import Outbox
+from src.session import Session
+from src.deadlines import INDEXED_CATEGORIES, parse_days, parse_due
+from src.storage import ENGINES, create_storage, convert as convert_storage, migrate as migrate_storage
+OUTPUT_FORMATS = ['table', 'plain', 'json', 'jsonl', 'csv', 'tsv']  # See src.stream_view.FORMATS
 
-console = Console()
+# simple_vira (and requests with it) is only imported by the commands that talk to Jira, see session.jira
+JIRA_PLUGIN = importlib.util.find_spec('simple_vira') is not None
 
 
 @click.group()
 @click.version_option(version=APP_VERSION, prog_name='check')
-def check():
+@click.option('--profile', is_flag=True, help='Show where the time of the command went on stderr, with cProfile (see also CHECK_TRACE)')
+@click.option('--profile-output', type=click.Path(dir_okay=False), default=None, help='Write the cProfile stats to this file for python -m pstats')
+@click.pass_context
+def check(ctx, profile: bool, profile_output: str):
+    if tracing.start(profile, profile_output):
+        ctx.call_on_close(tracing.finish)  # Registered first, so it runs last
+    # One session per command, the list is read at most once and written once when the command is done.
+    # 'check serve' passes in its own long lived session instead.
+    if ctx.obj is None:
+        ctx.obj = Session(autoflush=False)
+        ctx.call_on_close(flush_outbox_in_background)  # Runs after the session is closed
+        ctx.call_on_close(ctx.obj.close)
+    session = ctx.obj
+    with tracing.span('setup'):
+        ensure_setup(session)
+    ctx.with_resource(tracing.span(f'command {ctx.invoked_subcommand}'))  # Ends when the command is done, before the flush
+
+def ensure_setup(session: Session) -> None:
+    """ Create the data files that are missing, ask for a list if there is none """
     files = Files()
+    if files.is_setup_complete(session):  # Fast path, nothing to create or upgrade
+        return
     files.ensure_appdata_dir()
     files.ensure_deleted_dir()
-    files.ensure_settings_file()
+    files.ensure_settings_file(session)
+    session.flush()
     files.ensure_jira_config_file()
     if not files.ensure_todo_file():
         if click.confirm(f'There is no todo lists in {TODO_PATH}. Do you want to create a list?', default=True):
@@ -44,10 +75,13 @@ def check():
                     JsonFile.create_todo_file(TODO_PATH, list_name)
                     Todo.create_todo_list(list_name)
                     Todo.change_active_todo_list(list_name)
+                    session.reset()
                     break
                 click.echo('Invalid file name. Example valid name: games_todo.')
         else:
             raise click.UsageError('You need to create a list to use the functions of Check')
+    files.ensure_active_list(session)
+    files.mark_setup_complete()
 
 @click.group()
 def todo():
@@ -68,18 +102,55 @@ def jira():
 @click.option('-t', '--todo', 'flags', flag_value='todo', multiple=True, is_flag=True, default=[], help='List all tasks from "todo"')
 @click.option('-ac', '--active', 'flags', flag_value='active', multiple=True, is_flag=True, default=[], help='List all tasks from "active"')
 @click.option('-d', '--done', 'flags', flag_value='done', multiple=True, is_flag=True, default=[], help='List all tasks from "done"')
-def list(flags: tuple):
+@click.option('-l', '--limit', type=click.IntRange(min=1), default=None, help='Show at most this many tasks of each category')
+@click.option('-o', '--offset', type=click.IntRange(min=0), default=0, help='Skip this many tasks of each category')
+@click.option('-pg', '--page', type=click.IntRange(min=1), default=None, help='Show page number N, pages are --limit tasks long (default 20)')
+@click.option('--pager', is_flag=True, help='Show the output in a pager')
+@click.option('-f', '--format', 'file_format', type=click.Choice(OUTPUT_FORMATS), default='table', help='table (default), or plain, json, jsonl, csv or tsv written without rich while the tasks are read')
+@click.option('--include-archive', is_flag=True, help='Also show the archived done tasks')
+@click.option('--all-lists', is_flag=True, help='Show the tasks of every todo list, with the name of their list')
+@click.option('-w', '--where', default=None, help='Filter and sort, e.g. "priority>=high and created>2026-01-01 sort:priority,-created"')
+@click.option('--overdue', is_flag=True, help='Show the open tasks that are past their due date, the earliest first')
+@click.option('--due-within', default=None, help='Show the open tasks that are due from today to this many days from today, e.g. 3d or 2w')
+@click.pass_obj
+def list(session: Session, flags: tuple, limit: int, offset: int, page: int, pager: bool, file_format: str, include_archive: bool,
+         all_lists: bool, where: str, overdue: bool, due_within: str):
+    if overdue or due_within is not None:
+        if all_lists or include_archive:
+            raise click.UsageError('Options --overdue and --due-within only show the open tasks of the active list')
+        if len(flags) > 1 or 'done' in flags:
+            raise click.UsageError('Options --overdue and --due-within take at most one of --all, --todo and --active')
+        if page is not None:
+            limit = limit or 20
+            offset = offset + (page - 1) * limit
+        today = datetime.date.today()
+        categories = INDEXED_CATEGORIES if not flags or flags[0] == 'all' else flags
+        if due_within is None:
+            until, title = today - datetime.timedelta(days=1), 'OVERDUE'
+        else:
+            days = parse_days_option(due_within, '--due-within')
+            until, title = today + datetime.timedelta(days=days), f'DUE WITHIN {days} {"DAY" if days == 1 else "DAYS"}'
+            if overdue:
+                title = f'OVERDUE OR {title}'
+        read = Read(session)
+        read.due_tasks(until, None if overdue else today, categories, offset, limit, file_format, pager,
+                       parse_query(where, session), title)
+        return
     if len(flags) > 1 or len(flags) == 0:
         raise click.UsageError('Options --all, --todo, --active, and --done are mutually exclusive. Choose one.')
     else:
         flag = flags[0]
-        read = Read()
-        read.tasks(flag)
+        if page is not None:
+            limit = limit or 20
+            offset = offset + (page - 1) * limit
+        read = Read(session)
+        read.tasks(flag, offset, limit, file_format, pager, include_archive, all_lists, parse_query(where, session))
 
 @click.command(help='Delete a task')
 @click.option('-i', '--id', required=True)
-def delete(id: str):
-    delete = Delete()
+@click.pass_obj
+def delete(session: Session, id: str):
+    delete = Delete(session)
     try:
         delete.task(id)
     except Exception as e:
@@ -92,101 +163,77 @@ def delete(id: str):
 @click.option('-s', '--size', default='medium', help='Task size: small, medium, large')
 @click.option('-j', '--jira', is_flag=True, help='Send information to Jira')
 @click.option('-oj', '--only-jira', is_flag=True, help='Send only information to Jira')
-def add(title: str, description: str, priority: str, size: str, jira: bool, only_jira: bool):
+@click.option('-du', '--due', default=None, help='Due date: YYYY-MM-DD, today, tomorrow, or days from today like 3d or 2w')
+@click.pass_obj
+def add(session: Session, title: str, description: str, priority: str, size: str, jira: bool, only_jira: bool, due: str):
     issue = None
     if jira and only_jira:
         raise click.UsageError('Options --jira and --only-jira are mutually exclusive. Choose one.')
-    if not Priority.is_valid_option(priority):
+    if not Priority.is_valid_option(priority, session.settings):
         raise click.UsageError('Priority can only be low, medium, high or critical')
-    if not Size.is_valid_option(size):
+    if not Size.is_valid_option(size, session.settings):
         raise click.UsageError('Size can only be small, medium or large')
 
-    if jira or only_jira:
-        if JIRA_PLUGIN:
-            try:
-                config = Jira()
-                base_url = config.get_base_url()
-                api_token = config.get_api_token()
-                user_token = config.get_user_token()
-                project = config.get_project()
-                work_group = config.get_leading_work_group()
-                issue_type = config.get_issue_type_story()
-                feature_link = config.get_feature_link()
-                components = config.get_components()
-            except Exception as config_error:
-                click.echo(config_error)
-
-            try:
-                api = Api(base_url, api_token, user_token)
-                issue = api.create_issue(title, description, project, issue_type, work_group, feature_link, components)
-                click.echo(f'Issue added to Jira with ID: {issue}')
-                if issue == None:  # If issue was not created in Jira, then the task will not be created locally
-                    raise click.UsageError('Issue could not be created in Jira. Task will not be added to the todo list')
-            except Exception as e:
-                click.echo(e)
-        else:
-            raise click.UsageError('Jira plugin seems to not be installed. Run without jira commands')
+    if (jira or only_jira) and not JIRA_PLUGIN:
+        raise click.UsageError('Jira plugin seems to not be installed. Run without jira commands')
+    due_date = parse_due_option(due) if due is not None else None
 
+    task = None
     if not only_jira:
-        create = Create(title, description, priority, size, issue)
+        create = Create(title, description, priority, size, issue, session, due_date)
         try:
-            create.new_task()
-            read = Read()
-            latest_id = read.get_latest_task_id()
+            task_id = create.new_task()
+            session.flush()  # Another process may have added a task with the same ID, the task then gets a new one
+            latest_id = session.new_id(task_id)
+            task = [session.active_list_name, latest_id]
             click.echo(f'Task with ID: {latest_id} added to the todo list')
         except Exception as e:
             click.echo(e)
+            return
+
+    if jira or only_jira:
+        try:
+            config = Jira()
+            create_args = [title, description, config.get_project(), config.get_issue_type_story(),
+                           config.get_leading_work_group(), config.get_feature_link(), config.get_components()]
+        except Exception as config_error:
+            raise click.UsageError(f'Could not read the Jira configuration: {config_error}')
+        # The issue is created by the next flush of the outbox, which also adds it to the task
+        Outbox().add('create_issue', create_args, task=task, key=['create'] + task if task else None)
+        click.get_current_context().meta['jira_queued'] = True
+        click.echo('Issue queued to be added to Jira')
 
 @click.command(help='Start a task, moving the task to active')
 @click.option('-i', '--id', required=True, help='The ID of the task that will be moved to active')
 @click.option('-oc', '--only-check', is_flag=True, help='Only move the task to active in check, not in Jira')
-def start(id: str, only_check: bool):
+@click.pass_obj
+def start(session: Session, id: str, only_check: bool):
     # JIRA SECTION
-    issue = List.get_issue_from_task(id)
-    if not issue is None and not only_check:
+    if not only_check and has_jira_issue(session, id):
         config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
         assignee = config.get_assignee()
-        api = Api(base_url, api_token, user_token)
-        assigned = api.assign_issue(issue, assignee['name'])
-        if not assigned:
-            raise click.UsageError('Could not assign the issue to the assignee')
-        click.echo(f'Issue assigned to {assignee["name"]}')
-
-        in_progress = config.get_transition_in_progress()
-        transitioned = api.transition_issue(issue, in_progress)
-        if not transitioned:
-            raise click.UsageError('Could not transition the issue to "In Progress"')
-        click.echo('Issue transitioned to "In Progress"')
-    elif issue is None:
+        queue_jira_call(session, id, 'assign', 'assign_issue', assignee['name'])
+        queue_jira_call(session, id, 'status', 'transition_issue', config.get_transition_in_progress())
+        click.echo(f'Issue queued to be assigned to {assignee["name"]} and transitioned to "In Progress"')
+    elif not has_jira_issue(session, id):
         click.echo('No Jira issue found for this task')
     # CHECK SECTION
-    update = Update()
+    update = Update(session)
     update.start_task(id)
 
 @click.command(help='Move a task to done')
 @click.option('-i', '--id', required=True, help='The ID of the task that will be moved to done')
 @click.option('-c', '--comment', default='Done', help='Comment for the task')
 @click.option('-oc', '--only-check', is_flag=True, help='Only move the task to done in check, not in Jira')
-def done(id: str, comment: str, only_check: bool):
-    issue = List.get_issue_from_task(id)
-    if not issue == None and not only_check:
+@click.pass_obj
+def done(session: Session, id: str, comment: str, only_check: bool):
+    if not only_check and has_jira_issue(session, id):
         config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
-        api = Api(base_url, api_token, user_token)
-
-        done = config.get_transition_done()
-        moved_to_done = api.move_issue_to_done(issue, done, comment)
-        if not moved_to_done:
-            raise click.UsageError('Could not transition the Jira issue to "Done"')
-        click.echo('Jira issue moved to done')
-    elif issue == None:
+        queue_jira_call(session, id, 'status', 'move_issue_to_done', config.get_transition_done(), comment)
+        click.echo('Jira issue queued to be moved to done')
+    elif not has_jira_issue(session, id):
         click.echo('No Jira issue found for this task')
-    update = Update()
+    update = Update(session)
     update.end_task(id)
 
 @click.command(help='Change the contents of a task')
@@ -195,22 +242,40 @@ def done(id: str, comment: str, only_check: bool):
 @click.option('-ds', '--description', default=None, help='Description of the task')
 @click.option('-p', '--priority', default=None, help='Task priority: low, medium, high, critical')
 @click.option('-s', '--size', default=None, help='Task size: small, medium, large')
-def change(id: str, title: str, description: str, priority: str, size: str):
-    update = Update()
+@click.option('-du', '--due', default=None, help='Due date: YYYY-MM-DD, today, tomorrow, days from today like 3d, or none to remove it')
+@click.pass_obj
+def change(session: Session, id: str, title: str, description: str, priority: str, size: str, due: str):
+    update = Update(session)
     filtered_options = filter_options(
         title=title,
         description=description,
         priority=priority,
         size=size
     )
+    if due is not None:
+        due_date = parse_due_option(due)
+        filtered_options['due_date'] = due_date.isoformat() if due_date else None
     if not filtered_options:
         raise click.UsageError('No options were given to change')
-    if 'priority' in filtered_options and not Priority.is_valid_option(priority):
+    if 'priority' in filtered_options and not Priority.is_valid_option(priority, session.settings):
         raise click.UsageError('Priority can only be low, medium, high or critical')
-    if 'size' in filtered_options and not Size.is_valid_option(size):
+    if 'size' in filtered_options and not Size.is_valid_option(size, session.settings):
         raise click.UsageError('Size can only be small, medium or large')
     update.change_task(id, **filtered_options)
 
+def parse_due_option(due: str):
+    """ Parse the --due option of add and change, see src.deadlines """
+    try:
+        return parse_due(due)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--due')
+
+def parse_days_option(days: str, option: str) -> int:
+    try:
+        return parse_days(days)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint=option)
+
 def filter_options(**kwargs) -> dict:
     filtered_kwargs = {}
     for key, value in kwargs.items():
@@ -222,48 +287,68 @@ def filter_options(**kwargs) -> dict:
 @click.option('-i', '--id', required=True, help='The ID of the task')
 @click.option('-d', '--destination', required=True, help='The destination where the task will be moved to')
 @click.option('-oc', '--only-check', is_flag=True, help='Only move the task in check, not in Jira')
-def move(id, destination, only_check: bool):
+@click.pass_obj
+def move(session: Session, id, destination, only_check: bool):
     if not is_valid_option(destination):
         raise click.UsageError('Option --destination can only take "todo", "active" or "done"')
 
-    issue = List.get_issue_from_task(id)
-    if not issue is None and not only_check:
+    if not only_check and has_jira_issue(session, id):
         config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
-        api = Api(base_url, api_token, user_token)
 
         # Move the issue to todo
         if destination == 'todo':
-            todo = config.get_transition_todo()
-            transitioned = api.transition_issue(issue, todo)
-            if not transitioned:
-                raise click.UsageError('Could not transition the issue to "To Do"')
-            click.echo('Issue transitioned to "To Do"')
+            queue_jira_call(session, id, 'status', 'transition_issue', config.get_transition_todo())
+            click.echo('Issue queued to be transitioned to "To Do"')
 
         # Move the issue to in progress
         elif destination == 'active':
-            in_progress = config.get_transition_in_progress()
-            transitioned = api.transition_issue(issue, in_progress)
-            if not transitioned:
-                raise click.UsageError('Could not transition the issue to "In Progress"')
-            click.echo('Issue transitioned to "In Progress"')
+            queue_jira_call(session, id, 'status', 'transition_issue', config.get_transition_in_progress())
+            click.echo('Issue queued to be transitioned to "In Progress"')
 
         # Move the issue to done
         elif destination == 'done':
-            done = config.get_transition_done()
-            moved_to_done = api.move_issue_to_done(issue, done)
-            if not moved_to_done:
-                raise click.UsageError('Could not transition the Jira issue to "Done"')
-            click.echo('Jira issue moved to done')
+            queue_jira_call(session, id, 'status', 'move_issue_to_done', config.get_transition_done())
+            click.echo('Jira issue queued to be moved to done')
 
-    update = Update()
+    update = Update(session)
     if destination == 'done':
         update.end_task(id)
     else:
         update.move_task(id, destination)
 
+def has_jira_issue(session: Session, id: str) -> bool:
+    """ Check if a task has a Jira issue, or if its issue is waiting in the outbox to be created """
+    if List.get_issue_from_task(id, session) is not None:
+        return True
+    return Outbox().has_pending_create([session.active_list_name, str(id)])
+
+def queue_jira_call(session: Session, id: str, kind: str, method: str, *args) -> None:
+    """ Add a Jira call for the issue of a task to the outbox, see src.outbox
+
+    :param kind: str
+        "status" or "assign", a queued call of the same kind for the task is replaced
+    """
+    outbox = Outbox()
+    task = [session.active_list_name, str(id)]
+    issue = List.get_issue_from_task(id, session) or outbox.created_issue(task)
+    outbox.add(method, args, issue=issue, task=task, key=[kind] + task)
+    click.get_current_context().meta['jira_queued'] = True
+
+def flush_outbox_in_background() -> None:
+    """ Start 'check jira flush' in its own process if the command queued Jira calls
+
+    The command does not wait for Jira, and the flush keeps running after it.
+    """
+    if not click.get_current_context().meta.get('jira_queued'):
+        return
+    arguments = [sys.executable, os.path.abspath(__file__), 'jira', 'flush', '--quiet']
+    options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    subprocess.Popen(arguments, **options)
+
 def is_valid_option(option):
     valid_options = ['todo', 'active', 'done']
     if option in valid_options:
@@ -276,15 +361,92 @@ def is_valid_option(option):
 @click.option('-p', '--priority', default=None, help='Task priority: low, medium, high, critical')
 @click.option('-s', '--size', default=None, help='Task size: small, medium, large')
 @click.option('-d', '--is-done', default=None, help='Is task done? "yes" or "no"')
-def search(title, description, priority, size, is_done):
+@click.option('-q', '--query', default=None, help='Words to find in the title, description or issue, best matches first')
+@click.option('-l', '--limit', type=click.IntRange(min=1), default=None, help='Show at most this many tasks')
+@click.option('-f', '--format', 'file_format', type=click.Choice(OUTPUT_FORMATS), default='table', help='table (default), or plain, json, jsonl, csv or tsv written without rich')
+@click.option('--include-archive', is_flag=True, help='Also search the archived done tasks, they are shown last')
+@click.option('--all-lists', is_flag=True, help='Search every todo list, the active list first')
+@click.option('-w', '--where', default=None, help='Filter and sort the results, e.g. "size<=medium sort:-priority"')
+@click.pass_obj
+def search(session: Session, title, description, priority, size, is_done, query, limit, file_format, include_archive, all_lists, where):
     filtered_options = filter_options(
         title=title,
         description=description,
         priority=priority,
         size=size,
         is_done=is_done)
-    read = Read()
-    read.search_task(**filtered_options)
+    read = Read(session)
+    read.search_task(query, limit, file_format, include_archive, all_lists, parse_query(where, session), **filtered_options)
+
+def parse_query(where: str, session: Session):
+    """ Parse the --where option of list and search, see src.query """
+    if where is None:
+        return None
+    from src.query import Query
+    try:
+        return Query(where, session.settings)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--where')
+
+@click.command(help='Undo the last COUNT changes to the active list (add, start, done, change, move and delete), 1 by default')
+@click.argument('count', type=click.IntRange(min=1), default=1)
+@click.pass_obj
+def undo(session: Session, count: int):
+    Update(session).undo(count)
+
+@click.command(help='Make the last COUNT changes that were undone again, 1 by default')
+@click.argument('count', type=click.IntRange(min=1), default=1)
+@click.pass_obj
+def redo(session: Session, count: int):
+    Update(session).redo(count)
+
+@click.command(help='Show how many tasks are overdue or due soon, nothing if none are. Fast enough for a shell prompt')
+@click.option('-w', '--within', default='1d', help='Also count the tasks that are due this many days from today, e.g. 3d or 2w (default 1d)')
+@click.pass_obj
+def due(session: Session, within: str):
+    days = parse_days_option(within, '--within')
+    overdue, due_soon = Read(session).due_counts(days)
+    warnings = []
+    if overdue:
+        warnings.append(f'{overdue} {"task is" if overdue == 1 else "tasks are"} overdue')
+    if due_soon:
+        warnings.append(f'{due_soon} {"task is" if due_soon == 1 else "tasks are"} due within {days} {"day" if days == 1 else "days"}')
+    if warnings:
+        click.echo(', '.join(warnings))
+
+@click.command(help='Apply many operations (add, start, done, change, move, delete) from a file in one go')
+@click.option('-f', '--file', 'operations_file', type=click.File('r', encoding='utf-8'), default='-', help='File with one operation per line, - for stdin')
+@click.option('-fo', '--format', 'file_format', type=click.Choice(['jsonl', 'csv']), default='jsonl', help='jsonl: one json object per line, csv: header row with the field names')
+@click.option('-v', '--verbose', is_flag=True, help='Show the message of every operation')
+@click.pass_obj
+def batch(session: Session, operations_file, file_format: str, verbose: bool):
+    """ Every operation has an "op" field and the same fields as the command with that name,
+    e.g. {"op": "add", "title": "...", "description": "..."} or {"op": "move", "id": "3", "destination": "todo"}.
+    Nothing is applied if any operation is invalid. Jira is not updated.
+    """
+    batch = Batch(session)
+    try:
+        operations = batch.read_operations(operations_file, file_format)
+    except ValueError as e:
+        raise click.UsageError(f'Could not read the operations: {e}')
+    errors = batch.validate(operations)
+    if errors:
+        raise click.UsageError('\n'.join(errors))
+    applied = batch.apply(operations, verbose)
+    click.echo(f'Applied {applied} operations')
+
+@click.command(help='Keep the active list in memory and answer commands from check-client over a socket')
+def serve():
+    if not hasattr(socket, 'AF_UNIX'):
+        raise click.UsageError('check serve needs Unix domain sockets, which this platform does not have')
+    from src.server import Server
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # Clean up the socket when the server is killed
+    with Server(SOCKET_PATH, check) as server:
+        click.echo(f'Serving check on {SOCKET_PATH}, stop with Ctrl+C')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
 # Todo commands
 @click.command()
@@ -304,13 +466,14 @@ def use(name: str):
 @click.command()
 @click.option('-n', '--name', required=True, help='Name of the new todo list. Eg. friday_chores')
 @click.option('-u', '--use', is_flag=True, help='Use the new todo list that is created')
-def new(name: str, use: bool):
+@click.option('-st', '--storage', type=click.Choice(sorted(ENGINES)), default='json', help='How the list is stored: json or sqlite')
+def new(name: str, use: bool, storage: str):
     """ Create a new todo list """
     todo = Todo()
     if not todo.is_valid_list_name(name):
         raise click.UsageError(f'{name} is not a valid name. Please use this format: file_name')
     if not todo.list_exists(name):
-        JsonFile.create_todo_file(TODO_PATH, name)
+        create_storage(TODO_PATH, name, storage)
         todo.create_todo_list(name)
     if use:
         todo.change_active_todo_list(name)
@@ -330,123 +493,212 @@ def remove(name: str):
         click.echo(f'Todo list named "{name}" has been removed, or rather moved to the data/lists/deleted directory')
 
 @click.command()
-def show():
+@click.option('-n', '--name', required=True, help='Name of the list to migrate')
+@click.option('-st', '--storage', type=click.Choice(sorted(ENGINES)), default='sqlite', help='Storage to migrate the list to')
+@click.pass_obj
+def migrate(session: Session, name: str, storage: str):
+    """ Move a todo list to another storage, e.g. import a json list into SQLite """
+    todo = Todo()
+    if not todo.list_exists(name):
+        raise click.UsageError(f'There is no list named {name}')
+    session.reset()
+    try:
+        with FileLock(LOCK_DIR / f'{name}.lock'):  # No other check process writes the list while it is copied
+            new_path = migrate_storage(TODO_PATH, name, storage)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f'Todo list named "{name}" is now stored in {new_path}, the old file was moved to the data/deleted directory')
+
+@click.command()
+@click.option('-n', '--name', required=True, help='Name of the list to convert')
+@click.option('-c', '--codec', type=click.Choice(sorted(CODECS)), default='msgpack', help='Codec to write the list with')
+@click.pass_obj
+def convert(session: Session, name: str, codec: str):
+    """ Write a json list with another codec, e.g. the smaller and faster msgpack """
+    todo = Todo()
+    if not todo.list_exists(name):
+        raise click.UsageError(f'There is no list named {name}')
+    session.reset()
+    try:
+        with FileLock(LOCK_DIR / f'{name}.lock'):
+            path = convert_storage(TODO_PATH, name, codec)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f'Todo list named "{name}" in {path} is now written as {codec}')
+
+@click.command()
+@click.pass_obj
+def show(session: Session):
     """ Display todo lists """
-    display = Display()
+    from src.view import Display
+    display = Display(session)
     display.todo_lists()
 
 # Jira commands
 @click.command()
 @click.option('-i', '--id', required=True, help='The ID of the task')
-def assign(id: str):
+@click.pass_obj
+def assign(session: Session, id: str):
     """ Assign a Jira issue to the assignee """
     if JIRA_PLUGIN:
-        issue = List.get_issue_from_task(id)
-        if issue is None:
+        if not has_jira_issue(session, id):
             raise click.UsageError('No Jira issue found for this task')
         config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
-        api = Api(base_url, api_token, user_token)
 
         # Assign the issue to the assignee
         assignee = config.get_assignee()
-        assigned = api.assign_issue(issue, assignee['name'])
-        if not assigned:
-            raise click.UsageError('Could not assign the issue to the assignee')
-        click.echo(f'Issue assigned to {assignee["name"]}')
+        queue_jira_call(session, id, 'assign', 'assign_issue', assignee['name'])
+        click.echo(f'Issue queued to be assigned to {assignee["name"]}')
     else:
         click.echo('Jira plugin cannot be found')
 
 @click.command()
 @click.option('-i', '--id', required=True, help='The ID of the task')
-def unassign(id: str):
+@click.pass_obj
+def unassign(session: Session, id: str):
     """ Unassign a Jira issue """
     if JIRA_PLUGIN:
-        issue = List.get_issue_from_task(id)
-        if issue is None:
+        if not has_jira_issue(session, id):
             raise click.UsageError('No Jira issue found for this task')
-        config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
-        api = Api(base_url, api_token, user_token)
-
         # Unassign the issue
         assignee = None
-        assigned = api.assign_issue(issue, assignee)
-        if not assigned:
-            raise click.UsageError('Could not unassign the issue')
-        click.echo('Issue unassigned')
+        queue_jira_call(session, id, 'assign', 'assign_issue', assignee)
+        click.echo('Issue queued to be unassigned')
     else:
         click.echo('Jira plugin cannot be found')
 
 @click.command()
-@click.option('-i', '--id', required=True, help='The ID of the task')
-def export(id: str):
-    """ Export a task to Jira """
-    config = Jira()
-    base_url = config.get_base_url()
-    api_token = config.get_api_token()
-    user_token = config.get_user_token()
-    project = config.get_project()
-    work_group = config.get_leading_work_group()
-    issue_type = config.get_issue_type_story()
-    feature_link = config.get_feature_link()
-    components = config.get_components()
-    api = Api(base_url, api_token, user_token)
-
-    # Get task title and description
-    read = Read()
-    title = read.get_task_title(id)
-    description = read.get_task_description(id)
-    status = read.get_task_status(id)
-    if title is None or description is None:
-        raise click.UsageError('Could not find the task to export')
-
-    # Export the issue to Jira
-    issue = api.create_issue(title, description, project, issue_type, work_group, feature_link, components)
-    if not issue:
-        raise click.UsageError('Could not export the issue to Jira')
-
-    update = Update()
-    update.change_task(id, issue=issue)  # Add the Jira issue to the task
-    click.echo(f'Issue exported to Jira with ID: {issue}')
-
-    if status == 'active':
-        in_progress = config.get_transition_in_progress()
-        transitioned = api.transition_issue(issue, in_progress)
-        if not transitioned:
-            raise click.UsageError('Could not transition the issue to "In Progress"')
+@click.option('-i', '--id', default=None, help='The ID of the task')
+@click.option('--ids', default=None, help='Comma separated IDs of the tasks')
+@click.option('-c', '--category', type=click.Choice(CATEGORIES), default=None, help='Export every task in todo, active or done')
+@click.option('-a', '--all', 'export_all', is_flag=True, help='Export every task in the list')
+@click.pass_obj
+def export(session: Session, id: str, ids: str, category: str, export_all: bool):
+    """ Export tasks to Jira """
+    if not JIRA_PLUGIN:
+        raise click.UsageError('Jira plugin cannot be found')
+    if len([option for option in (id, ids, category, export_all) if option]) != 1:
+        raise click.UsageError('Choose one of --id, --ids, --category or --all')
+    if id:
+        task_ids = [id]
+    elif ids:
+        task_ids = split_ids(ids)
+    else:
+        categories = CATEGORIES if export_all else (category,)
+        task_ids = [task_id for task_category, task_id, _ in session.storage.all_tasks() if task_category in categories]
 
-@click.command()
-@click.option('-i', '--issue', required=True, help='The Jira issue ID')
-def load(issue: str):
-    """ Load a Jira issue into a task """
-    if JIRA_PLUGIN:
-        config = Jira()
-        base_url = config.get_base_url()
-        api_token = config.get_api_token()
-        user_token = config.get_user_token()
-        api = Api(base_url, api_token, user_token)
-
-        issue_dict = api.get_complete_issue_data(issue)
-        if issue_dict is None:
-            raise click.UsageError('Could not load the issue from Jira')
-        title = api.get_issue_title(issue_dict)
-        description = api.get_issue_description(issue_dict)
-        create = Create(title, description, 'medium', 'medium', issue)
+    bulk = JiraBulk(session)
+    exported, skipped, failures = run_bulk(bulk.export_tasks, task_ids, 'Exporting tasks to Jira')
+    for task_id, issue in exported.items():
+        click.echo(f'Task with ID: {task_id} exported to Jira with ID: {issue}')
+    for task_id, issue in skipped.items():
+        click.echo(f'Task with ID: {task_id} skipped, already exported to Jira with ID: {issue}')
+    report_failures(failures, len(task_ids), 'Task with ID:', 'tasks could not be exported')
 
-        try:
-            create.new_task()
-            read = Read()
-            latest_id = read.get_latest_task_id()
-            click.echo(f'Task with ID: {latest_id} added to the todo list')
-        except Exception as e:
-            click.echo(e)
+@click.command()
+@click.option('-i', '--issue', default=None, help='The Jira issue ID')
+@click.option('--issues', default=None, help='Comma separated Jira issue IDs')
+@click.option('--jql', default=None, help='Load every issue that a JQL query finds')
+@click.pass_obj
+def load(session: Session, issue: str, issues: str, jql: str):
+    """ Load Jira issues into tasks """
+    if not JIRA_PLUGIN:
+        raise click.UsageError('Jira plugin cannot be found')
+    if len([option for option in (issue, issues, jql) if option]) != 1:
+        raise click.UsageError('Choose one of --issue, --issues or --jql')
+
+    bulk = JiraBulk(session)
+    if issue:
+        issue_keys = [issue]
+    elif issues:
+        issue_keys = split_ids(issues)
     else:
-        click.echo('Jira plugin cannot be found')
+        if not session.jira.supports('search_issues'):
+            raise click.UsageError('The installed Jira plugin cannot search with JQL, use --issues instead')
+        issue_keys = bulk.search(jql)
+        if issue_keys is None:
+            raise click.UsageError('Could not search Jira')
+
+    loaded, skipped, failures = run_bulk(bulk.load_issues, issue_keys, 'Loading issues from Jira')
+    for issue_key, task_id in loaded.items():
+        click.echo(f'Task with ID: {task_id} added to the todo list from {issue_key}')
+    for issue_key, task_id in skipped.items():
+        click.echo(f'Issue {issue_key} skipped, already in the todo list as task with ID: {task_id}')
+    report_failures(failures, len(issue_keys), 'Issue', 'issues could not be loaded')
+
+@click.command(help='Send the Jira calls that are waiting in the outbox')
+@click.option('-q', '--quiet', is_flag=True, help='Do not show anything (used when check flushes in the background)')
+@click.pass_obj
+def flush(session: Session, quiet: bool):
+    """ Send the queued Jira calls, see src.outbox """
+    if not JIRA_PLUGIN:
+        raise click.UsageError('Jira plugin cannot be found')
+    outbox = Outbox()
+    if outbox.is_empty():
+        if not quiet:
+            click.echo('Nothing to send to Jira')
+        return
+    result = outbox.flush(session.jira)
+    if result is None:
+        if not quiet:
+            click.echo('The outbox is already being sent by another check process')
+        return
+    sent, left = result
+    created = outbox.set_issues(session.settings)
+    if quiet:
+        return
+    click.echo(f'Sent {sent} calls to Jira')
+    for list_name, task_id, issue in created:
+        click.echo(f'Task with ID: {task_id} in {list_name} added to Jira with ID: {issue}')
+    for entry in left:
+        click.echo(f'Call {entry["number"]} ({entry["method"]}) is left after {entry["attempts"]} tries: {entry["error"]}', err=True)
+    if left:
+        raise click.ClickException(f'{len(left)} calls are left in the outbox')
+
+@click.command(help='Sync the tasks that have a Jira issue with their issues, in both directions')
+@click.option('--prefer', type=click.Choice(PREFER), default='jira', show_default=True,
+              help='Which side wins when a field was changed both in check and in Jira')
+@click.pass_obj
+def sync(session: Session, prefer: str):
+    """ Sync the active list with Jira, see src.sync """
+    if not JIRA_PLUGIN:
+        raise click.UsageError('Jira plugin cannot be found')
+    outbox = Outbox()
+    if not outbox.is_empty() and outbox.flush(session.jira) is not None:  # Queued changes go first
+        outbox.set_issues(session.settings)
+    try:
+        result = JiraSync(session, prefer=prefer, outbox=outbox).run()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if result is None:
+        click.echo('The list is already being synced by another check process')
+        return
+    pulled, pushed, conflicts, failures = result
+    for task_id, fields in pulled.items():
+        click.echo(f'Task with ID: {task_id} took {", ".join(fields)} from Jira')
+    for task_id, fields in pushed.items():
+        click.echo(f'Task with ID: {task_id} sent {", ".join(fields)} to Jira')
+    for task_id, fields in conflicts.items():
+        click.echo(f'Task with ID: {task_id} was changed in check and in Jira, kept the {prefer} {", ".join(fields)}')
+    if not pulled and not pushed and not failures:
+        click.echo('Everything is in sync with Jira')
+    report_failures(failures, len(set(pulled) | set(pushed) | set(failures)), 'Task with ID:', 'tasks could not be synced')
+
+def split_ids(ids: str) -> list:
+    return [task_id.strip() for task_id in ids.split(',') if task_id.strip()]
+
+def run_bulk(function, items: list, label: str) -> tuple:
+    """ Run a JiraBulk function, with a progress bar when there is more than one item """
+    if len(items) <= 1:
+        return function(items)
+    with click.progressbar(length=len(items), label=label, file=sys.stderr) as progress_bar:
+        return function(items, progress_bar.update)
+
+def report_failures(failures: dict, total: int, prefix: str, message: str) -> None:
+    for key, reason in failures.items():
+        click.echo(f'{prefix} {key}: {reason}', err=True)
+    if failures:
+        raise click.ClickException(f'{len(failures)} of {total} {message}')
 
 
 
@@ -459,6 +711,11 @@ check.add_command(change)
 check.add_command(move)
 check.add_command(delete)
 check.add_command(done)
+check.add_command(due)
+check.add_command(undo)
+check.add_command(redo)
+check.add_command(batch)
+check.add_command(serve)
 check.add_command(todo)
 check.add_command(jira)
 
@@ -467,12 +724,16 @@ todo.add_command(new)
 todo.add_command(use)
 todo.add_command(show)
 todo.add_command(remove)
+todo.add_command(migrate)
+todo.add_command(convert)
 
 # Sub-commands for 'jira'
 jira.add_command(assign)
 jira.add_command(unassign)
 jira.add_command(export)
 jira.add_command(load)
+jira.add_command(flush)
+jira.add_command(sync)
 
 
 if __name__ == '__main__':
@@ -14,6 +14,7 @@ setup(
     entry_points={
         'console_scripts': [
             'check=cli:check',
+            'check-client=src.client:main',
         ],
     },
 )
\ No newline at end of file
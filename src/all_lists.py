@@ -0,0 +1,155 @@
+""" Read every todo list, not only the active one
+
+Used by 'check list --all-lists' and 'check search --all-lists'. The lists
+that are not active are opened in a thread pool (LIST_WORKERS at a time),
+every list is read and closed in the thread that opened it, and the results
+are merged in the order of the lists in the settings, the active list first.
+
+The number of tasks in each category of every list is kept in a summary
+file (LISTS_SUMMARY_PATH) with the modification time and size of the files
+of the list. A list whose files have not changed since is not opened when it
+has no tasks in the part of the categories that is shown.
+"""
+import concurrent.futures
+import threading
+
+from pathlib import Path
+from src.archive import Archive
+from src.file_handler import JsonFile
+from src.search_index import SearchIndex
+from src.storage import open_storage, get_stamps
+from src import tracing
+from src.constants import TODO_PATH, CATEGORIES, LISTS_SUMMARY_PATH, LIST_WORKERS
+
+
+def get_list_names(settings: dict) -> list:
+    """ The names of every list, the active list first """
+    lists = settings['lists']
+    return [lists['active']] + [name for name in lists['inactive'] if name != lists['active']]
+
+
+class ListSummaries:
+    """ Cached number of tasks per category of every list
+
+    :param path: Path
+        The summary file, {list name: {'stamps': [...], 'counts': {...}}}
+    """
+    def __init__(self, path: Path = None) -> None:
+        self.path = Path(path or LISTS_SUMMARY_PATH)
+        self._summaries = None
+        self._changed = False
+        self._lock = threading.Lock()
+
+    @property
+    def summaries(self) -> dict:
+        if self._summaries is None:
+            try:
+                self._summaries = JsonFile.read(self.path)
+            except (FileNotFoundError, ValueError):  # Missing or half written by an older version, it is rebuilt
+                self._summaries = {}
+        return self._summaries
+
+    def get(self, list_name: str, storage) -> dict:
+        """ The counts of a list if its files have not changed since they were counted, else None """
+        summary = self.summaries.get(list_name)
+        if summary is None or summary['stamps'] != get_stamps(storage):
+            return None
+        return summary['counts']
+
+    def set(self, list_name: str, stamps: list, counts: dict) -> None:
+        """ Remember the counts of a list
+
+        :param stamps: list
+            The stamps of the files of the list from before it was read
+        """
+        with self._lock:
+            self.summaries[list_name] = {'stamps': stamps, 'counts': counts}
+            self._changed = True
+
+    def save(self) -> None:
+        """ Write the summaries if they changed, nothing is lost when two processes write at once but the counts """
+        if self._changed:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            JsonFile.write(self.path, self.summaries)
+            self._changed = False
+
+
+def count_tasks(storage) -> dict:
+    """ {category: number of tasks} of a list, 'archived' is the number of tasks in its archive """
+    counts = {category: storage.count(category) for category in CATEGORIES}
+    counts['archived'] = Archive(storage.file_path).count()
+    return counts
+
+
+def get_count(counts: dict, category: str, include_archive: bool):
+    """ The number of tasks that are shown of a category, None if the counts are not known """
+    if counts is None:
+        return None
+    if include_archive and category == 'done':
+        return counts[category] + counts['archived']
+    return counts[category]
+
+
+class AllLists:
+    """ Run a function on every list and keep the results in list order
+
+    :param session: Session
+        The active list is read through the session, the other lists are opened
+        with the settings of the session
+    """
+    def __init__(self, session, summaries: ListSummaries = None) -> None:
+        self.session = session
+        self.summaries = summaries or ListSummaries()
+
+    @property
+    def names(self) -> list:
+        return get_list_names(self.session.settings)
+
+    def counts(self, list_name: str):
+        """ The cached counts of a list, None if they are not known """
+        return self.summaries.get(list_name, open_storage(TODO_PATH, list_name))
+
+    def map(self, function, list_names: list) -> list:
+        """ Call function(list_name, search_index, counts) for every list, see SearchIndex.storage for the list
+
+        The lists that are not active run in the thread pool while the active
+        list runs in this thread, its storage may already be loaded and a
+        SQLite connection can only be used by the thread that opened it.
+
+        :return: list
+            (list_name, counts, result) in the order of list_names, see count_tasks for the counts
+        """
+        active = self.session.active_list_name
+        self.summaries.summaries  # Read once, before the threads use it
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=LIST_WORKERS) as executor:
+            futures = {name: executor.submit(self._call, function, name) for name in list_names if name != active}
+            if active in list_names:
+                results[active] = self._call(function, active, self.session.search_index)
+            for name, future in futures.items():
+                results[name] = future.result()
+        self.summaries.save()
+        return [(name,) + results[name] for name in list_names]
+
+    def _call(self, function, list_name: str, search_index: SearchIndex = None):
+        """ Open a list, count its tasks and call the function with it, the list is closed in the same thread
+
+        :return: tuple
+            (counts, result of the function)
+        """
+        opened = search_index is None
+        if opened:
+            search_index = SearchIndex(open_storage(TODO_PATH, list_name, self.session.settings))
+        storage = search_index.storage
+        try:
+            with tracing.span('read list', list=list_name):
+                counts = self.summaries.get(list_name, storage)
+                if counts is None:
+                    stamps = get_stamps(storage)  # Before the read, a change in between makes the counts stale
+                    counts = count_tasks(storage)
+                    self.summaries.set(list_name, stamps, counts)
+                return counts, function(list_name, search_index, counts)
+        finally:
+            if opened:
+                search_index.close()
+                storage.close()
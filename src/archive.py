@@ -0,0 +1,127 @@
+""" Cold storage for old done tasks, outside the list file
+
+Done tasks are archived a while after they were done (settings "archive" ->
+"after_days"), so the list that every command reads and writes only holds
+the tasks that are still worked on and the ones that were done recently.
+Its size stays the same however much history builds up.
+
+The archive of a list is a directory next to it (<list>.archive) with one
+gzip compressed json file per month in which the tasks were done, and an
+index with the number of tasks of every month. The archive is only read by
+'check list' and 'check search' with --include-archive, and the index lets
+them skip whole months without opening them.
+"""
+import datetime
+import gzip
+import json
+
+from pathlib import Path
+from src.file_handler import FileLock, JsonCodec, atomic_write_bytes
+from src.search_index import FIELD_WEIGHTS, tokenize
+from src.task_record import task_from_json_object
+from src.constants import ARCHIVE_SUFFIX, ARCHIVE_AFTER_DAYS
+
+
+class Archive:
+    """ The archived tasks of one list
+
+    :param list_path: Path
+        The file of the list, see src.storage
+    """
+    def __init__(self, list_path: Path) -> None:
+        self.path = Path(list_path).with_suffix(ARCHIVE_SUFFIX)
+        self.index_path = self.path / 'index.json'
+
+    def write_lock(self, lock_dir: Path) -> FileLock:
+        return FileLock(Path(lock_dir) / (self.path.name + '.lock'))
+
+    def months(self) -> dict:
+        """ {month: number of tasks} of every month in the archive, the oldest first """
+        if not self.index_path.exists():
+            return {}
+        return dict(sorted(json.loads(self.index_path.read_bytes()).items()))
+
+    def count(self) -> int:
+        return sum(self.months().values())
+
+    def read_month(self, month: str) -> dict:
+        """ {task_id: Task} of the tasks that were done in a month (YYYY-MM) """
+        path = self.path / f'{month}.json.gz'
+        if not path.exists():
+            return {}
+        return json.loads(gzip.decompress(path.read_bytes()), object_hook=task_from_json_object)
+
+    def add(self, tasks: dict) -> None:
+        """ Add tasks to the months in which they were done
+
+        A task that already is in the archive is replaced, so adding the same
+        tasks twice (e.g. after a crash before the list was written) does no harm.
+
+        :param tasks: dict
+            {task_id: Task}
+        """
+        by_month = {}
+        for task_id, task in tasks.items():
+            by_month.setdefault(get_month(task.done_date), {})[task_id] = task
+        self.path.mkdir(parents=True, exist_ok=True)
+        months = self.months()
+        for month, month_tasks in by_month.items():
+            archived = self.read_month(month)
+            archived.update(month_tasks)
+            data = {task_id: task.to_json() for task_id, task in archived.items()}
+            atomic_write_bytes(self.path / f'{month}.json.gz', gzip.compress(JsonCodec.dumps(data)))
+            months[month] = len(archived)
+        atomic_write_bytes(self.index_path, JsonCodec.dumps(months))  # Last, a month is only counted once it is written
+
+    def iter_tasks(self, offset: int = 0):
+        """ Yield (task_id, task) of every archived task from the offset on, the oldest month first
+
+        Months that are before the offset are not read.
+        """
+        for month, count in self.months().items():
+            if offset >= count:
+                offset -= count
+                continue
+            tasks = self.read_month(month)
+            yield from list(tasks.items())[offset:]
+            offset = 0
+
+    def search(self, query: str = None):
+        """ Yield (task_id, task) of the archived tasks in which every word of the query starts a word
+
+        The archive has no search index, every month is read.
+        """
+        words = set(tokenize(query))
+        for task_id, task in self.iter_tasks():
+            tokens = {token for field in FIELD_WEIGHTS for token in tokenize(task.get(field))}
+            if all(any(token.startswith(word) for token in tokens) for word in words):
+                yield task_id, task
+
+
+def get_month(date) -> str:
+    return date.strftime('%Y-%m') if isinstance(date, datetime.date) else 'unknown'
+
+
+def archive_done_tasks(storage, settings: dict, lock_dir: Path, today: datetime.date = None) -> list:
+    """ Move the done tasks that are older than the archive age from the list to its archive
+
+    Called by Session.flush while the list is locked, the tasks are removed
+    from the storage and written with the rest of the changes.
+
+    :return: list
+        The IDs of the archived tasks
+    """
+    after_days = (settings or {}).get('archive', {}).get('after_days', ARCHIVE_AFTER_DAYS)
+    if not after_days:
+        return []
+    cutoff = (today or datetime.date.today()) - datetime.timedelta(days=after_days)
+    old_tasks = {task_id: task for task_id, task in storage.iter_tasks('done')
+                 if isinstance(task.done_date, datetime.date) and task.done_date < cutoff}
+    if not old_tasks:
+        return []
+    archive = Archive(storage.file_path)
+    with archive.write_lock(lock_dir):
+        archive.add(old_tasks)
+    for task_id in old_tasks:
+        storage.delete_task(task_id)
+    return list(old_tasks)
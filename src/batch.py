@@ -0,0 +1,132 @@
+""" Apply many task operations in one process
+
+Operations are read as newline-delimited json or csv, validated once and
+applied through Create, Update and Delete on one shared session, so the list
+is read once and written once for the whole batch.
+"""
+import contextlib
+import csv
+import io
+import json
+
+from src.session import Session
+from src.task import Create, Update, Delete
+from src.validate import Priority, Size
+from src.constants import CATEGORIES
+
+
+OPERATIONS = {
+    'add': ('title', 'description'),
+    'start': ('id',),
+    'done': ('id',),
+    'change': ('id',),
+    'move': ('id', 'destination'),
+    'delete': ('id',),
+}
+CHANGEABLE_FIELDS = ('title', 'description', 'priority', 'size', 'issue')
+
+
+class Batch:
+    def __init__(self, session: Session = None) -> None:
+        self.session = session or Session()
+
+    @staticmethod
+    def read_operations(lines, file_format: str = 'jsonl') -> list:
+        """ Read operations from an iterable of lines
+
+        :param file_format: str
+            "jsonl" for one json object per line, "csv" for a header row with the field names
+        :return: list
+            One dict per operation, e.g. {"op": "add", "title": "...", "description": "..."}
+        :raises ValueError:
+            If a line is not a json object, or a csv row has more cells than the header
+        """
+        operations = []
+        if file_format == 'csv':
+            for number, row in enumerate(csv.DictReader(lines), start=2):  # Row 1 is the header
+                if None in row:  # DictReader keeps the cells that have no column under None
+                    raise ValueError(f'Row {number} has more cells than the header')
+                operations.append({key: value for key, value in row.items() if value not in (None, '')})
+            return operations
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError(f'Line {number} is not a json object')
+            operations.append(operation)
+        return operations
+
+    def validate(self, operations: list) -> list:
+        """ Validate every operation before anything is applied
+
+        :return: list
+            Error messages, empty if every operation is valid
+        """
+        errors = []
+        settings = self.session.settings
+        for number, operation in enumerate(operations, start=1):
+            name = operation.get('op')
+            if name not in OPERATIONS:
+                errors.append(f'Operation {number}: unknown operation "{name}"')
+                continue
+            missing = [field for field in OPERATIONS[name] if field not in operation]
+            if missing:
+                errors.append(f'Operation {number}: {name} needs {", ".join(missing)}')
+            if 'priority' in operation and not Priority.is_valid_option(operation['priority'], settings):
+                errors.append(f'Operation {number}: priority can only be low, medium, high or critical')
+            if 'size' in operation and not Size.is_valid_option(operation['size'], settings):
+                errors.append(f'Operation {number}: size can only be small, medium or large')
+            if name == 'move' and operation.get('destination') not in CATEGORIES:
+                errors.append(f'Operation {number}: destination can only be "todo", "active" or "done"')
+            if name == 'change' and not any(field in operation for field in CHANGEABLE_FIELDS):
+                errors.append(f'Operation {number}: change needs at least one of {", ".join(CHANGEABLE_FIELDS)}')
+        return errors
+
+    def apply(self, operations: list, verbose: bool = False) -> int:
+        """ Apply already validated operations in order
+
+        The messages from Create, Update and Delete are hidden unless verbose is True.
+
+        :return: int
+            Number of operations that were applied
+        """
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        autoflush = self.session.autoflush
+        self.session.autoflush = False  # One write for the whole batch
+        try:
+            with output:
+                for operation in operations:
+                    self._apply_operation(operation)
+        finally:
+            self.session.autoflush = autoflush
+            if autoflush:
+                self.session.flush()
+        return len(operations)
+
+    def _apply_operation(self, operation: dict) -> None:
+        name = operation['op']
+        task_id = str(operation.get('id'))
+        if name == 'add':
+            Create(
+                operation['title'],
+                operation['description'],
+                operation.get('priority', 'medium'),
+                operation.get('size', 'medium'),
+                operation.get('issue'),
+                self.session
+            ).new_task()
+        elif name == 'start':
+            Update(self.session).start_task(task_id)
+        elif name == 'done':
+            Update(self.session).end_task(task_id)
+        elif name == 'change':
+            fields = {field: operation[field] for field in CHANGEABLE_FIELDS if field in operation}
+            Update(self.session).change_task(task_id, **fields)
+        elif name == 'move':
+            if operation['destination'] == 'done':
+                Update(self.session).end_task(task_id)
+            else:
+                Update(self.session).move_task(task_id, operation['destination'])
+        elif name == 'delete':
+            Delete(self.session).task(task_id)
@@ -0,0 +1,52 @@
+""" Thin client that forwards a command to a running 'check serve'
+
+It only imports what is needed to talk to the socket. When no server is
+running, the command is run in this process like a normal check command.
+"""
+import io
+import os
+import shutil
+import sys
+
+from src.constants import SOCKET_PATH
+
+
+def main(args: list = None) -> None:
+    args = sys.argv[1:] if args is None else args
+    if os.path.exists(SOCKET_PATH):
+        from src.server import send_request
+        request = {
+            'args': args,
+            'input': _piped_input(),
+            'columns': shutil.get_terminal_size().columns,
+        }
+        try:
+            response = send_request(SOCKET_PATH, request)
+        except (ConnectionError, FileNotFoundError):
+            # The server is gone, run the command here instead
+            if request['input'] is not None:
+                sys.stdin = io.StringIO(request['input'])
+        else:
+            sys.stdout.write(response['output'])
+            sys.exit(response['exit_code'])
+
+    from cli import check
+    check(args)
+
+
+def _piped_input() -> str:
+    """ Read stdin if something was piped into the client (e.g. for 'check batch')
+
+    A terminal, or a stdin that nothing is written to, is not waited for.
+    """
+    import select
+    if sys.stdin is None or sys.stdin.isatty():
+        return None
+    readable, _, _ = select.select([sys.stdin], [], [], 0.05)
+    if not readable:
+        return None
+    return sys.stdin.read()
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,10 @@ class Jira:
     def get_components(self) -> str:
         return self.jira_settings['components']
 
+    def get_gateway_options(self) -> dict:
+        """ Timeout, retries, backoff and workers of src.jira_gateway, missing in older configurations """
+        return self.jira_settings.get('gateway', {})
+
 
 if __name__ == '__main__':
     pass
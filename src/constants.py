@@ -18,6 +18,41 @@ TODO_PATH = Path(APPDATA_DIR) / 'lists'
 DELETED_DIR = Path(APPDATA_DIR) / 'deleted'
 SETTINGS_PATH = Path(APPDATA_DIR) / 'todo_settings.json'
 JIRA_CONFIG_PATH = Path(APPDATA_DIR) / 'jira_configuration.json'
+SETUP_MARKER_PATH = Path(APPDATA_DIR) / '.setup_complete'
+SOCKET_PATH = Path(APPDATA_DIR) / 'check.sock'
+LOCK_DIR = Path(APPDATA_DIR) / 'locks'
+SETTINGS_LOCK_PATH = Path(LOCK_DIR) / 'todo_settings.lock'
+OUTBOX_PATH = Path(APPDATA_DIR) / 'jira_outbox.json'
+OUTBOX_LOCK_PATH = Path(LOCK_DIR) / 'jira_outbox.lock'
+OUTBOX_FLUSH_LOCK_PATH = Path(LOCK_DIR) / 'jira_outbox_flush.lock'
+LISTS_SUMMARY_PATH = Path(APPDATA_DIR) / 'lists_summary.json'
 
 # DATES
-CURRENT_DATE = str(datetime.date.today())
+CURRENT_DATE = str(datetime.date.today())  # When check started, 'check serve' runs for days so tasks use the date of the change
+
+# TASKS
+CATEGORIES = ('todo', 'active', 'done')
+
+# STORAGE
+JOURNAL_COMPACT_THRESHOLD = 256 * 1024  # Bytes of journal before a json list is rewritten
+LOCK_TIMEOUT = 10  # Seconds to wait for another check process to release a list
+ARCHIVE_SUFFIX = '.archive'  # Directory next to a list with its archived done tasks, see src.archive
+LIST_WORKERS = 8  # Lists that --all-lists reads at the same time
+DEADLINES_SUFFIX = '.deadlines'  # Sorted due dates of the tasks of a list, next to the list, see src.deadlines
+UNDO_SUFFIX = '.undo'  # Steps that 'check undo' can take back, next to the list, see src.history
+REDO_SUFFIX = '.redo'  # Steps that were undone and 'check redo' can make again
+HISTORY_STEPS = 1000  # Undo steps that are kept per list
+HISTORY_TRIM_BYTES = 512 * 1024  # Size of the undo steps of a list that makes check drop the oldest ones
+ARCHIVE_AFTER_DAYS = 90  # Done tasks are archived this many days after they were done, 0 never archives
+
+# JIRA
+JIRA_TIMEOUT = 10  # Seconds to wait for one Jira call
+JIRA_RETRIES = 2
+JIRA_BACKOFF = 0.5  # Seconds before the first retry, doubled for every retry after it
+JIRA_WORKERS = 4  # Jira calls that can run at the same time
+OUTBOX_FLUSH_INTERVAL = 30  # Seconds between two tries of check serve to send calls that failed
+JIRA_STATUS_CATEGORIES = {'new': 'todo', 'indeterminate': 'active', 'done': 'done'}  # Jira status category -> check category
+
+# SYNC
+SYNC_STATE_SUFFIX = '.sync.json'  # Revisions of the tasks and the cursor of 'check jira sync', next to the list
+SYNC_CURSOR_OVERLAP = 10  # Minutes, the next sync also looks at issues that were updated just before this one started
@@ -0,0 +1,204 @@
+""" Sorted index of the due dates of a list
+
+Used by 'check due' (the warning that is meant for the shell prompt) and by
+'check list --overdue / --due-within'. Only the tasks in todo and active
+that have a due date are in the index. It is two arrays of the same length,
+the due dates as day numbers (date.toordinal) from the earliest to the
+latest and the IDs of their tasks, so "overdue" and "due within 3 days" are
+two bisects into the first array.
+
+The index is stored next to the list (<list>.deadlines) as one json line
+with the stamps of the list files that it was made from, followed by the
+bytes of the two arrays. Reading it is a stat of the list files and one read
+of a small file, the list itself is not opened.
+
+Session.flush updates the index right after it has written the list, only
+the tasks that the flush changed are looked at. When the stamps do not match the
+list (the list was written by an older version of check, or the index was
+removed), the index is built again from the whole list.
+"""
+import array
+import bisect
+import datetime
+import json
+import re
+import sys
+
+from pathlib import Path
+from src.file_handler import FileLock, atomic_write_bytes
+from src.storage import get_stamps
+from src import tracing
+from src.constants import DEADLINES_SUFFIX
+
+
+INDEXED_CATEGORIES = ('todo', 'active')
+TYPECODE = 'i'  # 4 bytes, enough for day numbers and task IDs
+DAYS_PATTERN = re.compile(r'(\d+)\s*([dw]?)')
+UNIT_DAYS = {'': 1, 'd': 1, 'w': 7}
+
+
+def parse_days(text: str) -> int:
+    """ Read a number of days like 3, 3d or 2w
+
+    :raises ValueError:
+        If the text is not a number of days
+    """
+    match = DAYS_PATTERN.fullmatch(text.strip().lower())
+    if match is None:
+        raise ValueError(f'"{text}" is not a number of days, use e.g. 3d or 2w')
+    return int(match.group(1)) * UNIT_DAYS[match.group(2)]
+
+
+def parse_due(text: str, today: datetime.date = None) -> datetime.date:
+    """ Read a due date: YYYY-MM-DD, today, tomorrow, or days from today like 3d or 2w
+
+    :return: datetime.date
+        The date, None for 'none' (no due date)
+    :raises ValueError:
+        If the text is not a date
+    """
+    today = today or datetime.date.today()
+    value = text.strip().lower()
+    if value == 'none':
+        return None
+    if value == 'today':
+        return today
+    if value == 'tomorrow':
+        return today + datetime.timedelta(days=1)
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return today + datetime.timedelta(days=parse_days(value))
+    except ValueError:
+        raise ValueError(f'"{text}" is not a due date, use YYYY-MM-DD, today, tomorrow, 3d, 2w or none') from None
+
+
+def _task_number(task_id: str) -> int:
+    try:
+        return int(task_id)
+    except (TypeError, ValueError):  # Only IDs that check gives out are indexed
+        return None
+
+
+class DeadlineIndex:
+    """ The due dates of the open tasks of one list, see the module docstring
+
+    :param list_path: Path
+        The file of the list, the index is stored next to it
+    """
+    def __init__(self, list_path: Path) -> None:
+        self.path = Path(list_path).with_suffix(DEADLINES_SUFFIX)
+        self.stamps = None  # Of the list files the index was made from, None if it has not been read or built
+        self.dates = array.array(TYPECODE)
+        self.ids = array.array(TYPECODE)
+
+    @classmethod
+    def open(cls, storage) -> 'DeadlineIndex':
+        """ The index of a list, built again if it does not match the list on disk """
+        index = cls(storage.file_path)
+        stamps = get_stamps(storage)  # Before the list is read, a change in between makes the index stale
+        if not index.read() or index.stamps != stamps:
+            index.build(storage)
+            if not storage.changed_ids():  # Changes that are not flushed yet are not in the stamps
+                index.write(stamps)
+        return index
+
+    def write_lock(self, lock_dir: Path) -> FileLock:
+        """ The lock that is held while the index is updated
+
+        A SQLite list is not locked by check while it is written, another
+        process can commit between the flush and the update of the index.
+        The update that comes second sees stamps that it does not expect
+        and builds the index again.
+        """
+        return FileLock(Path(lock_dir) / (self.path.name + '.lock'))
+
+    def read(self) -> bool:
+        """ Read the index file, False if it is missing or cannot be read """
+        try:
+            raw = self.path.read_bytes()
+            end = raw.index(b'\n')
+            header = json.loads(raw[:end])
+            dates, ids = array.array(TYPECODE), array.array(TYPECODE)
+            size = header['count'] * dates.itemsize
+            dates.frombytes(raw[end + 1:end + 1 + size])
+            ids.frombytes(raw[end + 1 + size:end + 1 + 2 * size])
+        except (OSError, ValueError, KeyError, TypeError):  # Missing, or written by another version, it is built again
+            return False
+        if len(ids) != header['count']:
+            return False
+        if header.get('byteorder') != sys.byteorder:
+            dates.byteswap()
+            ids.byteswap()
+        self.stamps, self.dates, self.ids = header['stamps'], dates, ids
+        return True
+
+    def write(self, stamps: list) -> None:
+        """ Write the index with the stamps of the list files it was made from
+
+        Not fsynced, an index that is lost is built again.
+        """
+        header = json.dumps({'stamps': stamps, 'count': len(self.dates), 'byteorder': sys.byteorder})
+        atomic_write_bytes(self.path, header.encode() + b'\n' + self.dates.tobytes() + self.ids.tobytes(), sync=False)
+        self.stamps = stamps
+
+    def build(self, storage) -> None:
+        """ Make the index from every task of the list """
+        with tracing.span('deadline index build'):
+            entries = []
+            for category, task_id, task in storage.all_tasks():
+                if category in INDEXED_CATEGORIES:
+                    entries.extend(self._entry(task_id, task))
+            self._set(sorted(entries))
+
+    def update(self, storage, task_ids: set, base_stamps: list) -> None:
+        """ Make the index match the list after it was flushed, the caller holds write_lock
+
+        :param task_ids: set
+            The IDs of the tasks that the flush added, changed or deleted
+        :param base_stamps: list
+            The stamps of the list files before the flush, the index is only
+            updated from task_ids if it was made from that version
+        """
+        if self.stamps is None:
+            self.read()
+        if self.stamps != base_stamps:
+            self.build(storage)
+        elif task_ids:
+            numbers = {_task_number(task_id) for task_id in task_ids}
+            entries = [entry for entry in zip(self.dates, self.ids) if entry[1] not in numbers]
+            for task_id in task_ids:
+                if storage.find_category(task_id) in INDEXED_CATEGORIES:
+                    for entry in self._entry(task_id, storage.get_task(task_id)):
+                        bisect.insort(entries, entry)
+            self._set(entries)
+        self.write(get_stamps(storage))
+
+    def task_ids(self, until: datetime.date, since: datetime.date = None) -> list:
+        """ IDs of the tasks that are due from since (from the earliest if None) to until, the earliest first """
+        start, end = self._range(until, since)
+        return [str(task_id) for task_id in self.ids[start:end]]
+
+    def count(self, until: datetime.date, since: datetime.date = None) -> int:
+        """ Number of tasks that are due from since (from the earliest if None) to until """
+        start, end = self._range(until, since)
+        return end - start
+
+    def _range(self, until: datetime.date, since: datetime.date = None) -> tuple:
+        start = 0 if since is None else bisect.bisect_left(self.dates, since.toordinal())
+        return start, max(start, bisect.bisect_right(self.dates, until.toordinal()))
+
+    @staticmethod
+    def _entry(task_id: str, task) -> list:
+        """ [(day number, task number)] of a task, empty if it has no due date """
+        due_date = task.due_date
+        number = _task_number(task_id)
+        if not isinstance(due_date, datetime.date) or number is None:
+            return []
+        return [(due_date.toordinal(), number)]
+
+    def _set(self, entries: list) -> None:
+        self.dates = array.array(TYPECODE, (date for date, _ in entries))
+        self.ids = array.array(TYPECODE, (task_id for _, task_id in entries))
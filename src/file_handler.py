@@ -1,27 +1,125 @@
 """ Thif module handles file operations """
+import importlib
 import json
+import os
+import tempfile
+import threading
+import time
+
 from pathlib import Path
+from src.constants import LOCK_TIMEOUT
+
+if os.name == 'nt':  # Windows
+    import msvcrt
+else:
+    import fcntl
+
+
+class JsonCodec:
+    """ Compact json, written and read by orjson when it is installed """
+    name = 'json'
+
+    @staticmethod
+    def dumps(data, default=None) -> bytes:
+        orjson = get_optional_module('orjson')
+        if orjson is not None:
+            return orjson.dumps(data, default=default)
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=default).encode('utf-8')
+
+    @staticmethod
+    def loads(raw: bytes, object_hook=None):
+        orjson = get_optional_module('orjson')
+        if orjson is None or object_hook is not None:  # orjson has no object_hook, calling it afterwards is slower
+            return json.loads(raw, object_hook=object_hook)
+        return orjson.loads(raw)
+
+
+class MsgpackCodec:
+    """ Binary msgpack, smaller and faster than json, needs the msgpack package """
+    name = 'msgpack'
+    header = b'CHECK-MSGPACK\n'  # json never starts like this, so a read knows the codec of a file
+
+    @staticmethod
+    def _msgpack():
+        msgpack = get_optional_module('msgpack')
+        if msgpack is None:
+            raise ValueError('The msgpack codec needs the msgpack package, install it with: pip install msgpack')
+        return msgpack
+
+    @classmethod
+    def dumps(cls, data, default=None) -> bytes:
+        return cls.header + cls._msgpack().packb(data, default=default, use_bin_type=True)
+
+    @classmethod
+    def loads(cls, raw: bytes, object_hook=None):
+        return cls._msgpack().unpackb(memoryview(raw)[len(cls.header):], object_hook=object_hook, raw=False)
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+_optional_modules = {}
+
+
+def get_optional_module(name: str):
+    """ Import an optional package once, None if it is not installed """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def detect_codec(head: bytes) -> str:
+    """ Get the name of the codec that wrote a file from the first bytes of the file """
+    return MsgpackCodec.name if head.startswith(MsgpackCodec.header) else JsonCodec.name
 
 
 class JsonFile:
+    """ Read and write the data files of check
+
+    Files are written as compact json by default, or with another codec of
+    CODECS. Reads tell the codec from the start of the file (see detect_codec),
+    so every file can be read without knowing how it was written.
+    """
 
     @staticmethod
-    def read(file_path: str) -> dict:
-        """ Read a json file and return the data as a dict
+    def read(file_path: str, object_hook=None) -> dict:
+        """ Read a json (or msgpack) file and return the data as a dict
 
         :param file_path: str
             Path to the json file
+        :param object_hook:
+            Called with every dict that is read, e.g. to turn the tasks into src.task_record.Task
         :return: dict
             The json data in dict format
         """
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        raw = Path(file_path).read_bytes()
+        return CODECS[detect_codec(raw)].loads(raw, object_hook)
 
     @staticmethod
-    def write(file_path: str, new_data: dict) -> None:
+    def write(file_path: str, new_data: dict, default=None, codec: str = JsonCodec.name) -> None:
+        """ Replace the file in one step
+
+        The data is written to a temporary file next to the target, synced to
+        disk and renamed over the target, so a crash never leaves a half
+        written file behind.
+
+        :param default:
+            Called with objects that the codec cannot write, returns what to write instead
+        :param codec: str
+            One of CODECS
+        """
         assert isinstance(new_data, dict), 'new_data must be a dictionary'
-        with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(new_data, file, indent=4)
+        atomic_write_bytes(file_path, CODECS[codec].dumps(new_data, default))
+
+    @staticmethod
+    def get_codec(file_path: str) -> str:
+        """ Get the name of the codec that a file is written with """
+        with open(file_path, 'rb') as file:
+            return detect_codec(file.read(len(MsgpackCodec.header)))
 
     @staticmethod
     def get_all_tasks(todo: dict) -> dict:
@@ -38,5 +136,126 @@ class JsonFile:
         }
         json_path = Path(file_path) / (name + '.json')
         json_path.parent.mkdir(parents=True, exist_ok=True)  # Create if it does not exist
-        with open(json_path, 'w', encoding='utf-8') as file:
-            json.dump(placeholder_data, file, ensure_ascii=False, indent=4)
+        JsonFile.write(json_path, placeholder_data)
+
+
+def atomic_write_bytes(file_path: str, data: bytes, sync: bool = True) -> None:
+    """ Write data to a temporary file, fsync it and rename it over file_path
+
+    :param sync: bool
+        fsync the file, files that can be built again (like an index) skip it
+    """
+    file_path = Path(file_path)
+    descriptor, temp_path = tempfile.mkstemp(dir=file_path.parent, prefix=file_path.name, suffix='.tmp')
+    try:
+        if file_path.exists():
+            os.chmod(temp_path, file_path.stat().st_mode)
+        with open(descriptor, 'wb') as file:
+            file.write(data)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def get_file_stamp(file_path: str) -> tuple:
+    """ Modification time and size of a file, None if it does not exist
+
+    Check compares stamps to tell if another process has changed a file.
+    """
+    try:
+        stat = Path(file_path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileLock:
+    """ Advisory lock that serializes read-modify-write cycles between check processes
+
+    The lock is reentrant within one thread, so nested code never waits for
+    itself. Two threads of one process (e.g. the outbox thread of check serve
+    and a command) wait for each other like two processes do.
+
+    :param lock_path: Path
+        The lock file, it is created if it does not exist
+    :param timeout: float
+        Seconds to wait for another process before giving up with a TimeoutError
+    """
+    _held = {}  # (lock path, thread) -> [open lock file, number of holders] in this process
+    _held_lock = threading.Lock()
+
+    def __init__(self, lock_path: Path, timeout: float = LOCK_TIMEOUT) -> None:
+        self.path = Path(lock_path)
+        self.timeout = timeout
+        self._key = None
+        self._acquired = False
+
+    def acquire(self) -> None:
+        if self._acquired:
+            return
+        key = (str(self.path), threading.get_ident())
+        with FileLock._held_lock:
+            if key in FileLock._held:
+                FileLock._held[key][1] += 1
+                self._key = key
+                self._acquired = True
+                return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file = open(self.path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        delay = 0.005
+        while True:
+            try:
+                self._lock(file)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    file.close()
+                    raise TimeoutError(f'{self.path} is locked by another check process')
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        with FileLock._held_lock:
+            FileLock._held[key] = [file, 1]
+        self._key = key
+        self._acquired = True
+
+    def release(self) -> None:
+        if not self._acquired:
+            return
+        with FileLock._held_lock:
+            entry = FileLock._held[self._key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._unlock(entry[0])
+                entry[0].close()
+                del FileLock._held[self._key]
+        self._acquired = False
+
+    @staticmethod
+    def _lock(file) -> None:
+        if os.name == 'nt':
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    @staticmethod
+    def _unlock(file) -> None:
+        if os.name == 'nt':
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.release()
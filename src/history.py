@@ -0,0 +1,213 @@
+""" Undo and redo of the changes to a list
+
+Every command that changes tasks (add, start, done, change, move, delete)
+is one step. A step only keeps what changed, one delta per task:
+
+    [task ID, category before, category after, fields before, fields after]
+
+The fields are only the ones that changed, or the whole task when it was
+added (nothing before) or deleted (nothing after). Undo makes the "before"
+side of the deltas again, redo the "after" side, so a step of 'check change
+--title' is a few dozen bytes whatever the size of the list.
+
+The steps are two journals next to the list (see src.journal): <list>.undo
+with the steps that can be undone, the latest last, and <list>.redo with the
+steps that were undone. A new step clears the redo steps. A step is only
+appended to the undo journal, the journal is only read when something is
+undone or redone. When it grows past HISTORY_TRIM_BYTES, only the latest
+steps are kept, at most HISTORY_STEPS.
+
+Like the changes to the list, steps and undos are kept in memory until the
+session is flushed (see src.session) and are then made on top of the
+journals on disk, so the steps of other processes are not lost.
+"""
+import contextlib
+import datetime
+import json
+
+from pathlib import Path
+from src.file_handler import FileLock
+from src.journal import Journal
+from src.constants import UNDO_SUFFIX, REDO_SUFFIX, HISTORY_STEPS, HISTORY_TRIM_BYTES
+
+
+def get_state(storage, task_id: str) -> tuple:
+    """ (category, json form) of a task, None if it is not in the list """
+    category = storage.find_category(task_id)
+    if category is None:
+        return None
+    return category, storage.get_task(task_id).to_json()
+
+
+def get_delta(task_id: str, before: tuple, after: tuple) -> list:
+    """ The delta of a task from its state before to its state after a change, None if nothing changed """
+    if before == after:
+        return None
+    if before is None:
+        return [task_id, None, after[0], None, after[1]]
+    if after is None:
+        return [task_id, before[0], None, before[1], None]
+    changed = sorted(key for key in set(before[1]) | set(after[1]) if before[1].get(key) != after[1].get(key))
+    return [task_id, before[0], after[0], {key: before[1].get(key) for key in changed},
+            {key: after[1].get(key) for key in changed}]
+
+
+def apply_delta(storage, delta: list, undo: bool) -> bool:
+    """ Make one side of a delta in the list, the "before" side if undo else the "after" side
+
+    :return: bool
+        False if the task is not in the state that the delta expects (e.g.
+        it was deleted since), the delta is then skipped
+    """
+    task_id, before_category, after_category, before_fields, after_fields = delta
+    if undo:
+        category, fields, other_category = before_category, before_fields, after_category
+    else:
+        category, fields, other_category = after_category, after_fields, before_category
+    current = storage.find_category(task_id)
+    if category is None:  # Undo of an add, redo of a delete
+        if current is None:
+            return False
+        storage.delete_task(task_id)
+    elif other_category is None:  # Undo of a delete, redo of an add
+        if current is not None:
+            return False
+        storage.add_task(category, task_id, fields)
+    else:
+        if current is None:
+            return False
+        if fields:
+            storage.update_task(task_id, **fields)
+        if current != category:
+            storage.move_task(task_id, category)
+    return True
+
+
+def describe(step: dict) -> str:
+    """ e.g. 'change of task 5' """
+    task_ids = [delta[0] for delta in step['tasks']]
+    return f'{step["command"]} of task{"s" if len(task_ids) > 1 else ""} {", ".join(task_ids)}'
+
+
+class History:
+    """ The undo and redo steps of one list, see the module docstring
+
+    :param list_path: Path
+        The file of the list, the journals are stored next to it
+    """
+    def __init__(self, list_path: Path) -> None:
+        self.undo_journal = Journal(list_path, UNDO_SUFFIX)
+        self.redo_journal = Journal(list_path, REDO_SUFFIX)
+        self.lock_name = Path(list_path).stem + '.history.lock'
+        self._pending = []  # ('do' | 'undo' | 'redo', step), in the order they were made
+
+    @contextlib.contextmanager
+    def step(self, command: str, storage, task_ids: list):
+        """ Record the changes that the with block makes to the tasks as one step
+
+        :param command: str
+            The name of the command, e.g. 'change'
+        :param task_ids: list
+            The tasks that the block changes, a task that is added has no state before
+        """
+        before = [get_state(storage, task_id) for task_id in task_ids]
+        yield
+        deltas = [get_delta(task_id, state, get_state(storage, task_id)) for task_id, state in zip(task_ids, before)]
+        deltas = [delta for delta in deltas if delta is not None]
+        if deltas:
+            self._pending.append(('do', {'command': command, 'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                                         'tasks': deltas}))
+
+    def undo(self, count: int) -> list:
+        """ Take the latest count steps off the undo steps, the caller makes their "before" side
+
+        :return: list
+            The steps, the latest first
+        """
+        return self._take('undo', count)
+
+    def redo(self, count: int) -> list:
+        """ Take the latest count undone steps, the caller makes their "after" side
+
+        :return: list
+            The steps, the one that was undone last first
+        """
+        return self._take('redo', count)
+
+    def _take(self, operation: str, count: int) -> list:
+        undo_steps, redo_steps = self._stacks()
+        steps = undo_steps if operation == 'undo' else redo_steps
+        taken = steps[-count:][::-1]
+        self._pending.extend((operation, step) for step in taken)
+        return taken
+
+    def _stacks(self) -> tuple:
+        """ (undo steps, redo steps) as they will be after the next flush """
+        undo_steps, redo_steps = self.undo_journal.read(), self.redo_journal.read()
+        for operation, step in self._pending:
+            _replay(undo_steps, redo_steps, operation, step)
+        return undo_steps, redo_steps
+
+    def write_lock(self, lock_dir: Path) -> FileLock:
+        """ The lock that is held while the journals are written """
+        return FileLock(Path(lock_dir) / self.lock_name)
+
+    def flush(self, renumbered: dict = None) -> None:
+        """ Write the steps that were made since the last flush, the caller holds write_lock
+
+        :param renumbered: dict
+            {old task ID: new task ID} of the tasks that the flush of the list gave another ID
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        if renumbered:
+            for operation, step in pending:
+                if operation == 'do':
+                    for delta in step['tasks']:
+                        delta[0] = renumbered.get(delta[0], delta[0])
+        if all(operation == 'do' for operation, _ in pending):  # Nothing to read, the usual case
+            self.undo_journal.append([step for _, step in pending], sync=False)
+            self.redo_journal.clear()
+        else:
+            undo_steps, redo_steps = self.undo_journal.read(), self.redo_journal.read()
+            for operation, step in pending:
+                _replay(undo_steps, redo_steps, operation, step)
+            self.undo_journal.replace(undo_steps, sync=False)
+            if redo_steps:
+                self.redo_journal.replace(redo_steps, sync=False)
+            else:
+                self.redo_journal.clear()
+        if self.undo_journal.size() > HISTORY_TRIM_BYTES:
+            self._trim()
+
+    def _trim(self) -> None:
+        """ Keep the latest HISTORY_STEPS steps that fit into half of HISTORY_TRIM_BYTES """
+        steps = self.undo_journal.read()[-HISTORY_STEPS:]
+        size = 0
+        for number in range(len(steps) - 1, -1, -1):
+            size += len(json.dumps(steps[number], separators=(',', ':'))) + 1
+            if size > HISTORY_TRIM_BYTES // 2:
+                steps = steps[number + 1:]
+                break
+        self.undo_journal.replace(steps, sync=False)
+
+
+def _replay(undo_steps: list, redo_steps: list, operation: str, step: dict) -> None:
+    """ Make one pending operation on the steps """
+    if operation == 'do':
+        undo_steps.append(step)
+        redo_steps.clear()
+    elif operation == 'undo':
+        _remove_last(undo_steps, step)
+        redo_steps.append(step)
+    else:
+        _remove_last(redo_steps, step)
+        undo_steps.append(step)
+
+
+def _remove_last(steps: list, step: dict) -> None:
+    for number in range(len(steps) - 1, -1, -1):
+        if steps[number] == step:
+            del steps[number]
+            return
@@ -0,0 +1,146 @@
+""" Export many tasks to Jira, or load many Jira issues, in one run
+
+The Jira calls of the tasks run at the same time on the workers of the
+gateway (see src.jira_gateway). The list is not locked while Jira is called,
+and every local change is written with one flush when all tasks are done.
+A task that fails does not stop the others, its reason is returned instead.
+Tasks that are already exported and issues that are already loaded are
+skipped, they are not failures.
+"""
+import contextlib
+import io
+
+from src.session import Session
+from src.task import Create, Update
+from src.configuration import Jira
+
+
+class JiraBulk:
+    def __init__(self, session: Session = None, config: Jira = None) -> None:
+        self.session = session or Session()
+        self.config = config or Jira()
+
+    def export_tasks(self, task_ids: list, progress=None) -> tuple:
+        """ Create a Jira issue for every task and add the issue to the task
+
+        Active tasks are transitioned to "In Progress" and done tasks to "Done".
+        Tasks that already have an issue are not exported again.
+
+        :param progress:
+            Function that is called with 1 every time a task is finished
+        :return: tuple
+            ({task_id: issue} of the exported tasks, {task_id: issue} of the tasks that
+            were already exported, {task_id: reason} of the tasks that failed)
+        """
+        storage = self.session.storage
+        skipped = {}
+        failures = {}
+        tasks = []
+        for task_id in task_ids:
+            category = storage.find_category(task_id)
+            task = storage.get_task(task_id)
+            if task is None:
+                failures[task_id] = 'Could not find the task to export'
+            elif task.get('issue'):
+                skipped[task_id] = task['issue']
+            else:
+                tasks.append((task_id, category, task['title'], task['description']))
+
+        exported = {}
+        for (task_id, _, _, _), (issue, failure) in self.session.jira.map(self._export_task, tasks):
+            if issue:
+                exported[task_id] = issue
+            if failure:
+                failures[task_id] = failure
+            if progress is not None:
+                progress(1)
+
+        with self._one_write():
+            update = Update(self.session)
+            for task_id, issue in exported.items():
+                update.change_task(task_id, issue=issue)
+        return exported, skipped, failures
+
+    def _export_task(self, task: tuple) -> tuple:
+        _, category, title, description = task
+        config = self.config
+        jira = self.session.jira
+        issue = jira.call('create_issue', title, description, config.get_project(), config.get_issue_type_story(),
+                          config.get_leading_work_group(), config.get_feature_link(), config.get_components())
+        if not issue:
+            return None, f'Could not export the issue to Jira: {jira.last_error}'
+        if category == 'active' and not jira.call('transition_issue', issue, config.get_transition_in_progress()):
+            return issue, f'Exported as {issue}, but could not transition the issue to "In Progress"'
+        if category == 'done' and not jira.call('move_issue_to_done', issue, config.get_transition_done()):
+            return issue, f'Exported as {issue}, but could not transition the issue to "Done"'
+        return issue, None
+
+    def load_issues(self, issues: list, progress=None) -> tuple:
+        """ Add a task to the todo list for every Jira issue
+
+        Issues that are already in the list are not added again.
+
+        :param progress:
+            Function that is called with 1 every time an issue is finished
+        :return: tuple
+            ({issue: task_id} of the loaded issues, {issue: task_id} of the issues that
+            were already in the list, {issue: reason} of the issues that failed)
+        """
+        known_issues = {task.get('issue'): task_id for _, task_id, task in self.session.storage.all_tasks()}
+        skipped = {}
+        failures = {}
+        new_issues = []
+        for issue in dict.fromkeys(issues):
+            if issue in known_issues:
+                skipped[issue] = known_issues[issue]
+            else:
+                new_issues.append(issue)
+
+        fields = {}
+        def get_issue(issue):
+            issue_fields = self.session.jira.get_issue(issue)
+            return issue_fields, self.session.jira.last_error  # last_error is kept per worker thread
+
+        for issue, (issue_fields, error) in self.session.jira.map(get_issue, new_issues):
+            if issue_fields is None:
+                failures[issue] = f'Could not load the issue from Jira: {error}'
+            else:
+                fields[issue] = issue_fields
+            if progress is not None:
+                progress(1)
+
+        loaded = {}
+        with self._one_write():
+            for issue in new_issues:  # In the order they were asked for, not the order they finished
+                if issue in fields:
+                    title, description = fields[issue]
+                    loaded[issue] = Create(title, description, 'medium', 'medium', issue, self.session).new_task()
+        loaded = {issue: self.session.new_id(task_id) for issue, task_id in loaded.items()}
+        return loaded, skipped, failures
+
+    def search(self, jql: str) -> list:
+        """ Get the keys of the issues that a JQL query finds
+
+        :return: list
+            Issue keys, or None if the search failed
+        """
+        results = self.session.jira.call('search_issues', jql)
+        if results is None:
+            return None
+        return [result['key'] if isinstance(result, dict) else result for result in results]
+
+    def _one_write(self):
+        return one_write(self.session)
+
+
+@contextlib.contextmanager
+def one_write(session: Session):
+    """ Hide the messages of Update and Create and write the list once """
+    autoflush = session.autoflush
+    session.autoflush = False
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        session.autoflush = autoflush
+    session.flush()
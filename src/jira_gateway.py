@@ -0,0 +1,233 @@
+""" Shared access to Jira through the simple_vira plugin
+
+Every command used to create a new simple_vira Api and make its calls one
+after another, without a timeout or a retry. The gateway keeps a small pool of
+Api objects that are reused between calls (and between commands when the
+session is kept by 'check serve'), so the connections that they hold stay open.
+
+Every call gets a timeout, and calls that do not depend on each other can run
+at the same time with run(). Only calls that can safely be sent twice are
+retried with exponential backoff (see IDEMPOTENT_METHODS). A create that times
+out may still have created the issue, so it is never sent again.
+The plugin reports failures with a falsy result (None or False), the gateway
+does the same when a call still fails, and keeps the reason in last_error.
+"""
+import concurrent.futures
+import queue
+import threading
+import time
+
+from src import tracing
+from src.constants import JIRA_TIMEOUT, JIRA_RETRIES, JIRA_BACKOFF, JIRA_WORKERS, JIRA_STATUS_CATEGORIES
+
+
+# Calls that leave Jira in the same state when they are sent twice.
+# create_issue makes a new issue and move_issue_to_done adds a comment every time.
+IDEMPOTENT_METHODS = ('assign_issue', 'transition_issue', 'get_complete_issue_data', 'search_issues')
+
+
+class JiraGateway:
+    """ Timeouts, retries and concurrency around the calls of a simple_vira Api
+
+    :param config: src.configuration.Jira
+        Credentials and the "gateway" options, read from the Jira configuration if None
+    :param api_factory:
+        Function without arguments that creates a new Api, a simple_vira Api
+        for the credentials in config if None (tests pass a stub)
+    :param timeout: float
+        Seconds to wait for one attempt of a call
+    :param retries: int
+        Number of times to try a failed call again
+    :param backoff: float
+        Seconds to wait before the first retry, doubled for every retry after it
+    :param workers: int
+        Largest number of calls that run at the same time, and of Api objects in the pool
+    """
+    def __init__(self, config=None, api_factory=None, timeout: float = None, retries: int = None,
+                 backoff: float = None, workers: int = None) -> None:
+        if config is None and api_factory is None:
+            from src.configuration import Jira
+            config = Jira()
+        self.config = config
+        options = config.get_gateway_options() if config is not None else {}
+        self.timeout = timeout if timeout is not None else options.get('timeout', JIRA_TIMEOUT)
+        self.retries = retries if retries is not None else options.get('retries', JIRA_RETRIES)
+        self.backoff = backoff if backoff is not None else options.get('backoff', JIRA_BACKOFF)
+        self.workers = workers if workers is not None else options.get('workers', JIRA_WORKERS)
+        self.api_factory = api_factory or self._vira_api
+        self._idle = queue.LifoQueue()  # The Api used last is the most likely to still have an open connection
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._local = threading.local()
+
+    @property
+    def last_error(self) -> str:
+        """ Why the last failed call of this thread failed, None if it did not fail """
+        return getattr(self._local, 'last_error', None)
+
+    def _vira_api(self):
+        from simple_vira import Api as ViraApi
+        return ViraApi(self.config.get_base_url(), self.config.get_api_token(), self.config.get_user_token())
+
+    def call(self, method: str, *args):
+        """ Call a method of the Api with a timeout, and retries if the method is idempotent
+
+        :param method: str
+            Name of the Api method, e.g. "transition_issue"
+        :return:
+            The result of the call, or None if every attempt failed or timed out
+        """
+        result = None
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                with tracing.span(f'jira {method}', attempt=attempt + 1):
+                    result = self._attempt(method, args)
+                succeeded = bool(result) or isinstance(result, list)  # A search that finds nothing has still answered
+                error = None if succeeded else f'Jira could not {method.replace("_", " ")}'
+            except Exception as exception:
+                result = None
+                error = str(exception) or type(exception).__name__
+            self._local.last_error = error
+            if error is None:
+                return result
+        return result
+
+    def run(self, *calls) -> list:
+        """ Make calls that do not depend on each other at the same time
+
+        :param calls:
+            Tuples of (method, *args), see call
+        :return: list
+            The result of every call, in the same order as the calls
+        """
+        results = [None] * len(calls)
+
+        def run_call(number, call):
+            results[number] = self.call(*call)
+
+        threads = [threading.Thread(target=run_call, args=(number, call), daemon=True) for number, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def map(self, function, items):
+        """ Run function(item) for many items, at most workers at the same time
+
+        :param function:
+            Function of one item that makes its calls through this gateway
+        :return:
+            Generator of (item, result) in the order that they finish
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(function, item): item for item in items}
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future.result()
+
+    def supports(self, method: str) -> bool:
+        """ Check if the installed plugin has a method, e.g. one that older versions lack """
+        api = self._borrow()
+        try:
+            return callable(getattr(api, method, None))
+        finally:
+            self._give_back(api)
+
+    def get_issue(self, issue: str) -> tuple:
+        """ Get the title and description of an issue
+
+        :return: tuple
+            (title, description), or None if the issue could not be loaded
+        """
+        issue_dict = self.call('get_complete_issue_data', issue)
+        if issue_dict is None:
+            return None
+        api = self._borrow()
+        try:
+            return api.get_issue_title(issue_dict), api.get_issue_description(issue_dict)
+        finally:
+            self._give_back(api)
+
+    def get_issue_state(self, issue: str) -> dict:
+        """ Get the fields of an issue that src.sync keeps in step with its task
+
+        :return: dict
+            {'title', 'description', 'category'}, category is the check category of
+            the status of the issue, or None if the issue data has no status category.
+            None if the issue could not be loaded.
+        """
+        issue_dict = self.call('get_complete_issue_data', issue)
+        if issue_dict is None:
+            return None
+        api = self._borrow()
+        try:
+            title, description = api.get_issue_title(issue_dict), api.get_issue_description(issue_dict)
+        finally:
+            self._give_back(api)
+        try:
+            status_category = issue_dict['fields']['status']['statusCategory']['key']
+        except (KeyError, TypeError):
+            status_category = None
+        return {'title': title, 'description': description, 'category': JIRA_STATUS_CATEGORIES.get(status_category)}
+
+    def _attempt(self, method: str, args: tuple):
+        """ Make one attempt of a call on a pooled Api
+
+        The call runs in a daemon thread, so a call that hangs is given up
+        after the timeout and does not keep check from exiting. Its Api is
+        not put back in the pool.
+        """
+        api = self._borrow()
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = getattr(api, method)(*args)
+            except Exception as error:
+                outcome['error'] = error
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            self._slots.release()
+            raise TimeoutError(f'Jira did not answer {method} within {self.timeout} seconds')
+        self._give_back(api)
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _borrow(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self.api_factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _give_back(self, api) -> None:
+        self._idle.put(api)
+        self._slots.release()
+
+    def close(self) -> None:
+        """ Drop the pooled Api objects and close their connections if they can be closed """
+        while True:
+            try:
+                api = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            close = getattr(api, 'close', None)
+            if callable(close):
+                close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,90 @@
+""" Append-only journal of the changes made to a json list
+
+Every change is one compact json record on its own line. The current state of
+a list is the json file (the snapshot) with the journal replayed on top of it.
+"""
+import json
+import os
+
+from pathlib import Path
+from src.file_handler import atomic_write_bytes
+
+
+JOURNAL_SUFFIX = '.journal'
+
+
+class Journal:
+    def __init__(self, list_path: Path, suffix: str = JOURNAL_SUFFIX) -> None:
+        self.path = Path(list_path).with_suffix(suffix)
+
+    def append(self, records: list, sync: bool = True) -> None:
+        """ Append records to the end of the journal and make sure they are on disk
+
+        A half written last line (e.g. after a crash) is cut off first, so the
+        new records do not end up on the same line as it.
+
+        :param sync: bool
+            fsync the journal, journals that can be lost (like the undo history) skip it
+        """
+        with open(self.path, 'ab+') as file:
+            self._cut_torn_line(file)
+            file.write(self._lines(records))
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+
+    def replace(self, records: list, sync: bool = True) -> None:
+        """ Write a new journal with records in place of the old one """
+        atomic_write_bytes(self.path, self._lines(records), sync=sync)
+
+    @staticmethod
+    def _lines(records: list) -> bytes:
+        return ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode('utf-8')
+
+    @staticmethod
+    def _cut_torn_line(file) -> None:
+        """ Truncate the journal after its last complete line """
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b'\n':
+            return
+        position = end
+        while position > 0:  # Read backwards until the newline in front of the torn line
+            start = max(0, position - 4096)
+            file.seek(start)
+            chunk = file.read(position - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                file.truncate(start + newline + 1)
+                return
+            position = start
+        file.truncate(0)
+
+    def read(self) -> list:
+        """ Read all records in the journal
+
+        Lines that are not a complete record (e.g. a half written last line
+        after a crash) are skipped.
+        """
+        if not self.path.exists():
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def size(self) -> int:
+        """ Size of the journal in bytes """
+        if not self.path.exists():
+            return 0
+        return self.path.stat().st_size
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,209 @@
+""" Durable queue of the Jira calls that commands have to make
+
+Commands change the local list right away and add their Jira calls to the
+outbox instead of waiting for Jira. The outbox is sent by 'check jira flush',
+which check also starts in the background after a command that queued
+something, and by 'check serve'. Calls that fail stay in the outbox and are
+tried again at the next flush.
+
+A call can be queued for a task that does not have an issue yet (the create
+of the issue is still in the outbox), it is sent once the create has
+succeeded. Calls with the same key replace each other, e.g. only the last of
+two queued transitions of a task is sent.
+"""
+from pathlib import Path
+from src.file_handler import JsonFile, FileLock
+from src.search_index import SearchIndex
+from src.storage import get_list_path, open_storage
+from src.constants import OUTBOX_PATH, OUTBOX_LOCK_PATH, OUTBOX_FLUSH_LOCK_PATH, TODO_PATH, LOCK_DIR
+
+
+class Outbox:
+    def __init__(self, path: Path = OUTBOX_PATH, lock_path: Path = OUTBOX_LOCK_PATH,
+                 flush_lock_path: Path = OUTBOX_FLUSH_LOCK_PATH) -> None:
+        self.path = Path(path)
+        self.lock_path = Path(lock_path)
+        self.flush_lock_path = Path(flush_lock_path)
+
+    def is_empty(self) -> bool:
+        return not self.path.exists()
+
+    def entries(self) -> list:
+        return self._read()['entries']
+
+    def add(self, method: str, args: list, issue: str = None, task: list = None, key: list = None) -> None:
+        """ Queue a call of a simple_vira Api method
+
+        :param method: str
+            Name of the Api method, e.g. "transition_issue"
+        :param args: list
+            Arguments of the call, after the issue
+        :param issue: str
+            The issue that the call is about. None for a create, or for a task
+            whose issue is still being created.
+        :param task: list
+            [list name, task ID] of the local task, if there is one
+        :param key: list
+            A queued call with the same key is replaced by this one
+        """
+        with FileLock(self.lock_path):
+            data = self._read()
+            if key is not None:
+                data['entries'] = [entry for entry in data['entries'] if entry['key'] != key]
+            data['count'] += 1
+            data['entries'].append({
+                'number': data['count'],
+                'method': method,
+                'args': list(args),
+                'issue': issue,
+                'task': task,
+                'key': key,
+                'attempts': 0,
+                'error': None,
+            })
+            self._write(data)
+
+    def has_pending_create(self, task: list) -> bool:
+        """ Check if the issue of a task is still being created, or not yet added to the task """
+        data = self._read()
+        return (any(entry['method'] == 'create_issue' and entry['task'] == task for entry in data['entries'])
+                or self.created_issue(task) is not None)
+
+    def created_issue(self, task: list) -> str:
+        """ Get the issue that a flush created for a task, before set_issues has added it to the task """
+        for list_name, task_id, issue in self._read()['created']:
+            if [list_name, task_id] == task:
+                return issue
+        return None
+
+    def flush(self, gateway) -> tuple:
+        """ Send the queued calls through a JiraGateway
+
+        The calls of one task (or issue) are sent in the order they were
+        queued, the calls of different tasks at the same time. Only one
+        flush runs at a time, a flush that finds another one running returns
+        None right away. The issues that are created for tasks are kept in
+        the outbox until set_issues has added them to the tasks.
+
+        :return: tuple
+            (number of calls that were sent, entries that are left in the outbox)
+        """
+        flush_lock = FileLock(self.flush_lock_path, timeout=0)
+        try:
+            flush_lock.acquire()
+        except TimeoutError:
+            return None
+        try:
+            tried = set()
+            sent_count = 0
+            while True:  # Calls that are queued while a round is sent are sent by the next round
+                groups = {}
+                for entry in self.entries():
+                    if entry['number'] not in tried:
+                        subject = entry['task'] or entry['issue'] or entry['number']
+                        groups.setdefault(str(subject), []).append(entry)
+                        tried.add(entry['number'])
+                if not groups:
+                    break
+                sent = set()
+                failed = {}
+                created = []
+                for _, (group_sent, group_failed, issue) in gateway.map(lambda group: self._send(gateway, group), groups.values()):
+                    sent.update(group_sent)
+                    failed.update(group_failed)
+                    if issue is not None:
+                        created.append(issue)
+                self._finish(sent, failed, created)
+                sent_count += len(sent)
+            return sent_count, self.entries()
+        finally:
+            flush_lock.release()
+
+    @staticmethod
+    def _send(gateway, entries: list) -> tuple:
+        """ Send the calls of one task in order, stop at the first call that fails """
+        sent = []
+        failed = {}
+        created = None
+        issue = None
+        for number, entry in enumerate(entries):
+            issue = entry['issue'] or issue
+            if entry['method'] == 'create_issue':
+                result = gateway.call('create_issue', *entry['args'])
+                if result:
+                    issue = result
+                    if entry['task'] is not None:
+                        created = entry['task'] + [result]
+            elif issue is None:
+                result = None
+            else:
+                result = gateway.call(entry['method'], issue, *entry['args'])
+            if not result:
+                reason = gateway.last_error or f'{entry["method"]} failed'
+                if entry['method'] != 'create_issue' and issue is None:
+                    reason = 'The task has no Jira issue'
+                for later in entries[number:]:  # A later call may depend on this one, e.g. a transition on a create
+                    failed[later['number']] = reason if later is entry else f'Waiting for call {entry["number"]}'
+                break
+            sent.append(entry['number'])
+        return sent, failed, created
+
+    def _finish(self, sent: set, failed: dict, created: list) -> None:
+        """ Remove the sent calls and add the created issues to the calls that are left """
+        with FileLock(self.lock_path):
+            data = self._read()
+            data['created'] += created
+            issues = {(list_name, task_id): issue for list_name, task_id, issue in data['created']}
+            entries = []
+            for entry in data['entries']:  # Also the calls that were queued while this flush was running
+                if entry['number'] in sent:
+                    continue
+                if entry['number'] in failed:
+                    entry['attempts'] += 1
+                    entry['error'] = failed[entry['number']]
+                if entry['issue'] is None and entry['task'] is not None:
+                    entry['issue'] = issues.get(tuple(entry['task']))
+                entries.append(entry)
+            data['entries'] = entries
+            self._write(data)
+
+    def set_issues(self, settings: dict = None) -> list:
+        """ Add the issues that flush created to their tasks, in whichever list the task is
+
+        :return: list
+            [list name, task ID, issue] of every task that got its issue
+        """
+        created = self._read()['created']
+        for list_name, task_id, issue in created:
+            if not get_list_path(TODO_PATH, list_name).exists():  # The list was removed in the meantime
+                continue
+            storage = open_storage(TODO_PATH, list_name, settings)
+            with storage.write_lock(LOCK_DIR):
+                task = storage.get_task(task_id)
+                if task is not None:
+                    storage.update_task(task_id, issue=issue)
+                    storage.flush()
+            if task is not None:
+                search_index = SearchIndex(storage)
+                with search_index.write_lock(LOCK_DIR):
+                    search_index.add(task_id, storage.get_task(task_id))
+                    search_index.flush()
+                search_index.close()
+            storage.close()
+        with FileLock(self.lock_path):
+            data = self._read()
+            data['created'] = [each for each in data['created'] if each not in created]
+            self._write(data)
+        return created
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {'count': 0, 'entries': [], 'created': []}
+        return JsonFile.read(self.path)
+
+    def _write(self, data: dict) -> None:
+        """ Write the outbox, or remove it when nothing is left in it """
+        if data['entries'] or data['created']:
+            JsonFile.write(self.path, data)
+        elif self.path.exists():
+            self.path.unlink()
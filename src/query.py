@@ -0,0 +1,273 @@
+""" Filter and sort tasks with a small query language
+
+    priority>=high and created>2026-01-01 sort:priority,-created
+    title~report or issue=ABC-1
+    done!=none sort:-done
+    due<=2026-06-30 sort:due
+
+A query is a list of conditions "field operator value" and an optional
+"sort:" with the fields to sort by (a "-" in front sorts the field from
+high to low). Conditions are joined with "and" (also when nothing is
+written between them) and "or", "and" binds first. Values with spaces are
+quoted. Operators are =, !=, <, <=, >, >= and ~ (contains, for text).
+
+priority and size are compared by their place in the settings (low <
+medium < high < critical), dates as dates ('today' is today, 'none' is a
+date that is not set) and text without regard to case.
+
+The query is parsed once into one predicate and one sort key function, and
+the tasks are filtered in a single pass. When only the first tasks are
+needed (--limit), they are picked with a heap instead of sorting every
+task that matches.
+"""
+import datetime
+import heapq
+import itertools
+import operator
+import re
+
+from src.task_record import TASK_FIELDS, TASK_PROPERTIES
+
+
+FIELDS = {  # name in a query: (field of the task, kind of value)
+    'id': ('id', 'number'),
+    'category': ('category', 'text'),
+    'issue': ('issue', 'text'),
+    'title': ('title', 'text'),
+    'description': ('description', 'text'),
+    'priority': ('priority', 'ordinal'),
+    'size': ('size', 'ordinal'),
+    'created': ('create_date', 'date'),
+    'done': ('done_date', 'date'),
+    'due': ('due_date', 'date'),
+    'is_done': ('is_done', 'text'),
+}
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<sort>sort:\S*)
+    | (?P<field>\w+)\s*(?P<operator>>=|<=|!=|=|>|<|~)\s*(?P<value>"[^"]*"|'[^']*'|[^\s"']+)
+    | (?P<word>and|or)(?=\s|$)
+)""", re.IGNORECASE | re.VERBOSE)
+
+
+class Query:
+    """ A parsed query, see the module docstring
+
+    :param text: str
+        The query
+    :param settings: dict
+        The check settings, the order of priority and size comes from their colors
+    :raises ValueError:
+        If the query cannot be parsed, with the reason
+    """
+    def __init__(self, text: str, settings: dict = None) -> None:
+        self.text = text
+        self.ordinals = {field: {value: number for number, value in enumerate((settings or {}).get(field, {}).get('colors', {}))}
+                         for field in ('priority', 'size')}
+        self.groups = [[]]  # Conditions joined by "or", of conditions joined by "and"
+        self.sort_fields = []  # (field, descending)
+        self._parse(text)
+        self.matches = self._compile_predicate()
+        self.sort_key = self._compile_sort_key() if self.sort_fields else None
+
+    @property
+    def sorts(self) -> bool:
+        return self.sort_key is not None
+
+    def _parse(self, text: str) -> None:
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if match is None or match.end() == position:
+                raise ValueError(f'Cannot read the query from "{text[position:].strip()}"')
+            position = match.end()
+            if match.group('sort'):
+                self._parse_sort(match.group('sort')[len('sort:'):])
+            elif match.group('word'):
+                if match.group('word').lower() == 'or':
+                    if not self.groups[-1]:
+                        raise ValueError('"or" needs a condition on both sides')
+                    self.groups.append([])
+            else:
+                value = match.group('value')
+                if value[0] in '"\'':
+                    value = value[1:-1]
+                self.groups[-1].append(self._compile_condition(match.group('field'), match.group('operator'), value))
+        if len(self.groups) > 1 and not self.groups[-1]:
+            raise ValueError('"or" needs a condition on both sides')
+
+    def _parse_sort(self, fields: str) -> None:
+        for name in filter(None, fields.split(',')):
+            descending = name.startswith('-')
+            self.sort_fields.append((self._field(name.lstrip('-+')), descending))
+        if not self.sort_fields:
+            raise ValueError('sort: needs at least one field, e.g. sort:priority,-created')
+
+    @staticmethod
+    def _field(name: str) -> str:
+        name = name.lower()
+        if name not in FIELDS:
+            raise ValueError(f'Unknown field "{name}", use one of {", ".join(FIELDS)}')
+        return name
+
+    def _getter(self, name: str):
+        """ Function (task_id, task, category) -> the value of a field """
+        field, _ = FIELDS[name]
+        if field == 'id':
+            return lambda task_id, task, category: int(task_id)
+        if field == 'category':
+            return lambda task_id, task, category: category
+        if field in TASK_FIELDS or field in TASK_PROPERTIES:
+            get = operator.attrgetter(field)
+            return lambda task_id, task, category: get(task)
+        return lambda task_id, task, category: task.get(field)
+
+    def _compile_condition(self, name: str, operator_text: str, value: str):
+        """ Function (task_id, task, category) -> True if the task meets the condition """
+        name = self._field(name)
+        kind = FIELDS[name][1]
+        get = self._getter(name)
+        if operator_text == '~':
+            if kind != 'text':
+                raise ValueError(f'~ only works on text, not on {name}')
+            value = value.lower()
+            return lambda task_id, task, category: value in str(get(task_id, task, category) or '').lower()
+        compare = OPERATORS[operator_text]
+        if kind == 'text':
+            if operator_text not in ('=', '!='):
+                raise ValueError(f'{name} can only be compared with =, != or ~')
+            value = value.lower()
+            return lambda task_id, task, category: compare(str(get(task_id, task, category) or '').lower(), value)
+        if kind == 'number':
+            try:
+                number = int(value)
+            except ValueError:
+                raise ValueError(f'{name} must be a number, not "{value}"') from None
+            return lambda task_id, task, category: compare(get(task_id, task, category), number)
+        if kind == 'ordinal':
+            ordinals = self.ordinals[name]
+            if value.lower() not in ordinals:
+                raise ValueError(f'Unknown {name} "{value}", use one of {", ".join(ordinals)}')
+            ordinal = ordinals[value.lower()]
+            return lambda task_id, task, category: _compare_ordinals(compare, ordinals.get(get(task_id, task, category)), ordinal)
+        date = parse_date(value)
+        if date is None:
+            if operator_text not in ('=', '!='):
+                raise ValueError('none can only be compared with = or !=')
+            return lambda task_id, task, category: compare(get(task_id, task, category), None)
+        return lambda task_id, task, category: _compare_dates(compare, get(task_id, task, category), date)
+
+    def _compile_predicate(self):
+        groups = [group for group in self.groups if group]
+        if not groups:
+            return lambda task_id, task, category=None: True
+        if len(groups) == 1 and len(groups[0]) == 1:
+            condition = groups[0][0]
+            return lambda task_id, task, category=None: condition(task_id, task, category)
+        return lambda task_id, task, category=None: any(all(condition(task_id, task, category) for condition in group)
+                                                         for group in groups)
+
+    def _compile_sort_key(self):
+        """ Function (task_id, task, category) -> a tuple that sorts the tasks, ties are sorted by ID """
+        parts = [(self._sort_getter(name), descending, FIELDS[name][1] == 'text') for name, descending in self.sort_fields]
+
+        def key(task_id, task, category=None) -> tuple:
+            values = []
+            for get, descending, is_text in parts:
+                value = get(task_id, task, category)
+                if value is None:  # Not set, last in both directions
+                    values.append((1, 0))
+                elif descending:
+                    values.append((0, _Descending(value) if is_text else -value))
+                else:
+                    values.append((0, value))
+            values.append(int(task_id) if task_id.isdigit() else task_id)
+            return tuple(values)
+        return key
+
+    def _sort_getter(self, name: str):
+        """ Function (task_id, task, category) -> the value of a field to sort by, None if it is not set """
+        get = self._getter(name)
+        kind = FIELDS[name][1]
+        if kind == 'ordinal':
+            ordinals = self.ordinals[name]
+            unknown = len(ordinals)  # After every value of the settings
+            return lambda task_id, task, category: ordinals.get(get(task_id, task, category), unknown)
+        if kind == 'date':
+            return lambda task_id, task, category: _date_number(get(task_id, task, category))
+        if kind == 'text':
+            return lambda task_id, task, category: _text(get(task_id, task, category))
+        return get
+
+    def select(self, rows, offset: int = 0, limit: int = None, fields=None) -> list:
+        """ The rows that match, sorted if the query sorts, from offset on and at most limit
+
+        :param rows:
+            Iterable of rows, (task_id, task) unless fields is given
+        :param fields:
+            Function row -> (task_id, task, category)
+        """
+        fields = fields or (lambda row: (row[0], row[1], None))
+        matches = (row for row in rows if self.matches(*fields(row)))
+        end = None if limit is None else offset + limit
+        if not self.sorts:
+            return list(itertools.islice(matches, offset, end))
+        key = lambda row: self.sort_key(*fields(row))
+        if end is None:
+            return sorted(matches, key=key)[offset:]
+        return heapq.nsmallest(end, matches, key=key)[offset:]
+
+
+class _Descending:
+    """ Text that sorts from Z to A """
+    __slots__ = ('value',)
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+    def __lt__(self, other: '_Descending') -> bool:
+        return self.value > other.value
+
+    def __eq__(self, other: '_Descending') -> bool:
+        return self.value == other.value
+
+
+def parse_date(value: str):
+    """ Read a date of a query, None for 'none' """
+    value = value.lower()
+    if value == 'none':
+        return None
+    if value == 'today':
+        return datetime.date.today()
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a date, use YYYY-MM-DD, today or none') from None
+
+
+def _compare_dates(compare, value, date: datetime.date) -> bool:
+    if not isinstance(value, datetime.date):  # Not set, or not a date in the file
+        return compare is operator.ne
+    return compare(value, date)
+
+
+def _compare_ordinals(compare, value: int, ordinal: int) -> bool:
+    if value is None:  # A value that is not in the settings
+        return compare is operator.ne
+    return compare(value, ordinal)
+
+
+def _date_number(value):
+    return value.toordinal() if isinstance(value, datetime.date) else None
+
+
+def _text(value):
+    return None if value is None else str(value).lower()
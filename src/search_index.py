@@ -0,0 +1,197 @@
+""" Inverted index over the text of the tasks in a list
+
+Title, description and issue are split into lowercase word tokens. Every
+token points to the tasks that contain it, so a search only looks at the
+tasks that match instead of every task in the list.
+
+The postings (token, task, weight) are stored in a SQLite database next to
+the list (<list>.search.db), with the token as the start of the primary key.
+A search reads only the postings of the tokens that start with its words,
+so a new process does not have to load or build anything before it can
+answer, however long the list is.
+"""
+import heapq
+import re
+
+from pathlib import Path
+from src.file_handler import FileLock
+from src import tracing
+
+
+INDEX_SUFFIX = '.search.db'
+LEGACY_INDEX_SUFFIXES = ('.search', '.search_journal')  # The json snapshot and journal of older versions
+FIELD_WEIGHTS = {
+    'title': 3,
+    'issue': 2,
+    'description': 1,
+}
+TOKEN_PATTERN = re.compile(r'\w+')
+PREFIX_END = '\U0010ffff'  # Sorts after every character, word <= token < word + PREFIX_END is a prefix match
+
+
+def tokenize(text) -> list:
+    if text is None:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def get_index_files(list_path: Path) -> list:
+    suffixes = (INDEX_SUFFIX,) + LEGACY_INDEX_SUFFIXES
+    return [Path(list_path).with_suffix(suffix) for suffix in suffixes]
+
+
+def get_weights(tokens: list) -> dict:
+    """ Get {token: weight} of a task from its tokens per field, see FIELD_WEIGHTS """
+    weights = {}
+    for field_tokens, weight in zip(tokens, FIELD_WEIGHTS.values()):
+        for token in field_tokens:
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+class SearchIndex:
+    """ Token and prefix search with relevance ranking
+
+    Changes are only recorded in memory until flush, so adding or changing a
+    task does not open the index. The index is built from the list the first
+    time something is searched.
+
+    :param storage:
+        The storage of the list, see src.storage
+    """
+    schema = (
+        """CREATE TABLE IF NOT EXISTS postings (
+            token TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            weight INTEGER NOT NULL,
+            PRIMARY KEY (token, task_id)
+        ) WITHOUT ROWID""",
+        'CREATE INDEX IF NOT EXISTS idx_postings_task ON postings (task_id)',
+    )
+
+    def __init__(self, storage) -> None:
+        self.storage = storage
+        self.path = Path(storage.file_path).with_suffix(INDEX_SUFFIX)
+        self._connection = None
+        self._pending = []
+
+    @property
+    def files(self) -> list:
+        return [self.path]
+
+    @property
+    def connection(self) -> 'sqlite3.Connection':
+        if self._connection is None:
+            import sqlite3
+            self._connection = sqlite3.connect(str(self.path))
+        return self._connection
+
+    def write_lock(self, lock_dir: Path) -> FileLock:
+        """ The lock that is held while the index is written """
+        return FileLock(Path(lock_dir) / (self.path.stem + '.lock'))
+
+    def add(self, task_id: str, task: dict) -> None:
+        """ Index a new task, or index a changed task again """
+        tokens = [tokenize(task.get(field)) for field in FIELD_WEIGHTS]
+        self._pending.append(['index', task_id, tokens])
+
+    def remove(self, task_id: str) -> None:
+        self._pending.append(['remove', task_id])
+
+    def rebase(self, id_map: dict) -> None:
+        """ Give the changes that are not flushed yet the new IDs of their tasks
+
+        :param id_map: dict
+            {old task ID: new task ID} of the tasks that got another ID, see rebase in src.storage
+        """
+        self._pending = [[record[0], id_map.get(record[1], record[1])] + record[2:] for record in self._pending]
+
+    def search(self, query: str, limit: int = None) -> list:
+        """ Find the tasks that match every word in the query
+
+        A word matches a token that is equal to it or starts with it. Every
+        matching token adds its weight to the score of the task, the weight
+        is higher for the title than for the description (see FIELD_WEIGHTS)
+        and doubled for an exact match. A task with several matching words in
+        its description can therefore rank above a task with one in its title.
+
+        :return: list
+            Task IDs, the most relevant first
+        """
+        if not self._is_built():
+            with tracing.span('search index build'):
+                self.rebuild()
+        changed = {}  # Tasks with changes that are not flushed yet, scored from memory
+        for record in self._pending:
+            changed[record[1]] = get_weights(record[2]) if record[0] == 'index' else {}
+
+        scores = None
+        for word in set(tokenize(query)):
+            word_scores = {}
+            rows = self.connection.execute('SELECT token, task_id, weight FROM postings WHERE token >= ? AND token < ?',
+                                           (word, word + PREFIX_END))
+            for token, task_id, weight in rows:
+                if task_id not in changed:
+                    word_scores[task_id] = word_scores.get(task_id, 0) + weight * (2 if token == word else 1)
+            for task_id, weights in changed.items():
+                for token, weight in weights.items():
+                    if token.startswith(word):
+                        word_scores[task_id] = word_scores.get(task_id, 0) + weight * (2 if token == word else 1)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {task_id: score + word_scores[task_id] for task_id, score in scores.items() if task_id in word_scores}
+        if not scores:
+            return []
+
+        def rank(item):
+            task_id, score = item
+            return -score, int(task_id)
+
+        if limit is None:
+            ranked = sorted(scores.items(), key=rank)
+        else:
+            ranked = heapq.nsmallest(limit, scores.items(), key=rank)
+        return [task_id for task_id, _ in ranked]
+
+    def rebuild(self) -> None:
+        """ Build the whole index from the tasks in the list, in one transaction """
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        for statement in self.schema:
+            connection.execute(statement)
+        connection.execute('DELETE FROM postings')
+        rows = ((token, task_id, weight)
+                for _, task_id, task in self.storage.all_tasks()
+                for token, weight in get_weights([tokenize(task.get(field)) for field in FIELD_WEIGHTS]).items())
+        connection.executemany('INSERT INTO postings (token, task_id, weight) VALUES (?, ?, ?)', rows)
+        connection.commit()
+
+    def flush(self) -> None:
+        """ Write the changes since the last flush in one transaction
+
+        Nothing is written before the index has been built once, the first
+        search builds it from the list.
+        """
+        if not self._pending or not self.path.exists():
+            self._pending = []
+            return
+        connection = self.connection
+        if not self._is_built():  # Another process is building it, it builds it with these changes
+            self._pending = []
+            return
+        for record in self._pending:
+            connection.execute('DELETE FROM postings WHERE task_id = ?', (record[1],))
+            if record[0] == 'index':
+                connection.executemany('INSERT INTO postings (token, task_id, weight) VALUES (?, ?, ?)',
+                                       [(token, record[1], weight) for token, weight in get_weights(record[2]).items()])
+        connection.commit()
+        self._pending = []
+
+    def _is_built(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'postings'").fetchone() is not None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,110 @@
+""" Long running check process that answers commands over a Unix domain socket
+
+The server keeps one session, so the settings and the active list stay in
+memory between commands. Before every command the session is refreshed,
+which reloads anything that another process changed on disk.
+
+Protocol: the client sends one json line {"args": [...], "input": "...",
+"columns": 120} and gets one json line {"exit_code": 0, "output": "..."} back.
+
+Between commands the server also sends the Jira outbox (see src.outbox) in a
+background thread, instead of starting a 'check jira flush' per command.
+"""
+import importlib.util
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from pathlib import Path
+from src.session import Session
+from src.outbox import Outbox
+from src.constants import OUTBOX_FLUSH_INTERVAL
+
+
+def send_request(socket_path: Path, request: dict, timeout: float = None) -> dict:
+    """ Send one request to a running server and return the response """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        response = b''
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    return json.loads(response)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        response = self.server.run_command(request)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class Server(socketserver.UnixStreamServer):
+    """ Run the commands of a click group for clients that connect to socket_path
+
+    Commands run one at a time, which keeps the shared session consistent.
+
+    :param command_group: click.Group
+        The check group from cli.py
+    """
+    def __init__(self, socket_path: Path, command_group) -> None:
+        self.socket_path = Path(socket_path)
+        self.command_group = command_group
+        self.session = Session(autoflush=False)
+        self.outbox = Outbox()
+        self._outbox_thread = None
+        self._next_outbox_flush = 0
+        if self.socket_path.exists():
+            self.socket_path.unlink()  # Left behind by a server that did not shut down cleanly
+        super().__init__(str(self.socket_path), _RequestHandler)
+
+    def run_command(self, request: dict) -> dict:
+        from click.testing import CliRunner
+
+        self.session.refresh()
+        env = {'COLUMNS': str(request['columns'])} if request.get('columns') else None
+        runner = CliRunner()
+        result = runner.invoke(self.command_group, request.get('args', []), input=request.get('input'),
+                               obj=self.session, env=env)
+        output = result.output
+        if result.exception is not None and not isinstance(result.exception, SystemExit):
+            output += f'{result.exception}\n'
+        self.session.flush()
+        self._next_outbox_flush = 0  # The command may have queued Jira calls
+        return {'exit_code': result.exit_code, 'output': output}
+
+    def service_actions(self) -> None:
+        """ Send the Jira outbox in a background thread, called by serve_forever between commands
+
+        Only the Jira calls run in the thread. The issues that they created are
+        added to the tasks here, so they never interleave with a command.
+        """
+        if self._outbox_thread is not None:
+            if self._outbox_thread.is_alive():
+                return
+            self._outbox_thread = None
+            self.outbox.set_issues(self.session.settings)
+        if time.monotonic() < self._next_outbox_flush or self.outbox.is_empty():
+            return
+        self._next_outbox_flush = time.monotonic() + OUTBOX_FLUSH_INTERVAL
+        if importlib.util.find_spec('simple_vira') is None:
+            return
+        self._outbox_thread = threading.Thread(target=self.outbox.flush, args=(self.session.jira,), daemon=True)
+        self._outbox_thread.start()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._outbox_thread is not None:
+            self._outbox_thread.join()  # It sends through the Jira gateway of the session
+            self.outbox.set_issues(self.session.settings)
+        self.session.close()
+        if self.socket_path.exists():
+            os.unlink(self.socket_path)
@@ -0,0 +1,218 @@
+""" Unit of work that is shared by everything that runs during one command """
+import copy
+
+from pathlib import Path
+from src.file_handler import JsonFile, FileLock, get_file_stamp
+from src.archive import archive_done_tasks
+from src.storage import open_storage, get_stamps
+from src.deadlines import DeadlineIndex
+from src.history import History
+from src.search_index import SearchIndex
+from src import tracing
+from src.constants import SETTINGS_PATH, TODO_PATH, LOCK_DIR, SETTINGS_LOCK_PATH
+
+
+def merge_changes(base, ours, theirs):
+    """ Three-way merge of json values: what changed from base to ours is made on top of theirs """
+    if isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict):
+        merged = dict(theirs)
+        for key in set(base) | set(ours):
+            if key not in ours:
+                merged.pop(key, None)
+            elif key not in base:
+                merged[key] = ours[key]
+            elif key not in theirs:
+                if ours[key] != base[key]:
+                    merged[key] = ours[key]
+            else:
+                merged[key] = merge_changes(base[key], ours[key], theirs[key])
+        return merged
+    return theirs if ours == base else ours
+
+
+class Session:
+    """ Load the settings and the active todo list at most once per command
+
+    The settings and the active list are read lazily the first time they are
+    needed. Changes are only marked as dirty and written with one flush.
+
+    The session remembers the modification time and size of every file that
+    it reads or writes, so refresh can tell when another process (or a command
+    that writes the files directly, like 'check todo use') changed them.
+
+    Nothing is locked while the files are read, the active list is only
+    locked while flush writes it. If another process has written the list
+    since this session read it, the changes of this session are made again
+    on top of the new version first (see src.storage), so two processes
+    never overwrite each other. Tasks that this session added get new IDs if
+    the other process used theirs, see renumbered. Changed settings are
+    merged with the settings on disk in the same way.
+
+    Done tasks that are old enough are moved to the archive of the list when
+    it is written, see src.archive. The index of the due dates is updated in
+    the same flush, see src.deadlines, and so are the undo steps of the
+    changes, see src.history.
+
+    :param autoflush: bool
+        Write every change right away. The CLI turns this off and flushes
+        once when the command is done.
+    """
+    def __init__(self, autoflush: bool = True) -> None:
+        self.autoflush = autoflush
+        self._settings = None
+        self._storage = None
+        self._search_index = None
+        self._history = None
+        self._jira = None
+        self._settings_dirty = False
+        self._todo_dirty = False
+        self._file_stamps = {}
+        self._settings_base = None
+        self.renumbered = {}  # {old task ID: new task ID} of the tasks that the last flush gave another ID
+
+    @property
+    def settings(self) -> dict:
+        if self._settings is None:
+            self._remember([SETTINGS_PATH])  # Before the read, a change in between is then seen by refresh
+            with tracing.span('settings load'):
+                self._settings = JsonFile.read(SETTINGS_PATH)
+            self._settings_base = copy.deepcopy(self._settings)
+        return self._settings
+
+    @property
+    def active_list_name(self) -> str:
+        return self.settings['lists']['active']
+
+    @property
+    def active_list_path(self) -> Path:
+        return self.storage.file_path
+
+    @property
+    def storage(self):
+        """ The storage engine of the active list, see src.storage """
+        if self._storage is None:
+            self._storage = open_storage(TODO_PATH, self.active_list_name, self.settings)
+            self._remember(self._storage.files)
+        return self._storage
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """ Full text index of the active list, see src.search_index """
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.storage)
+        return self._search_index
+
+    @property
+    def history(self) -> History:
+        """ Undo and redo steps of the active list, see src.history """
+        if self._history is None:
+            self._history = History(self.storage.file_path)
+        return self._history
+
+    @property
+    def jira(self):
+        """ Pooled access to Jira, see src.jira_gateway
+
+        It is kept for the whole session, so 'check serve' reuses the Jira
+        connections between commands.
+        """
+        if self._jira is None:
+            from src.jira_gateway import JiraGateway
+            self._jira = JiraGateway()
+        return self._jira
+
+    def save_settings(self) -> None:
+        """ Mark the settings as changed """
+        self._settings_dirty = True
+        if self.autoflush:
+            self.flush()
+
+    def save_todo(self) -> None:
+        """ Mark the active todo list as changed """
+        self._todo_dirty = True
+        if self.autoflush:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Write everything that has changed since the last flush """
+        if not (self._settings_dirty or self._todo_dirty):
+            self.renumbered = {}
+            return
+        with tracing.span('write'):
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._settings_dirty:
+            with FileLock(SETTINGS_LOCK_PATH):
+                on_disk = JsonFile.read(SETTINGS_PATH) if SETTINGS_PATH.exists() else self._settings_base
+                self._settings = merge_changes(self._settings_base, self._settings, on_disk)
+                JsonFile.write(SETTINGS_PATH, self._settings)
+                self._remember([SETTINGS_PATH])
+            self._settings_base = copy.deepcopy(self._settings)
+            self._settings_dirty = False
+        self.renumbered = {}
+        if self._todo_dirty:
+            with self._storage.write_lock(LOCK_DIR):
+                stale = self._storage.is_stale()
+                if stale:
+                    self.renumbered = self._storage.rebase()
+                with tracing.span('archive'):
+                    archived = archive_done_tasks(self._storage, self.settings, LOCK_DIR)
+                for task_id in archived:
+                    self.search_index.remove(task_id)
+                base_stamps = get_stamps(self._storage)  # The version that the changes are made on, after the rebase
+                changed_ids = self._storage.changed_ids()
+                with tracing.span('list write'):
+                    self._storage.flush()
+                self._remember(self._storage.files)
+                deadlines = DeadlineIndex(self._storage.file_path)
+                with deadlines.write_lock(LOCK_DIR), tracing.span('deadline index write'):
+                    deadlines.update(self._storage, changed_ids, base_stamps)
+            if self._search_index is not None:
+                with self._search_index.write_lock(LOCK_DIR), tracing.span('search index write'):
+                    if stale:
+                        self._search_index.rebase(self.renumbered)
+                    self._search_index.flush()
+            if self._history is not None:
+                with self._history.write_lock(LOCK_DIR):
+                    self._history.flush(self.renumbered)
+            self._todo_dirty = False
+
+    def new_id(self, task_id: str) -> str:
+        """ The ID that a task which was added in this session got when it was written """
+        return self.renumbered.get(task_id, task_id)
+
+    def reset(self) -> None:
+        """ Forget everything that has been loaded, e.g. after the files were changed elsewhere """
+        self.close()
+        self._settings = None
+        self._file_stamps = {}
+
+    def _remember(self, paths: list) -> None:
+        """ Remember the modification time and size of files that the session read or wrote, see refresh """
+        for path in paths:
+            self._file_stamps[path] = get_file_stamp(path)
+
+    def refresh(self) -> None:
+        """ Forget the loaded files if any of them was changed since the session read or wrote it
+
+        Used by long running processes (check serve) that keep a session between commands.
+        """
+        if any(get_file_stamp(path) != stamp for path, stamp in self._file_stamps.items()):
+            self._settings_dirty = False
+            self._todo_dirty = False
+            self.reset()
+
+    def close(self) -> None:
+        """ Flush and release the storage of the active list """
+        self.flush()
+        if self._storage is not None:
+            self._storage.close()
+        self._storage = None
+        if self._search_index is not None:
+            self._search_index.close()
+        self._search_index = None
+        self._history = None
+        if self._jira is not None:
+            self._jira.close()
+        self._jira = None
@@ -0,0 +1,63 @@
+""" Parsed settings that are shared by the code that only reads them
+
+Validating a priority, checking if a list exists or getting the name of the
+active list used to read and parse todo_settings.json every time. The cache
+keeps the parsed file and reads it again only when its modification time or
+size has changed, so 'check serve' and 'check batch' can validate thousands
+of options without touching the disk, and still see a list that another
+process has added.
+
+The settings that the cache returns are shared and must not be changed.
+Code that changes the settings reads the file under SETTINGS_LOCK_PATH (or
+uses a Session), the write changes the stamp and the next get reads it.
+"""
+import threading
+
+from pathlib import Path
+from src.file_handler import JsonFile, get_file_stamp
+
+
+class SettingsCache:
+    """ Settings files by path, with the sets that are looked up often """
+    def __init__(self) -> None:
+        self._entries = {}  # {path: (stamp, settings, {name: frozenset})}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> dict:
+        """ The parsed settings file, read again if it changed since the last get """
+        return self._entry(path)[1]
+
+    def options(self, path: Path, section: str) -> frozenset:
+        """ The valid values of a section with colors, e.g. 'priority' or 'size' """
+        return self._lookup(path, section, lambda settings: frozenset(settings[section]['colors']))
+
+    def list_names(self, path: Path) -> frozenset:
+        """ The names of every list, active and inactive """
+        def names(settings: dict) -> frozenset:
+            lists = settings['lists']
+            return frozenset(lists['inactive']) | {lists['active']}
+        return self._lookup(path, 'lists', names)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+
+    def _lookup(self, path: Path, name: str, build) -> frozenset:
+        _, settings, lookups = self._entry(path)
+        lookup = lookups.get(name)
+        if lookup is None:
+            lookup = lookups[name] = build(settings)
+        return lookup
+
+    def _entry(self, path: Path) -> tuple:
+        path = Path(path)
+        stamp = get_file_stamp(path)  # Before the read, a change in between is seen by the next get
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stamp or stamp is None:
+            entry = (stamp, JsonFile.read(path), {})
+            with self._lock:
+                self._entries[path] = entry
+        return entry
+
+
+settings_cache = SettingsCache()
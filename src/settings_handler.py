@@ -2,8 +2,10 @@
 import shutil
 import re
 
-from src.file_handler import JsonFile
-from src.constants import SETTINGS_PATH, APPDATA_DIR, TODO_PATH, DELETED_DIR
+from src.file_handler import JsonFile, FileLock
+from src.settings_cache import settings_cache
+from src.storage import get_list_files
+from src.constants import SETTINGS_PATH, APPDATA_DIR, TODO_PATH, DELETED_DIR, SETTINGS_LOCK_PATH
 from pathlib import Path
 
 
@@ -16,13 +18,11 @@ class Todo:
 
     @staticmethod
     def get_active_todo_list() -> str:
-        settings_data = JsonFile.read(SETTINGS_PATH)
-        return settings_data['lists']['active']
+        return settings_cache.get(SETTINGS_PATH)['lists']['active']
 
     @staticmethod
     def get_inactive_todo_list() -> list:
-        settings_data = JsonFile.read(SETTINGS_PATH)
-        return settings_data['lists']['inactive']
+        return list(settings_cache.get(SETTINGS_PATH)['lists']['inactive'])
 
     def get_todo_list_path(self, list_name: str) -> str:
         full_path = Path(APPDATA_DIR) / list_name + '.json'
@@ -30,53 +30,47 @@ class Todo:
 
     @staticmethod
     def create_todo_list(name: str):
-        settings = JsonFile.read(SETTINGS_PATH)
-        settings['lists']['inactive'].append(name)
-        JsonFile.write(SETTINGS_PATH, settings)
+        with FileLock(SETTINGS_LOCK_PATH):
+            settings = JsonFile.read(SETTINGS_PATH)
+            settings['lists']['inactive'].append(name)
+            JsonFile.write(SETTINGS_PATH, settings)
         print(f'Todo list with the name {name} has been created')
 
     @staticmethod
     def remove_todo_list(name: str):
-        settings = JsonFile.read(SETTINGS_PATH)
-        settings['lists']['inactive'].remove(name)
-        JsonFile.write(SETTINGS_PATH, settings)
+        with FileLock(SETTINGS_LOCK_PATH):
+            settings = JsonFile.read(SETTINGS_PATH)
+            settings['lists']['inactive'].remove(name)
+            JsonFile.write(SETTINGS_PATH, settings)
 
     @staticmethod
     def remove_todo_file(name: str):
         """ Move the 'deleted' directory to have a bit of a backup """
-        file_path = Path(TODO_PATH) / (name + '.json')
-        destination_path = Path(DELETED_DIR) / (name + '.json')
-        shutil.move(str(file_path), str(destination_path))
+        for file_path in get_list_files(TODO_PATH, name):
+            destination_path = Path(DELETED_DIR) / file_path.name
+            shutil.move(str(file_path), str(destination_path))
 
     @staticmethod
     def is_active_list(name: str) -> bool:
-        settings = JsonFile.read(SETTINGS_PATH)
-        if settings['lists']['active'] == name:
+        if Todo.get_active_todo_list() == name:
             print(f'{name} is already the active list')
             return True
         return False
 
     @staticmethod
     def list_exists(list_name: str) -> bool:
-        settings = JsonFile.read(SETTINGS_PATH)
-        for _, value in settings['lists'].items():
-            if isinstance(value, list):
-                for each in value:
-                    if each == list_name:
-                        return True
-            elif value == list_name:
-                return True
-        return False
+        return list_name in settings_cache.list_names(SETTINGS_PATH)
 
     @staticmethod
     def change_active_todo_list(new_list):
-        settings = JsonFile.read(SETTINGS_PATH)
-        old_active = settings['lists']['active']
-        if not old_active == "":
-            settings['lists']['inactive'].append(old_active)  # Move old active to inactive
-        settings['lists']['active'] = new_list  # Activate new list as active
-        settings['lists']['inactive'].remove(new_list)  # Remove the new active from the inactive list
-        JsonFile.write(SETTINGS_PATH, settings)
+        with FileLock(SETTINGS_LOCK_PATH):
+            settings = JsonFile.read(SETTINGS_PATH)
+            old_active = settings['lists']['active']
+            if not old_active == "":
+                settings['lists']['inactive'].append(old_active)  # Move old active to inactive
+            settings['lists']['active'] = new_list  # Activate new list as active
+            settings['lists']['inactive'].remove(new_list)  # Remove the new active from the inactive list
+            JsonFile.write(SETTINGS_PATH, settings)
         print(f'{new_list} is now the active list')
 
 
@@ -3,8 +3,11 @@ import os
 import json
 
 from pathlib import Path
-from src.file_handler import JsonFile
+from src.session import Session
+from src.storage import get_list_path, create_storage
 from src.constants import APPDATA_DIR, SETTINGS_PATH, TODO_PATH, DELETED_DIR, JIRA_CONFIG_PATH
+from src.constants import APP_VERSION, JOURNAL_COMPACT_THRESHOLD, SETUP_MARKER_PATH
+from src.constants import JIRA_TIMEOUT, JIRA_RETRIES, JIRA_BACKOFF, JIRA_WORKERS
 
 
 class Files:
@@ -40,6 +43,9 @@ class Files:
                     "yes": "green",
                     "no": "red"
                 }
+            },
+            "storage": {
+                "compact_threshold": JOURNAL_COMPACT_THRESHOLD
             }
         }
         self.jira_config_dict = {
@@ -71,7 +77,13 @@ class Files:
                 "done": None
             },
             "feature_link": None,
-            "components": None
+            "components": None,
+            "gateway": {
+                "timeout": JIRA_TIMEOUT,
+                "retries": JIRA_RETRIES,
+                "backoff": JIRA_BACKOFF,
+                "workers": JIRA_WORKERS
+            }
         }
 
     def ensure_appdata_dir(self):
@@ -84,18 +96,19 @@ class Files:
             DELETED_DIR.mkdir(parents=True, exist_ok=True)
             print(f'Created delete directory in {DELETED_DIR}')
 
-    def ensure_settings_file(self):
+    def ensure_settings_file(self, session: Session = None):
         if not SETTINGS_PATH.exists():
             SETTINGS_PATH.write_text(json.dumps(self.settings_dict))
             print(f'Created a new settings file in {SETTINGS_PATH}')
         else:  # If upgrading from old version, it might not have lists implemented
-            settings_data = JsonFile.read(SETTINGS_PATH)
+            session = session or Session()
+            settings_data = session.settings
             if not "lists" in settings_data.keys():
                 settings_data["lists"] = {
                     "active": "",
                     "inactive": []
                 }
-                JsonFile.write(SETTINGS_PATH, settings_data)
+                session.save_settings()
                 print('Added lists section to settings')
 
     def ensure_todo_file(self) -> bool:
@@ -106,11 +119,39 @@ class Files:
             return False
         return True
 
+    @staticmethod
+    def ensure_active_list(session: Session = None):
+        """ Create the active list again, empty, if its file was removed """
+        session = session or Session()
+        name = session.active_list_name
+        if name and not get_list_path(TODO_PATH, name).exists():
+            create_storage(TODO_PATH, name)
+            print(f'Created a new empty todo list {name} in {TODO_PATH}, the old one was removed')
+
     def ensure_jira_config_file(self):
         if not JIRA_CONFIG_PATH.exists():
             JIRA_CONFIG_PATH.write_text(json.dumps(self.jira_config_dict))
             print(f'Created a new Jira configuration file in {JIRA_CONFIG_PATH}')
 
+    @staticmethod
+    def is_setup_complete(session: Session = None) -> bool:
+        """ Check the marker that is written when every ensure_* step has passed for this version
+
+        The settings and the active list must also still be there, they are
+        created again by the setup if they were removed after it ran.
+        """
+        try:
+            if SETUP_MARKER_PATH.read_text() != APP_VERSION:
+                return False
+            session = session or Session()
+            return get_list_path(TODO_PATH, session.active_list_name).exists()
+        except (OSError, KeyError, ValueError):  # No settings, or settings without an active list
+            return False
+
+    @staticmethod
+    def mark_setup_complete():
+        SETUP_MARKER_PATH.write_text(APP_VERSION)
+
 
 if __name__ == '__main__':
     files = Files()
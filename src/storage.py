@@ -0,0 +1,589 @@
+""" Storage engines for the todo lists
+
+Every list is stored either as one json file (the default) or as a SQLite
+database. Both engines have the same interface, so the task logic does not
+need to know how the list is stored.
+
+Lists are read without a lock. Every engine keeps the changes that are not
+flushed yet as records, and knows the version of the list that they were
+made on. If another process has written the list since then (is_stale),
+rebase makes the changes again on top of the new version, so two writers
+never overwrite each other. The caller holds write_lock from the check
+until the flush (see src.session).
+"""
+import contextlib
+import itertools
+import json
+import shutil
+
+from pathlib import Path
+from src.file_handler import JsonFile, FileLock, get_file_stamp
+from src.journal import Journal
+from src.search_index import get_index_files
+from src import tracing
+from src.task_record import Task, TASK_FIELDS, task_from_json_object, encode_task
+from src.constants import (CATEGORIES, DELETED_DIR, JOURNAL_COMPACT_THRESHOLD, SYNC_STATE_SUFFIX, ARCHIVE_SUFFIX, DEADLINES_SUFFIX,
+                           UNDO_SUFFIX, REDO_SUFFIX)
+
+
+STORAGE_SUFFIXES = {
+    'json': '.json',
+    'sqlite': '.db',
+}
+
+
+def renumber_records(records: list, base_id_count: int, id_count: int) -> tuple:
+    """ Give the tasks that records added after base_id_count the IDs after id_count
+
+    Used when changes that were made on an old version of a list are made
+    again on a newer one, where another process may have used the same IDs.
+    The records are in the journal format of JsonStorage.
+
+    :return: tuple
+        (renumbered records, {old task ID: new task ID})
+    """
+    shift = id_count - base_id_count
+    if shift <= 0:
+        return records, {}
+    id_map = {}
+
+    def new_id(task_id: str) -> str:
+        try:
+            number = int(task_id)
+        except (TypeError, ValueError):
+            return task_id
+        if number <= base_id_count:  # A task that was in the list before, it keeps its ID
+            return task_id
+        id_map[task_id] = str(number + shift)
+        return id_map[task_id]
+
+    renumbered = []
+    for record in records:
+        operation = record[0]
+        if operation == 'id_count':
+            renumbered.append(['id_count', record[1] + shift if record[1] > base_id_count else id_count])
+        elif operation == 'add':
+            _, category, task_id, task = record
+            renumbered.append(['add', category, new_id(task_id), task])
+        else:
+            renumbered.append([operation, new_id(record[1])] + record[2:])
+    return renumbered, id_map
+
+
+def get_changed_ids(records: list) -> set:
+    """ The IDs of the tasks that records in the journal format of JsonStorage add, change or delete """
+    return {record[2] if record[0] == 'add' else record[1] for record in records if record[0] != 'id_count'}
+
+
+class JsonStorage:
+    """ The list is one nested dict (id_count, todo, active, done) in a json file
+
+    The file is a snapshot of the list. Changes are appended to a journal next
+    to it (see src.journal) instead of rewriting the whole file, and the journal
+    is folded into a new snapshot once it grows past compact_threshold bytes.
+    All journal records are idempotent, so replaying a record that already is
+    in the snapshot (e.g. after a crash during compaction) does no harm.
+
+    An index from task ID to category is built in the same pass that loads the
+    list and is kept in sync by every change, so lookups by ID never scan the
+    categories. The tasks are parsed straight into src.task_record.Task.
+
+    The snapshot is compact json, or msgpack after 'check todo convert' (see
+    CODECS in src.file_handler). A compaction writes it with the codec that it
+    was read with.
+
+    :param settings: dict
+        The check settings, "storage" -> "compact_threshold" is the journal size
+        in bytes that triggers a compaction (0 always rewrites the whole file)
+    """
+    suffix = STORAGE_SUFFIXES['json']
+
+    def __init__(self, file_path: Path, settings: dict = None) -> None:
+        self.file_path = Path(file_path)
+        self.journal = Journal(self.file_path)
+        storage_settings = (settings or {}).get('storage', {})
+        self.compact_threshold = storage_settings.get('compact_threshold', JOURNAL_COMPACT_THRESHOLD)
+        self._data = None
+        self._index = None
+        self._pending = []
+        self._base_version = None
+        self._base_id_count = None
+        self.codec = None  # The codec of the snapshot, known once the list is loaded
+
+    @staticmethod
+    def create(file_path: Path) -> None:
+        JsonFile.create_todo_file(Path(file_path).parent, Path(file_path).stem)
+        Journal(file_path).clear()
+
+    @property
+    def files(self) -> list:
+        return [self.file_path, self.journal.path]
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            version = self.version()  # Before the read, a change in between makes the list stale
+            with tracing.span('list load', list=self.file_path.stem):
+                self.codec = JsonFile.get_codec(self.file_path)
+                self._data = JsonFile.read(self.file_path, object_hook=task_from_json_object)
+                self._index = {task_id: category for category in CATEGORIES for task_id in self._data[category]}
+                for record in self.journal.read():
+                    self._apply(record)
+            self._base_version = version
+            self._base_id_count = self._data['id_count']
+        return self._data
+
+    def version(self) -> tuple:
+        """ The version of the list on disk, it changes every time the list is written """
+        return tuple(get_file_stamp(path) for path in self.files)
+
+    def write_lock(self, lock_dir: Path) -> FileLock:
+        """ The lock that is held while the list is checked and written """
+        return FileLock(Path(lock_dir) / (self.file_path.stem + '.lock'))
+
+    def is_stale(self) -> bool:
+        """ Check if another process has written the list since it was loaded or flushed """
+        return self._data is not None and self.version() != self._base_version
+
+    def rebase(self) -> dict:
+        """ Load the list again and make the changes that are not flushed yet on top of it
+
+        :return: dict
+            {old task ID: new task ID} of the added tasks that got another ID
+        """
+        pending = self._pending
+        base_id_count = self._base_id_count
+        self._data = None
+        self._pending = []
+        records, id_map = renumber_records(pending, base_id_count, self.get_id_count())
+        for record in records:
+            self._change(record)
+        return id_map
+
+    def changed_ids(self) -> set:
+        """ The IDs of the tasks that were changed since the last flush """
+        return get_changed_ids(self._pending)
+
+    def get_id_count(self) -> int:
+        return self.data['id_count']
+
+    def set_id_count(self, id_count: int) -> None:
+        self._change(['id_count', id_count])
+
+    def find_category(self, task_id: str) -> str:
+        self.data  # Make sure that the list and the index are loaded
+        return self._index.get(task_id)
+
+    def get_task(self, task_id: str) -> Task:
+        category = self.find_category(task_id)
+        if category is None:
+            return None
+        return self.data[category][task_id]
+
+    def tasks(self, category: str) -> dict:
+        return self.data[category]
+
+    def count(self, category: str) -> int:
+        return len(self.data[category])
+
+    def iter_tasks(self, category: str, offset: int = 0, limit: int = None):
+        """ Yield (task_id, task) for a slice of a category, in list order """
+        stop = None if limit is None else offset + limit
+        return itertools.islice(self.data[category].items(), offset, stop)
+
+    def all_tasks(self):
+        """ Yield (category, task_id, task) for every task in the list """
+        for category in CATEGORIES:
+            for task_id, task in self.data[category].items():
+                yield category, task_id, task
+
+    def add_task(self, category: str, task_id: str, task: dict) -> None:
+        self._change(['add', category, task_id, task.to_json() if isinstance(task, Task) else dict(task)])
+
+    def update_task(self, task_id: str, **fields) -> None:
+        self._change(['update', task_id, fields])
+
+    def move_task(self, task_id: str, destination: str) -> None:
+        self._change(['move', task_id, destination])
+
+    def delete_task(self, task_id: str) -> None:
+        if self.find_category(task_id) is not None:
+            self._change(['delete', task_id])
+
+    def _change(self, record: list) -> None:
+        self._apply(record)
+        self._pending.append(record)
+
+    def _apply(self, record: list) -> None:
+        """ Apply one journal record to the list in memory """
+        data = self.data
+        operation = record[0]
+        if operation == 'id_count':
+            data['id_count'] = record[1]
+        elif operation == 'add':
+            _, category, task_id, task = record
+            old_category = self._index.get(task_id)
+            if old_category is not None and old_category != category:
+                data[old_category].pop(task_id)
+            data[category][task_id] = Task.from_json(task)
+            self._index[task_id] = category
+        elif operation == 'update':
+            _, task_id, fields = record
+            category = self._index.get(task_id)
+            if category is not None:
+                data[category][task_id].update(fields)
+        elif operation == 'move':
+            _, task_id, destination = record
+            category = self._index.get(task_id)
+            if category is not None:
+                data[destination][task_id] = data[category].pop(task_id)
+                self._index[task_id] = destination
+        elif operation == 'delete':
+            category = self._index.pop(record[1], None)
+            if category is not None:
+                data[category].pop(record[1])
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        if self.journal.size() >= self.compact_threshold:
+            self.compact()
+        else:
+            self.journal.append(self._pending)
+            self._pending = []
+            self._base_version = self.version()
+            self._base_id_count = self._data['id_count']
+
+    def compact(self) -> None:
+        """ Write the whole list as a new snapshot and start a new journal """
+        JsonFile.write(self.file_path, self.data, default=encode_task, codec=self.codec)
+        self.journal.clear()
+        self._pending = []
+        self._base_version = self.version()
+        self._base_id_count = self._data['id_count']
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteStorage:
+    """ The list is a SQLite database with one row per task
+
+    Lookups by id are done through the primary key, and the columns that are
+    used for filtering have their own indexes, so single task operations never
+    read or write the whole list.
+    """
+    suffix = STORAGE_SUFFIXES['sqlite']
+    schema = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            issue TEXT,
+            title TEXT,
+            description TEXT,
+            priority TEXT,
+            size TEXT,
+            create_date TEXT,
+            done_date TEXT,
+            is_done TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category, id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+        CREATE INDEX IF NOT EXISTS idx_tasks_issue ON tasks (issue);
+        CREATE INDEX IF NOT EXISTS idx_tasks_create_date ON tasks (create_date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_done_date ON tasks (done_date);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('id_count', '0');
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+    """
+
+    def __init__(self, file_path: Path, settings: dict = None) -> None:
+        self.file_path = Path(file_path)
+        self._connection = None
+        self._pending = []  # The changes of the open transaction, in the journal format of JsonStorage
+        self._base_version = None
+        self._base_id_count = None  # The last id_count that was read before the first change
+
+    @classmethod
+    def create(cls, file_path: Path) -> None:
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        storage = cls(file_path)
+        storage.flush()
+        storage.close()
+
+    @property
+    def files(self) -> list:
+        return [self.file_path]
+
+    @property
+    def connection(self) -> 'sqlite3.Connection':
+        if self._connection is None:
+            import sqlite3  # Only lists stored in SQLite pay for the import
+            with tracing.span('list open', list=self.file_path.stem):
+                self._connection = sqlite3.connect(str(self.file_path))
+            self._connection.row_factory = sqlite3.Row
+            if self._connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks'").fetchone() is None:
+                self._connection.executescript(self.schema)  # Only a new list, it waits for the write lock
+            self._base_version = self.version()
+        return self._connection
+
+    def version(self) -> int:
+        """ The version of the list, it is counted up by every flush that commits changes """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return 0 if row is None else int(row['value'])  # Lists from before versions were counted
+
+    @staticmethod
+    def write_lock(lock_dir: Path):
+        """ SQLite locks the database itself, from the first change of a transaction until the commit
+
+        Waiting for a FileLock on top of that could wait for a process that
+        waits for the database.
+        """
+        return contextlib.nullcontext()
+
+    def is_stale(self) -> bool:
+        """ Check if another process has committed changes since the list was opened or flushed
+
+        Only the changes that were read before the first change of this
+        process can be outdated, SQLite does not let another process commit
+        while this one has changes that are not committed.
+        """
+        return bool(self._pending) and self.version() != self._base_version
+
+    def rebase(self) -> dict:
+        """ Roll the changes back and make them again on top of the version that is committed now
+
+        :return: dict
+            {old task ID: new task ID} of the added tasks that got another ID
+        """
+        pending = self._pending
+        base_id_count = self._base_id_count
+        self._pending = []
+        self._base_id_count = None
+        self.connection.rollback()
+        self.connection.execute('BEGIN IMMEDIATE')  # No other process can commit until the changes are made again
+        records, id_map = pending, {}
+        if base_id_count is not None:  # Only changes that were based on the id_count can have used new IDs
+            records, id_map = renumber_records(pending, base_id_count, self.get_id_count())
+        for record in records:
+            operation = record[0]
+            if operation == 'id_count':
+                self.set_id_count(record[1])
+            elif operation == 'add':
+                self.add_task(*record[1:])
+            elif operation == 'update':
+                self.update_task(record[1], **record[2])
+            elif operation == 'move':
+                self.move_task(record[1], record[2])
+            elif operation == 'delete':
+                self.delete_task(record[1])
+        return id_map
+
+    def changed_ids(self) -> set:
+        """ The IDs of the tasks that were changed since the last flush """
+        return get_changed_ids(self._pending)
+
+    @staticmethod
+    def _row_id(task_id: str) -> int:
+        """ Task ids are strings in the rest of the application """
+        try:
+            return int(task_id)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _row_to_task(row: 'sqlite3.Row') -> Task:
+        return Task(*(row[field] for field in TASK_FIELDS), extra=json.loads(row['extra']) if row['extra'] else None)
+
+    @staticmethod
+    def _task_to_columns(task: dict) -> tuple:
+        extra = {key: value for key, value in task.items() if key not in TASK_FIELDS}
+        return tuple(task.get(field) for field in TASK_FIELDS) + (json.dumps(extra) if extra else None,)
+
+    def get_id_count(self) -> int:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'id_count'").fetchone()
+        if not self._pending:
+            self._base_id_count = int(row['value'])
+        return int(row['value'])
+
+    def set_id_count(self, id_count: int) -> None:
+        self.connection.execute("UPDATE meta SET value = ? WHERE key = 'id_count'", (str(id_count),))
+        self._pending.append(['id_count', id_count])
+
+    def find_category(self, task_id: str) -> str:
+        row = self.connection.execute('SELECT category FROM tasks WHERE id = ?', (self._row_id(task_id),)).fetchone()
+        return None if row is None else row['category']
+
+    def get_task(self, task_id: str) -> Task:
+        row = self.connection.execute('SELECT * FROM tasks WHERE id = ?', (self._row_id(task_id),)).fetchone()
+        return None if row is None else self._row_to_task(row)
+
+    def tasks(self, category: str) -> dict:
+        rows = self.connection.execute('SELECT * FROM tasks WHERE category = ? ORDER BY id', (category,))
+        return {str(row['id']): self._row_to_task(row) for row in rows}
+
+    def count(self, category: str) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM tasks WHERE category = ?', (category,)).fetchone()[0]
+
+    def iter_tasks(self, category: str, offset: int = 0, limit: int = None):
+        """ Yield (task_id, task) for a slice of a category, only that slice is read from the database """
+        rows = self.connection.execute('SELECT * FROM tasks WHERE category = ? ORDER BY id LIMIT ? OFFSET ?',
+                                       (category, -1 if limit is None else limit, offset))
+        for row in rows:
+            yield str(row['id']), self._row_to_task(row)
+
+    def all_tasks(self):
+        """ Yield (category, task_id, task) for every task in the list """
+        for category in CATEGORIES:
+            for task_id, task in self.tasks(category).items():
+                yield category, task_id, task
+
+    def add_task(self, category: str, task_id: str, task: dict) -> None:
+        self.connection.execute(
+            'INSERT OR REPLACE INTO tasks (id, category, issue, title, description, priority, size, '
+            'create_date, done_date, is_done, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._row_id(task_id), category) + self._task_to_columns(task))
+        self._pending.append(['add', category, task_id, task])
+
+    def update_task(self, task_id: str, **fields) -> None:
+        task = self.get_task(task_id)
+        if task is None:  # Like JsonStorage, a task that is not in the list is not changed
+            return
+        task.update(fields)
+        self.connection.execute(
+            'UPDATE tasks SET issue = ?, title = ?, description = ?, priority = ?, size = ?, '
+            'create_date = ?, done_date = ?, is_done = ?, extra = ? WHERE id = ?',
+            self._task_to_columns(task) + (self._row_id(task_id),))
+        self._pending.append(['update', task_id, fields])
+
+    def move_task(self, task_id: str, destination: str) -> None:
+        self.connection.execute('UPDATE tasks SET category = ? WHERE id = ?', (destination, self._row_id(task_id)))
+        self._pending.append(['move', task_id, destination])
+
+    def delete_task(self, task_id: str) -> None:
+        self.connection.execute('DELETE FROM tasks WHERE id = ?', (self._row_id(task_id),))
+        self._pending.append(['delete', task_id])
+
+    def flush(self) -> None:
+        if self._pending:
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('version', '1') "
+                                    "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+        self.connection.commit()
+        self._pending = []
+        self._base_version = self.version()
+        self._base_id_count = None
+
+    def compact(self) -> None:
+        self.flush()
+        self.connection.execute('VACUUM')
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+ENGINES = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+}
+
+
+def get_list_path(directory: Path, list_name: str) -> Path:
+    """ Get the path of a list, whichever engine it is stored with """
+    for engine in ENGINES.values():
+        path = Path(directory) / (list_name + engine.suffix)
+        if path.exists():
+            return path
+    return Path(directory) / (list_name + JsonStorage.suffix)
+
+
+def open_storage(directory: Path, list_name: str, settings: dict = None):
+    """ Open a list with the engine that matches the file that exists """
+    path = get_list_path(directory, list_name)
+    for engine in ENGINES.values():
+        if path.suffix == engine.suffix:
+            return engine(path, settings)
+
+
+def get_state_files(list_path: Path) -> list:
+    """ Get the files that check keeps next to a list, e.g. the search index, the archive and the undo history """
+    suffixes = (SYNC_STATE_SUFFIX, ARCHIVE_SUFFIX, DEADLINES_SUFFIX, UNDO_SUFFIX, REDO_SUFFIX)
+    return get_index_files(list_path) + [Path(list_path).with_suffix(suffix) for suffix in suffixes]
+
+
+def get_stamps(storage) -> list:
+    """ The stamps of the files of a list, as lists like they are read back from json files """
+    return [None if stamp is None else list(stamp) for stamp in map(get_file_stamp, storage.files)]
+
+
+def get_list_files(directory: Path, list_name: str) -> list:
+    """ Get every file that belongs to a list, e.g. the json file and its journal """
+    storage = open_storage(directory, list_name)
+    return [path for path in storage.files + get_state_files(storage.file_path) if path.exists()]
+
+
+def create_storage(directory: Path, list_name: str, engine_name: str = 'json') -> Path:
+    engine = ENGINES[engine_name]
+    path = Path(directory) / (list_name + engine.suffix)
+    engine.create(path)
+    for state_path in get_state_files(path):  # Left behind by an old list with the same name
+        if state_path.is_dir():
+            shutil.rmtree(state_path)
+        elif state_path.exists():
+            state_path.unlink()
+    return path
+
+
+def convert(directory: Path, list_name: str, codec_name: str) -> Path:
+    """ Write a json list again with another codec, see CODECS in src.file_handler
+
+    The journal is folded into the new snapshot. The caller holds the FileLock of the list.
+
+    :return: Path
+        Path to the list
+    """
+    storage = open_storage(directory, list_name)
+    if not isinstance(storage, JsonStorage):
+        raise ValueError(f'{list_name} is stored in SQLite, only json lists have a codec')
+    storage.data  # Read with the codec that it has now
+    storage.codec = codec_name
+    storage.compact()
+    storage.close()
+    return storage.file_path
+
+
+def migrate(directory: Path, list_name: str, engine_name: str) -> Path:
+    """ Copy a list into another storage engine
+
+    The old files are moved to the 'deleted' directory to have a bit of a backup.
+    The caller holds the FileLock of the list, a SQLite list is also locked
+    by SQLite until it has been copied.
+
+    :return: Path
+        Path to the new file
+    """
+    source = open_storage(directory, list_name)
+    source_files = [path for path in source.files if path.exists()]
+    if source.suffix == ENGINES[engine_name].suffix:
+        raise ValueError(f'{list_name} is already stored as {engine_name}')
+    if isinstance(source, SqliteStorage):
+        source.connection.execute('BEGIN IMMEDIATE')  # SQLite writers do not wait for the FileLock, see write_lock
+
+    target_path = create_storage(directory, list_name, engine_name)
+    target = ENGINES[engine_name](target_path)
+    for category, task_id, task in source.all_tasks():
+        target.add_task(category, task_id, dict(task))
+    target.set_id_count(source.get_id_count())
+    target.compact()
+    target.close()
+    source.close()
+
+    Path(DELETED_DIR).mkdir(parents=True, exist_ok=True)
+    for path in source_files:
+        shutil.move(str(path), str(Path(DELETED_DIR) / path.name))
+    return target_path
@@ -0,0 +1,124 @@
+""" Output that is written while the tasks are read, without rich
+
+Used for plain text and for the machine readable formats (json, jsonl, csv
+and tsv) that are meant to be piped into other programs.
+"""
+import csv
+import json
+import sys
+
+
+FORMATS = ('plain', 'json', 'jsonl', 'csv', 'tsv')
+FIELDS = ('id', 'category', 'issue', 'title', 'description', 'priority', 'size', 'create_date', 'done_date', 'due_date', 'is_done')
+PLAIN_COLUMNS = (
+    ('ID', 'id', 5),
+    ('Issue', 'issue', 10),
+    ('Title', 'title', 25),
+    ('Description', 'description', 30),
+    ('Priority', 'priority', 8),
+    ('Size', 'size', 6),
+    ('Create Date', 'create_date', 11),
+    ('Done Date', 'done_date', 10),
+    ('Due Date', 'due_date', 10),
+    ('Done', 'is_done', 4),
+)
+LIST_COLUMN = ('List', 'list', 12)  # In front of the other columns when the tasks come from several lists
+
+
+class StreamDisplay:
+    """ Write tasks one at a time in one of FORMATS
+
+    :param file_format: str
+        One of FORMATS
+    :param stream:
+        Where to write, stdout if None
+    :param list_column: bool
+        Write the "list" field of the tasks as well, see --all-lists
+    """
+    def __init__(self, file_format: str, stream=None, list_column: bool = False) -> None:
+        self.file_format = file_format
+        self.stream = stream or sys.stdout
+        self.fields = ('list',) + FIELDS if list_column else FIELDS
+        self.plain_columns = (LIST_COLUMN,) + PLAIN_COLUMNS if list_column else PLAIN_COLUMNS
+
+    def tasks(self, rows, title: str = None) -> None:
+        """ Write every row
+
+        :param rows:
+            Iterable of (category, task_id, task)
+        :param title: str
+            Title of plain output, it is written with the header also when
+            there are no rows. If None, every category gets its own title.
+        """
+        for line in self.lines(rows, title):
+            self.stream.write(line)
+
+    def lines(self, rows, title: str = None):
+        """ Yield the output piece by piece, see tasks """
+        records = (dict(task, id=task_id, category=category) for category, task_id, task in rows)
+        if self.file_format == 'plain':
+            yield from self._plain_lines(records, title)
+        elif self.file_format == 'json':
+            yield from self._json_lines(records)
+        elif self.file_format == 'jsonl':
+            for record in records:
+                yield json.dumps(record) + '\n'
+        elif self.file_format in ('csv', 'tsv'):
+            yield from self._csv_lines(records, ',' if self.file_format == 'csv' else '\t')
+
+    def _json_lines(self, records):
+        """ One json array, written element by element """
+        yield '['
+        for number, record in enumerate(records):
+            yield (',\n' if number else '\n') + json.dumps(record)
+        yield '\n]\n'
+
+    def _csv_lines(self, records, delimiter: str):
+        buffer = _LineBuffer()
+        writer = csv.DictWriter(buffer, self.fields, delimiter=delimiter, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        yield buffer.pop()
+        for record in records:
+            writer.writerow(record)
+            yield buffer.pop()
+
+    def _plain_lines(self, records, title: str):
+        header = self._format_plain_row({key: header for header, key, _ in self.plain_columns})
+        if title is not None:
+            yield f'{title}\n'
+            yield header
+            for record in records:
+                yield self._format_plain_row(record)
+            return
+        current_title = None
+        for record in records:
+            record_title = record['category'].upper()
+            if record_title != current_title:
+                current_title = record_title
+                yield f'{current_title}\n'
+                yield header
+            yield self._format_plain_row(record)
+
+    def _format_plain_row(self, row: dict) -> str:
+        cells = []
+        for _, key, width in self.plain_columns:
+            value = row.get(key)
+            text = '' if value is None else str(value).replace('\n', ' ')
+            if len(text) > width:
+                text = text[:width - 1] + '…'
+            cells.append(text.ljust(width))
+        return '  '.join(cells).rstrip() + '\n'
+
+
+class _LineBuffer:
+    """ File-like object that keeps what csv.writer wrote until it is popped """
+    def __init__(self) -> None:
+        self._parts = []
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+
+    def pop(self) -> str:
+        text = ''.join(self._parts)
+        self._parts = []
+        return text
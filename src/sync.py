@@ -0,0 +1,232 @@
+""" Two-way sync between the tasks of a list and their Jira issues
+
+Only tasks that have an issue take part. For each of them the sync state
+(<list>.sync.json, next to the list) keeps the title, description and
+category that the task and its issue had when they were last in step, a
+revision that is raised every time those fields change, and when the task
+was last synced.
+
+A run only talks to Jira about what has changed since the last run:
+
+- the issues that were updated since the cursor, found with one JQL search
+- the tasks whose fields differ from the state, they were changed in check
+- the tasks that got their issue after the last run, or failed in it
+
+Every field is merged three-way with the state as the base. A field that
+changed on one side takes the value of that side. A field that changed on
+both sides to different values is a conflict, the side in prefer wins, so
+the result never depends on the order in which things happened. What Jira
+lacks is pushed to the issue, what check lacks is written to the task.
+"""
+import datetime
+
+from pathlib import Path
+from src.file_handler import JsonFile, FileLock
+from src.jira_bulk import JiraBulk, one_write
+from src.outbox import Outbox
+from src.session import Session
+from src.task import Update
+from src.configuration import Jira
+from src.constants import LOCK_DIR, SYNC_STATE_SUFFIX, SYNC_CURSOR_OVERLAP
+
+
+SYNC_FIELDS = ('title', 'description', 'category')
+PREFER = ('jira', 'local')
+CURSOR_FORMAT = '%Y/%m/%d %H:%M'  # The date format of JQL
+
+
+def get_sync_fields(category: str, task: dict) -> dict:
+    return {'title': task['title'], 'description': task['description'], 'category': category}
+
+
+def merge_fields(base: dict, local: dict, remote: dict, prefer: str) -> tuple:
+    """ Three-way merge of the fields of a task and its issue
+
+    :param base: dict
+        The fields when the task and the issue were last in step, empty if they never were
+    :param remote: dict
+        The fields of the issue, a category of None (status unknown) counts as unchanged
+    :return: tuple
+        (merged fields, names of the fields that changed on both sides)
+    """
+    merged = {}
+    conflicts = []
+    for field in SYNC_FIELDS:
+        ours = local[field]
+        theirs = remote[field] if remote[field] is not None or field != 'category' else base.get(field, ours)
+        if ours == theirs:
+            merged[field] = ours
+        elif field in base and ours == base[field]:
+            merged[field] = theirs
+        elif field in base and theirs == base[field]:
+            merged[field] = ours
+        else:
+            merged[field] = theirs if prefer == 'jira' else ours
+            conflicts.append(field)
+    return merged, conflicts
+
+
+class JiraSync:
+    """ Sync the active list with Jira, see the module docstring
+
+    :param prefer: str
+        'jira' or 'local', which side wins a conflict
+    :param outbox: Outbox
+        The queued Jira calls, tasks that have calls in it are not synced
+    """
+    def __init__(self, session: Session = None, config: Jira = None, prefer: str = 'jira', outbox: Outbox = None) -> None:
+        if prefer not in PREFER:
+            raise ValueError(f'prefer can only be {" or ".join(PREFER)}')
+        self.session = session or Session()
+        self.config = config or Jira()
+        self.prefer = prefer
+        self.outbox = outbox or Outbox()
+        self.path = Path(self.session.active_list_path).with_suffix(SYNC_STATE_SUFFIX)
+
+    def run(self, progress=None) -> tuple:
+        """ Sync every task that changed in check or in Jira since the last run
+
+        Only one sync of a list runs at a time. Tasks with Jira calls in the
+        outbox are left for the next run, the outbox sends their changes.
+
+        :param progress:
+            Function that is called with 1 every time a task is finished
+        :return: tuple
+            ({task_id: fields} written to the tasks, {task_id: fields} pushed to Jira,
+            {task_id: fields} that were conflicts, {task_id: reason} of the tasks that failed),
+            or None if the list is already being synced
+        """
+        sync_lock = FileLock(Path(LOCK_DIR) / (self.path.stem + '.lock'), timeout=0)
+        try:
+            sync_lock.acquire()
+        except TimeoutError:
+            return None
+        try:
+            return self._run(progress)
+        finally:
+            sync_lock.release()
+
+    def _run(self, progress) -> tuple:
+        started = datetime.datetime.now()
+        state = self._read()
+        linked = {task_id: (task['issue'], get_sync_fields(category, task))
+                  for category, task_id, task in self.session.storage.all_tasks() if task.get('issue')}
+
+        to_sync = set(state['retry']) & set(linked)
+        for task_id, (issue, fields) in linked.items():
+            known = state['tasks'].get(task_id)
+            if known is None or known['issue'] != issue or known['fields'] != fields:
+                to_sync.add(task_id)
+        if state['cursor'] is None or not self.session.jira.supports('search_issues'):
+            to_sync.update(linked)  # Nothing to compare with yet, every issue is loaded once
+        else:
+            updated = self._updated_issues(state['cursor'])
+            to_sync.update(task_id for task_id, (issue, _) in linked.items() if issue in updated)
+
+        failures = {}
+        list_name = self.session.active_list_name
+        for entry in self.outbox.entries():
+            if entry['task'] is not None and entry['task'][0] == list_name and entry['task'][1] in to_sync:
+                failures[entry['task'][1]] = f'Waiting for call {entry["number"]} ({entry["method"]}) in the outbox'
+        to_sync.difference_update(failures)
+
+        tasks = [(task_id, linked[task_id][0], linked[task_id][1], state['tasks'].get(task_id))
+                 for task_id in sorted(to_sync, key=int)]
+        results = {}
+        for (task_id, _, _, _), result in self.session.jira.map(self._sync_task, tasks):
+            results[task_id] = result
+            if progress is not None:
+                progress(1)
+
+        pulled, pushed, conflicts = {}, {}, {}
+        with one_write(self.session):
+            update = Update(self.session)
+            for task_id, issue, local, known in tasks:
+                merged, task_pushed, task_conflicts, failure = results[task_id]
+                if merged is None:
+                    failures[task_id] = failure
+                    continue
+                task_pulled = [field for field in SYNC_FIELDS if merged[field] != local[field]]
+                self._write_task(update, task_id, merged, task_pulled)
+                if failure:  # The task keeps its old state, what was not pushed is pushed by the next run
+                    failures[task_id] = failure
+                else:
+                    revision = known['revision'] if known else 0
+                    if known is None or known['fields'] != merged or known['issue'] != issue:
+                        revision += 1
+                    state['tasks'][task_id] = {
+                        'issue': issue,
+                        'fields': merged,
+                        'revision': revision,
+                        'synced_at': started.isoformat(timespec='seconds'),
+                    }
+                for results_dict, fields in ((pulled, task_pulled), (pushed, task_pushed), (conflicts, task_conflicts)):
+                    if fields:
+                        results_dict[task_id] = fields
+
+        state['tasks'] = {task_id: known for task_id, known in state['tasks'].items() if task_id in linked}
+        state['retry'] = sorted((task_id for task_id in failures if task_id in linked), key=int)
+        state['cursor'] = (started - datetime.timedelta(minutes=SYNC_CURSOR_OVERLAP)).strftime(CURSOR_FORMAT)
+        JsonFile.write(self.path, state)
+        return pulled, pushed, conflicts, failures
+
+    def _updated_issues(self, cursor: str) -> set:
+        """ Get the issues of the project that were updated since the cursor """
+        jql = f'project = {self.config.get_project()} AND updated >= "{cursor}" ORDER BY updated'
+        issues = JiraBulk(self.session, self.config).search(jql)
+        if issues is None:
+            raise RuntimeError(f'Could not search Jira for updated issues: {self.session.jira.last_error}')
+        return set(issues)
+
+    def _sync_task(self, task: tuple) -> tuple:
+        """ Load the issue of a task, merge it with the task and push what the issue lacks
+
+        Runs on the workers of the gateway.
+
+        :return: tuple
+            (merged fields or None if the issue could not be loaded, pushed fields,
+            conflicting fields, reason of the failure or None)
+        """
+        _, issue, local, known = task
+        jira = self.session.jira
+        remote = jira.get_issue_state(issue)
+        if remote is None:
+            return None, [], [], f'Could not load {issue} from Jira: {jira.last_error}'
+        merged, conflicts = merge_fields(known['fields'] if known else {}, local, remote, self.prefer)
+        to_push = [field for field in SYNC_FIELDS if remote[field] is not None and merged[field] != remote[field]]
+        pushed = []
+        if 'title' in to_push or 'description' in to_push:
+            if not jira.supports('update_issue'):
+                return merged, pushed, conflicts, 'The installed Jira plugin cannot change the title or description of an issue'
+            if not jira.call('update_issue', issue, merged['title'], merged['description']):
+                return merged, pushed, conflicts, f'Could not update {issue} in Jira: {jira.last_error}'
+            pushed += [field for field in to_push if field != 'category']
+        if 'category' in to_push:
+            if not self._transition(issue, merged['category']):
+                return merged, pushed, conflicts, f'Could not move {issue} to {merged["category"]} in Jira: {jira.last_error}'
+            pushed.append('category')
+        return merged, pushed, conflicts, None
+
+    def _transition(self, issue: str, category: str) -> bool:
+        jira = self.session.jira
+        if category == 'done':
+            return jira.call('move_issue_to_done', issue, self.config.get_transition_done())
+        transition = self.config.get_transition_todo() if category == 'todo' else self.config.get_transition_in_progress()
+        return jira.call('transition_issue', issue, transition)
+
+    @staticmethod
+    def _write_task(update: Update, task_id: str, merged: dict, fields: list) -> None:
+        """ Write the fields that came from Jira to the task """
+        text_fields = {field: merged[field] for field in fields if field != 'category'}
+        if text_fields:
+            update.change_task(task_id, **text_fields)
+        if 'category' in fields:
+            if merged['category'] == 'done':
+                update.end_task(task_id)
+            else:
+                update.move_task(task_id, merged['category'])
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {'cursor': None, 'retry': [], 'tasks': {}}
+        return JsonFile.read(self.path)
@@ -1,14 +1,22 @@
 """ Module to handle all the tasks (create, read, update, delete) """
 
+import contextlib
+import datetime
+import heapq
+import itertools
 import os
 import json
 
 from pathlib import Path
-from src.constants import TODO_PATH, CURRENT_DATE
-from rich.console import Console
-from src.file_handler import JsonFile
-from src.view import Display
-from src.settings_handler import Todo
+from src.constants import TODO_PATH, CATEGORIES
+from src.all_lists import AllLists, get_count
+from src.archive import Archive
+from src.deadlines import DeadlineIndex, INDEXED_CATEGORIES
+from src.history import apply_delta, describe
+from src.query import Query
+from src.session import Session
+from src import tracing
+from src.task_record import Task
 
 
 # ACTIVE_LIST_PATH = Path(TODO_PATH) / (Todo.get_active_todo_list() + '.json')
@@ -16,39 +24,48 @@ from src.settings_handler import Todo
 
 class Create:
     """ Creation of tasks """
-    def __init__(self, title: str, description: str, priority, size, issue):
+    def __init__(self, title: str, description: str, priority, size, issue, session: Session = None,
+                 due_date: datetime.date = None):
         self.title = title
         self.description = description
         self.priority = priority
         self.size = size
         self.issue = issue
-        self.active_list_path = Path(TODO_PATH) / (Todo.get_active_todo_list() + '.json')
+        self.due_date = due_date
+        self.session = session or Session()
+        self.active_list_path = self.session.active_list_path
 
     def new_task(self):
-        """ Create a new task and add it to the todo_list.json file
+        """ Create a new task and add it to the active todo list
 
         The task will contain a unique ID, a DESCRIPTION, PRIORITY and SIZE
+
+        :return: str
+            The ID of the task. It changes if another process used it before
+            the session was flushed, Session.new_id gives the ID after the flush.
         """
-        todo_dict = JsonFile.read(self.active_list_path)
-        new_todo_dict = self._add_task_to_todo(todo_dict)
-        JsonFile.write(self.active_list_path, new_todo_dict)
-
-    def _add_task_to_todo(self, todo: dict) -> dict:
-        """ Add a new task to the old todo dict and return a new dict """
-        task_id = todo['id_count'] + 1
-        task_data = {
-            'issue': self.issue,
-            'title': self.title,
-            'description': self.description,
-            'priority': self.priority,
-            'size': self.size,
-            'create_date': CURRENT_DATE,
-            'done_date': None,
-            'is_done': "no",
-        }
-        todo['id_count'] = task_id
-        todo['todo'][task_id] = task_data
-        return todo
+        storage = self.session.storage
+        with self.session.history.step('add', storage, [str(storage.get_id_count() + 1)]):
+            task_id = self._add_task_to_todo(storage)
+        self.session.search_index.add(task_id, self.session.storage.get_task(task_id))
+        self.session.save_todo()
+        return task_id
+
+    def _add_task_to_todo(self, storage) -> str:
+        """ Add a new task to the storage of the list and return the new task ID """
+        task_id = storage.get_id_count() + 1
+        task = Task(
+            issue=self.issue,
+            title=self.title,
+            description=self.description,
+            priority=self.priority,
+            size=self.size,
+            create_date=datetime.date.today(),
+            extra={'due_date': self.due_date.isoformat()} if self.due_date else None,
+        )
+        storage.set_id_count(task_id)
+        storage.add_task('todo', str(task_id), task)
+        return str(task_id)
 
     def _setup_todo_list(self) -> None:
         """ Setup the todo list with default keys and values """
@@ -65,149 +82,448 @@ class Create:
 
 class Read:
     """ Class to handle the reading of the tasks """
-    def __init__(self) -> None:
-        self.console = Console()
-        self.display = Display()
-        self.active_list_path = Path(TODO_PATH) / (Todo.get_active_todo_list() + '.json')
+    def __init__(self, session: Session = None) -> None:
+        self.session = session or Session()
+        self._display = None
+        self.active_list_path = self.session.active_list_path
+
+    @property
+    def display(self):
+        """ rich is only imported when something is displayed """
+        if self._display is None:
+            from src.view import Display
+            self._display = Display(self.session)
+        return self._display
 
     def get_task_status(self, task_id: str) -> str:
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, tasks in todo_dict.items():
-            if category != 'id_count' and task_id in tasks.keys():
-                return category
-        return None
+        return self.session.storage.find_category(task_id)
 
     def get_latest_task_id(self) -> int:
-        todo_dict = JsonFile.read(self.active_list_path)
-        return todo_dict['id_count']
+        return self.session.storage.get_id_count()
 
     def get_task_title(self, task_id: str) -> str:
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, tasks in todo_dict.items():
-            if category != 'id_count' and task_id in tasks.keys():
-                return tasks[task_id]['title']
-        return None
+        task = self.session.storage.get_task(task_id)
+        if task is None:
+            return None
+        return task.title
 
     def get_task_description(self, task_id: str) -> str:
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, tasks in todo_dict.items():
-            if category != 'id_count' and task_id in tasks.keys():
-                return tasks[task_id]['description']
-        return None
-
-    def tasks(self, flag: str) -> None:
-        if flag == 'all':
-            self._all_tasks()
-        elif flag == 'active':
-            self._active_tasks()
-        elif flag == 'todo':
-            self._todo_tasks()
-        elif flag == 'done':
-            self._done_tasks()
-
-    def _all_tasks(self):
-        self.display.tasks('todo')
-        self.display.tasks('active')
-        self.display.tasks('done')
-
-    def _active_tasks(self):
-        self.display.tasks('active')
-
-    def _todo_tasks(self):
-        self.display.tasks('todo')
-
-    def _done_tasks(self):
-        self.display.tasks('done')
-
-    def search_task(self, **search_criteria):
+        task = self.session.storage.get_task(task_id)
+        if task is None:
+            return None
+        return task.description
+
+    def tasks(self, flag: str, offset: int = 0, limit: int = None, file_format: str = 'table', pager: bool = False,
+              include_archive: bool = False, all_lists: bool = False, where: Query = None) -> None:
+        """ Display the tasks of one category, or of every category if flag is 'all'
+
+        :param offset: int
+            Number of tasks to skip in each category
+        :param limit: int
+            Show at most this many tasks of each category
+        :param file_format: str
+            'table' for rich tables, or one of src.stream_view.FORMATS to write
+            the tasks while they are read, without rich
+        :param pager: bool
+            Show the output in a pager
+        :param include_archive: bool
+            Show the archived tasks in front of the done tasks of the list, see src.archive
+        :param all_lists: bool
+            Show the tasks of every list, with the name of their list. The offset
+            and limit count the tasks of all lists together, see src.all_lists
+        :param where: Query
+            Show only the tasks that match, in the order of the query, see src.query
+        """
+        categories = CATEGORIES if flag == 'all' else (flag,)
+        if all_lists and where is not None:
+            list_rows = self._all_lists_selected(categories, offset, limit, include_archive, where)
+        elif all_lists:
+            list_rows = self._all_lists_tasks(categories, offset, limit, include_archive)
+        if file_format != 'table':
+            from src.stream_view import StreamDisplay
+            display = StreamDisplay(file_format, list_column=all_lists)
+
+            def rows(category):
+                if all_lists:
+                    return ((category, task_id, dict(task, list=list_name)) for list_name, task_id, task in list_rows[category])
+                return ((category, task_id, task) for task_id, task in self._category_tasks(category, offset, limit, include_archive,
+                                                                                             where=where))
+
+            if file_format == 'plain':  # Every category gets its title and header, also when it is empty
+                lines = itertools.chain.from_iterable(display.lines(rows(category), category.upper())
+                                                      for category in categories)
+            else:
+                lines = display.lines(itertools.chain.from_iterable(rows(category) for category in categories))
+            self._stream(display, lines, pager)
+            return
+
+        output = self.display.console.pager(styles=True) if pager else contextlib.nullcontext()
+        with output, tracing.span('render'):
+            for category in categories:
+                if all_lists:
+                    self.display.list_tasks(category.upper(), list_rows[category])
+                else:
+                    self.display.tasks(category, offset, limit, self._category_tasks(category, offset, limit, include_archive,
+                                                                                     where=where))
+
+    def _category_tasks(self, category: str, offset: int, limit: int, include_archive: bool, storage=None, where: Query = None):
+        """ Yield (task_id, task) for a slice of a category, with the archived tasks first for 'done'
+
+        :param storage:
+            The list to read, the active list if None
+        :param where: Query
+            Slice the tasks that match the query, in its order
+        """
+        if where is not None:
+            rows = self._category_tasks(category, 0, None, include_archive, storage)
+            return where.select(rows, offset, limit, fields=lambda row: (row[0], row[1], category))
+        storage = storage or self.session.storage
+        if not include_archive or category != 'done':
+            return storage.iter_tasks(category, offset, limit)
+        archive = Archive(storage.file_path)
+        list_offset = max(0, offset - archive.count())
+        archived = ((task_id, task) for task_id, task in archive.iter_tasks(offset)
+                    if storage.find_category(task_id) is None)  # Archived, but not removed from the list yet
+        return itertools.islice(itertools.chain(archived, storage.iter_tasks(category, list_offset)), limit)
+
+    def _all_lists_tasks(self, categories: tuple, offset: int, limit: int, include_archive: bool) -> dict:
+        """ Get a slice of each category over all lists, the lists one after the other
+
+        Only the part of a list that can be in the slice is read. Where that
+        part is depends on the number of tasks in the lists before it, which
+        is known from the summaries of the lists that have not changed. A list
+        that has no tasks in any of the slices is not opened.
+
+        :return: dict
+            {category: [(list_name, task_id, task)]}
+        """
+        all_lists = AllLists(self.session)
+        names = all_lists.names
+        known = {name: all_lists.counts(name) for name in names}
+        ranges = {name: {} for name in names}  # {list name: {category: (start, stop) in the list}}
+        end = None if limit is None else offset + limit
+        for category in categories:
+            before = 0  # Tasks in the lists before, None once a list with an unknown count is passed
+            for name in names:
+                count = get_count(known[name], category, include_archive)
+                if before is None:
+                    ranges[name][category] = (0, end)
+                else:
+                    start = max(0, offset - before)
+                    stop = None if end is None else max(0, end - before)
+                    if (count is None or start < count) and stop != 0:
+                        ranges[name][category] = (start, stop)
+                    before = None if count is None else before + count
+
+        def read(name, search_index, counts):
+            return {category: (start, list(self._category_tasks(category, start, None if stop is None else stop - start,
+                                                                 include_archive, search_index.storage)))
+                    for category, (start, stop) in ranges[name].items()}
+
+        results = {name: (counts, sliced) for name, counts, sliced in all_lists.map(read, [name for name in names if ranges[name]])}
+        list_rows = {}
+        for category in categories:
+            rows = list_rows[category] = []
+            before = 0
+            for name in names:
+                counts, sliced = results.get(name, (known[name], {}))
+                if counts is None:  # Not opened because the slice ends before it, so do the lists after it
+                    break
+                start, tasks = sliced.get(category, (0, ()))
+                for position, (task_id, task) in enumerate(tasks, before + start):
+                    if position >= offset and (end is None or position < end):
+                        rows.append((name, task_id, task))
+                before += get_count(counts, category, include_archive)
+        return list_rows
+
+    def _all_lists_selected(self, categories: tuple, offset: int, limit: int, include_archive: bool, where: Query) -> dict:
+        """ Like _all_lists_tasks for the tasks that match a query
+
+        Which tasks match is only known once a list is read, so every list
+        that has tasks is read. The lists are merged in the order of the query.
+        """
+        all_lists = AllLists(self.session)
+        end = None if limit is None else offset + limit
+        names = [name for name in all_lists.names
+                 if any(get_count(all_lists.counts(name), category, include_archive) != 0 for category in categories)]
+
+        def read(name, search_index, counts):
+            return {category: self._category_tasks(category, 0, end, include_archive, search_index.storage, where)
+                    for category in categories}
+
+        results = all_lists.map(read, names)
+        list_rows = {}
+        for category in categories:
+            per_list = [[(name, task_id, task) for task_id, task in selected[category]] for name, _, selected in results]
+            if where.sorts:
+                rows = heapq.merge(*per_list, key=lambda row: where.sort_key(row[1], row[2], category))
+            else:
+                rows = itertools.chain.from_iterable(per_list)
+            list_rows[category] = list(itertools.islice(rows, offset, end))
+        return list_rows
+
+    @staticmethod
+    def _stream(display, lines, pager: bool) -> None:
+        """ Write the lines of a StreamDisplay, or show them in a pager """
+        with tracing.span('render'):
+            if pager:
+                import click
+                click.echo_via_pager(lines)
+            else:
+                for line in lines:
+                    display.stream.write(line)
+
+    def due_tasks(self, until: datetime.date, since: datetime.date = None, categories: tuple = INDEXED_CATEGORIES,
+                  offset: int = 0, limit: int = None, file_format: str = 'table', pager: bool = False,
+                  where: Query = None, title: str = 'DUE') -> None:
+        """ Display the open tasks that are due from since to until, the earliest first
+
+        The tasks are found with the deadline index (src.deadlines), only the
+        tasks that are shown are read from the list.
+
+        :param since: datetime.date
+            The first due date to show, None to show the overdue tasks as well
+        :param categories: tuple
+            Show only the tasks in these categories, todo and/or active
+        :param where: Query
+            Show only the tasks that match, in the order of the query
+        """
+        storage = self.session.storage
+        task_ids = DeadlineIndex.open(storage).task_ids(until, since)
+
+        def rows():
+            for task_id in task_ids:
+                category = storage.find_category(task_id)
+                if category in categories:
+                    yield category, task_id, storage.get_task(task_id)
+
+        if where is not None:
+            selected = where.select(rows(), offset, limit, fields=lambda row: (row[1], row[2], row[0]))
+        else:
+            selected = itertools.islice(rows(), offset, None if limit is None else offset + limit)
+        if file_format != 'table':
+            from src.stream_view import StreamDisplay
+            display = StreamDisplay(file_format)
+            self._stream(display, display.lines(selected, title), pager)
+            return
+
+        output = self.display.console.pager(styles=True) if pager else contextlib.nullcontext()
+        with output, tracing.span('render'):
+            self.display.tasks(title, tasks=((task_id, task) for _, task_id, task in selected))
+
+    def due_counts(self, days: int, today: datetime.date = None) -> tuple:
+        """ (overdue tasks, tasks due from today to days from today), read from the deadline index only """
+        today = today or datetime.date.today()
+        index = DeadlineIndex.open(self.session.storage)
+        return index.count(today - datetime.timedelta(days=1)), index.count(today + datetime.timedelta(days=days), today)
+
+    def search_task(self, query: str = None, limit: int = None, file_format: str = 'table',
+                    include_archive: bool = False, all_lists: bool = False, where: Query = None, **search_criteria):
+        """ Display the tasks that match the search
+
+        :param query: str
+            Words to look up in the title, description and issue through the search index,
+            the results are ranked with the most relevant first
+        :param limit: int
+            Show at most this many tasks
+        :param file_format: str
+            'table' for a rich table, or one of src.stream_view.FORMATS
+        :param include_archive: bool
+            Also search the archived tasks, they are shown after the tasks of the list
+        :param all_lists: bool
+            Search every list, the results of the active list first and then
+            those of the other lists in the order of the settings
+        :param where: Query
+            Show only the tasks that match, in the order of the query instead of by relevance if it sorts
+        :param search_criteria:
+            Substring that a field of the task must contain, e.g. title='report'
+        """
         # TODO: This differs from the private functions above, refactor to look the same
-        todo_dict = JsonFile.read(self.active_list_path)
-        filtered_todo_dict = {}
-        for category, tasks in todo_dict.items():
-            if category != 'id_count':
-                for task_id, task_values in tasks.items():
-                    if self._filter_by_criteria(task_values, **search_criteria):
-                        filtered_todo_dict[task_id] = task_values
-        self.display.filtered_tasks(filtered_todo_dict)
-
-    def _filter_by_criteria(self, task: dict, **search_criteria) -> bool:
+        if all_lists:
+            list_rows = self._all_lists_search(query, limit, include_archive, where, **search_criteria)
+            if file_format == 'table':
+                with tracing.span('render'):
+                    self.display.list_tasks('SEARCH_RESULT', [(name, task_id, task) for name, _, task_id, task in list_rows])
+                return
+            rows = ((category, task_id, dict(task, list=name)) for name, category, task_id, task in list_rows)
+        else:
+            rows = self._select(self._list_search_rows(query, include_archive, **search_criteria), limit, where)
+        if file_format != 'table':
+            from src.stream_view import StreamDisplay
+            display = StreamDisplay(file_format, list_column=all_lists)
+            self._stream(display, display.lines(rows, 'SEARCH_RESULT'), pager=False)
+            return
+        filtered_todo_dict = {task_id: task_values for _, task_id, task_values in rows}
+        with tracing.span('render'):
+            self.display.filtered_tasks(filtered_todo_dict)
+
+    def _all_lists_search(self, query: str, limit: int, include_archive: bool, where: Query = None, **search_criteria) -> list:
+        """ Get [(list_name, category, task_id, task)] of the tasks of every list that match the search
+
+        Every list is searched at the same time, up to limit tasks each, and
+        lists that are known to be empty are not opened, see src.all_lists.
+        """
+        all_lists = AllLists(self.session)
+        names = []
+        for name in all_lists.names:
+            counts = all_lists.counts(name)
+            if counts is None or any(get_count(counts, category, include_archive) for category in CATEGORIES):
+                names.append(name)
+
+        def search(name, search_index, counts):
+            rows = self._select(self._list_search_rows(query, include_archive, search_index, **search_criteria), limit, where)
+            return [(name, category, task_id, task) for category, task_id, task in rows]
+
+        per_list = [matches for _, _, matches in all_lists.map(search, names)]
+        if where is not None and where.sorts:
+            rows = heapq.merge(*per_list, key=lambda row: where.sort_key(row[2], row[3], row[1]))
+        else:
+            rows = itertools.chain.from_iterable(per_list)
+        return list(itertools.islice(rows, limit))
+
+    @staticmethod
+    def _select(rows, limit: int, where: Query = None):
+        """ The first limit search rows (category, task_id, task), of those that match the query if there is one """
+        if where is None:
+            return itertools.islice(rows, limit)
+        return where.select(rows, 0, limit, fields=lambda row: (row[1], row[2], row[0]))
+
+    def _list_search_rows(self, query: str = None, include_archive: bool = False, search_index=None, **search_criteria):
+        """ Yield (category, task_id, task) for every task of a list that matches the search, the archived tasks last """
+        rows = self._search_rows(query, search_index, **search_criteria)
+        if include_archive:
+            rows = itertools.chain(rows, self._archive_rows(query, search_index and search_index.storage, **search_criteria))
+        return rows
+
+    def _search_rows(self, query: str = None, search_index=None, **search_criteria):
+        """ Yield (category, task_id, task) for every task that matches the search
+
+        :param search_index:
+            The index of the list to search, the index of the active list if None
+        """
+        search_index = search_index or self.session.search_index
+        storage = search_index.storage
+        if query:
+            matches = ((storage.find_category(task_id), task_id, storage.get_task(task_id))
+                       for task_id in search_index.search(query))
+        else:
+            matches = storage.all_tasks()
+        for category, task_id, task_values in matches:
+            if task_values is None:  # Removed from the list by a process that has not updated the index yet
+                continue
+            if self._filter_by_criteria(task_values, **search_criteria):
+                yield category, task_id, task_values
+
+    def _archive_rows(self, query: str = None, storage=None, **search_criteria):
+        """ Yield (category, task_id, task) for every archived task of a list that matches the search """
+        storage = storage or self.session.storage
+        for task_id, task in Archive(storage.file_path).search(query):
+            if storage.find_category(task_id) is None and self._filter_by_criteria(task, **search_criteria):
+                yield 'done', task_id, task
+
+    def _filter_by_criteria(self, task: Task, **search_criteria) -> bool:
         for option, criteria in search_criteria.items():
-            if not str(criteria).lower() in str(task[option]).lower():
+            if not str(criteria).lower() in str(getattr(task, option)).lower():
                 return False
         return True
 
 class Update:
     """ Handle all the changes made to an already existing task """
-    def __init__(self) -> None:
-        self.active_list_path = Path(TODO_PATH) / (Todo.get_active_todo_list() + '.json')
+    def __init__(self, session: Session = None) -> None:
+        self.session = session or Session()
+        self.active_list_path = self.session.active_list_path
 
     def start_task(self, task_id: str) -> None:
         """ The task is moved from 'todo' to 'active' """
-        todo_dict = JsonFile.read(self.active_list_path)
-        if task_id in todo_dict['todo']:
-            todo_dict['active'][task_id] = todo_dict['todo'][task_id]
-            todo_dict['todo'].pop(task_id)
-            JsonFile.write(self.active_list_path, todo_dict)
+        storage = self.session.storage
+        if storage.find_category(task_id) == 'todo':
+            with self.session.history.step('start', storage, [task_id]):
+                storage.move_task(task_id, 'active')
+            self.session.save_todo()
             print(f'Task with ID: {task_id} was moved to "active"')
         else:
             print(f'There is no task with ID: {task_id} in "todo"')
 
     def end_task(self, task_id: str):
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, task in todo_dict.items():
-            if category != 'id_count' and task_id in task.keys():
-                if category != 'done':
-                    todo_dict['done'][task_id] = todo_dict[category][task_id]
-                    todo_dict['done'][task_id]['done_date'] = CURRENT_DATE
-                    todo_dict['done'][task_id]['is_done'] = "yes"
-                    todo_dict[category].pop(task_id)
-                    JsonFile.write(self.active_list_path, todo_dict)
-                    print(f'Task with ID: {task_id} was moved to "done"')
-                    return
-                else:
-                    print(f'Task with ID: {task_id} is already done')
+        storage = self.session.storage
+        category = storage.find_category(task_id)
+        if category is None:
+            return
+        if category != 'done':
+            with self.session.history.step('done', storage, [task_id]):
+                storage.update_task(task_id, done_date=str(datetime.date.today()), is_done="yes")
+                storage.move_task(task_id, 'done')
+            self.session.save_todo()
+            print(f'Task with ID: {task_id} was moved to "done"')
+        else:
+            print(f'Task with ID: {task_id} is already done')
 
     def change_task(self, id, **kwargs):
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, task in todo_dict.items():
-            if category != 'id_count' and id in task.keys():
-                for key_to_change, value in kwargs.items():
-                    todo_dict[category][id][key_to_change] = value
-                    print(f'Changed {key_to_change} to {value}')
-        JsonFile.write(self.active_list_path, todo_dict)
+        storage = self.session.storage
+        if storage.find_category(id) is not None:
+            with self.session.history.step('change', storage, [id]):
+                storage.update_task(id, **kwargs)
+            self.session.search_index.add(id, storage.get_task(id))
+            for key_to_change, value in kwargs.items():
+                print(f'Changed {key_to_change} to {value}')
+        self.session.save_todo()
 
     def move_task(self, id, destination):
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, tasks in todo_dict.items():
-            if category != 'id_count' and id in tasks.keys():
-                todo_dict[destination][id] = tasks[id]
-                if not id in todo_dict[destination]:
-                    print(f'Task with ID: {id} was not moved to {destination}')
-                    return
-                if category == 'done':
-                    todo_dict[destination][id]['is_done'] = 'no'
-                    todo_dict[destination][id]['done_date'] = None
-                todo_dict[category].pop(id)
-                JsonFile.write(self.active_list_path, todo_dict)
-                print(f'Task with ID: {id} was moved to {destination}')
-                return
-        print(f'Task with ID: {id} was not found in the list')
+        storage = self.session.storage
+        category = storage.find_category(id)
+        if category is None:
+            print(f'Task with ID: {id} was not found in the list')
+            return
+        with self.session.history.step('move', storage, [id]):
+            if category == 'done':
+                storage.update_task(id, is_done='no', done_date=None)
+            storage.move_task(id, destination)
+        self.session.save_todo()
+        print(f'Task with ID: {id} was moved to {destination}')
+
+    def undo(self, count: int = 1) -> None:
+        """ Take back the last count changes to the list, see src.history """
+        self._apply_steps(self.session.history.undo(count), undo=True)
+
+    def redo(self, count: int = 1) -> None:
+        """ Make the last count changes that were undone again """
+        self._apply_steps(self.session.history.redo(count), undo=False)
+
+    def _apply_steps(self, steps: list, undo: bool) -> None:
+        if not steps:
+            print(f'Nothing to {"undo" if undo else "redo"}')
+            return
+        storage = self.session.storage
+        for step in steps:
+            deltas = step['tasks'][::-1] if undo else step['tasks']
+            skipped = [delta[0] for delta in deltas if not apply_delta(storage, delta, undo)]
+            for delta in deltas:
+                task = storage.get_task(delta[0])
+                if task is None:
+                    self.session.search_index.remove(delta[0])
+                else:
+                    self.session.search_index.add(delta[0], task)
+            print(f'{"Undid" if undo else "Redid"} {describe(step)}')
+            for task_id in skipped:
+                print(f'Task with ID: {task_id} has been changed since, it was left as it is')
+        self.session.save_todo()
 
 
 class Delete:
-    def __init__(self) -> None:
-        self.active_list_path = Path(TODO_PATH) / (Todo.get_active_todo_list() + '.json')
+    def __init__(self, session: Session = None) -> None:
+        self.session = session or Session()
+        self.active_list_path = self.session.active_list_path
 
     def task(self, id: str) -> None:
         """ Delete a specific task from the todo list
 
         Task is based on the task ID
         """
-        todo_dict = JsonFile.read(self.active_list_path)
-        for category, tasks in todo_dict.items():
-            if category != 'id_count' and id in tasks.keys():
-                todo_dict[category].pop(id, None)
-        JsonFile.write(self.active_list_path, todo_dict)
+        storage = self.session.storage
+        with self.session.history.step('delete', storage, [id]):
+            storage.delete_task(id)
+        self.session.search_index.remove(id)
+        self.session.save_todo()
         print(f'Task with ID: {id} was removed from the list')
 
     @staticmethod
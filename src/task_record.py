@@ -0,0 +1,162 @@
+""" Compact in-memory record of one task
+
+Every task used to be a dict with its own copy of strings like "medium",
+"no" and "2026-01-31". Task keeps its fields in __slots__ instead of a dict,
+priority, size and is_done are interned so that all tasks share one string
+per value, and the dates are datetime.date objects that are shared as well.
+
+Task can still be read like the dict that it replaces (task['title'],
+task.get('issue'), dict(task)), with the values as they are in the json
+files, so the storage engines, the journal and the output formats see the
+same data as before. Code that wants the date objects uses the attributes.
+"""
+import datetime
+import sys
+
+from collections.abc import Mapping
+
+
+TASK_FIELDS = ('issue', 'title', 'description', 'priority', 'size', 'create_date', 'done_date', 'is_done')
+CODE_FIELDS = ('priority', 'size', 'is_done')
+DATE_FIELDS = ('create_date', 'done_date')
+TASK_PROPERTIES = ('due_date',)  # Optional fields that are kept in extra and read as attributes
+_FIELD_SET = frozenset(TASK_FIELDS)
+
+
+def to_code(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+_dates = {}  # ISO date -> date, a list has few different dates so tasks share them and each is parsed once
+
+
+def to_date(value):
+    """ Read a date of the json files, a value that is not an ISO date is kept as it is """
+    if type(value) is not str:
+        return value
+    date = _dates.get(value)
+    if date is None:
+        try:
+            date = datetime.date.fromisoformat(value)
+        except ValueError:
+            return value
+        _dates[value] = date
+    return date
+
+
+def from_date(value):
+    return value.isoformat() if isinstance(value, datetime.date) else value
+
+
+class Task(Mapping):
+    """ One task of a list
+
+    :param extra: dict
+        Fields that are not in TASK_FIELDS, they are kept as they are
+    """
+    __slots__ = TASK_FIELDS + ('extra',)
+
+    def __init__(self, issue: str = None, title: str = None, description: str = None, priority: str = None,
+                 size: str = None, create_date: datetime.date = None, done_date: datetime.date = None,
+                 is_done: str = 'no', extra: dict = None) -> None:
+        self.issue = issue
+        self.title = title
+        self.description = description
+        self.priority = to_code(priority)
+        self.size = to_code(size)
+        self.create_date = to_date(create_date)
+        self.done_date = to_date(done_date)
+        self.is_done = to_code(is_done)
+        self.extra = extra or None
+
+    @classmethod
+    def from_json(cls, data: dict) -> 'Task':
+        """ Make a task from its json form, the dict that is stored in the files """
+        task = cls.__new__(cls)
+        get = data.get
+        task.issue = get('issue')
+        task.title = get('title')
+        task.description = get('description')
+        task.priority = to_code(get('priority'))
+        task.size = to_code(get('size'))
+        task.create_date = to_date(get('create_date'))
+        task.done_date = to_date(get('done_date'))
+        task.is_done = to_code(get('is_done'))
+        task.extra = None if _FIELD_SET.issuperset(data) else {key: value for key, value in data.items() if key not in _FIELD_SET}
+        return task
+
+    @property
+    def due_date(self):
+        """ The date the task is due, None if it has none (lists from before due dates, or --due none) """
+        return to_date(self.extra.get('due_date')) if self.extra else None
+
+    def to_json(self) -> dict:
+        """ The json form of the task, see from_json """
+        data = {
+            'issue': self.issue,
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority,
+            'size': self.size,
+            'create_date': from_date(self.create_date),
+            'done_date': from_date(self.done_date),
+            'is_done': self.is_done,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, fields: dict = None, **more_fields) -> None:
+        """ Change fields like dict.update, values are given in their json form or as dates """
+        for key, value in dict(fields or {}, **more_fields).items():
+            if key in CODE_FIELDS:
+                setattr(self, key, to_code(value))
+            elif key in DATE_FIELDS:
+                setattr(self, key, to_date(value))
+            elif key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                self.extra = dict(self.extra or {}, **{key: value})
+
+    def copy(self) -> 'Task':
+        task = Task.__new__(Task)
+        for field in Task.__slots__:
+            setattr(task, field, getattr(self, field))
+        if task.extra:
+            task.extra = dict(task.extra)
+        return task
+
+    def __getitem__(self, key: str):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return from_date(value) if key in DATE_FIELDS else value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from TASK_FIELDS
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(TASK_FIELDS) + len(self.extra or ())
+
+    def __repr__(self) -> str:
+        return f'Task({self.to_json()!r})'
+
+
+def task_from_json_object(data: dict):
+    """ object_hook for json.load that makes every task of a list a Task while it is parsed
+
+    The list itself and its categories are returned as they are. Tasks are
+    the objects with a title, task IDs are numbers so no category has one.
+    """
+    return Task.from_json(data) if 'title' in data else data
+
+
+def encode_task(value) -> dict:
+    """ default for json.dumps, writes a Task in its json form """
+    if isinstance(value, Task):
+        return value.to_json()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -1,27 +1,18 @@
 """ Handle the todo lists """
-from pathlib import Path
-from src.settings_handler import Todo
-from src.file_handler import JsonFile
-from src.constants import TODO_PATH
+from src.session import Session
 
 
 class List:
     @staticmethod
-    def get_issue_from_task(task_id: str) -> str:
+    def get_issue_from_task(task_id: str, session: Session = None) -> str:
         """ Get the issue from a task
 
         :param task_id: The ID of the task
+        :param session: The session of the current command, a new one is used if None
         :return: The issue Jira issue of the task
         """
-        active_list_name = Todo.get_active_todo_list()
-        list_path = Path(TODO_PATH) / (active_list_name + '.json')
-        list_content = JsonFile.read(list_path)
-        for category, value in list_content.items():
-            if category == 'id_count':
-                continue
-            if task_id in value:
-                task = list_content[category][task_id]
-                if 'issue' not in task:
-                    return None
-                return list_content[category][task_id]['issue']
-        return None
+        session = session or Session()
+        task = session.storage.get_task(task_id)
+        if task is None:
+            return None
+        return task.issue
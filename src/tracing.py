@@ -0,0 +1,151 @@
+""" Timing spans for the phases of a command, to see where the time of a slow command goes
+
+Turned on with 'check --profile' or the CHECK_TRACE environment variable:
+
+    CHECK_TRACE=1 check list --all               summary of the spans on stderr
+    CHECK_TRACE=trace.json check list --all      summary, and a Chrome trace-event file
+    check --profile list --all                   summary, and the functions that took the most time (cProfile)
+    check --profile --profile-output list.pstats list --all
+
+Spans nest, and the time of a span includes the spans in it. The list is
+read when it is first used, so 'list load' is often inside 'render' or
+inside the command.
+
+The trace-event file opens in chrome://tracing or https://ui.perfetto.dev,
+the pstats file with python -m pstats. When tracing is off, span returns
+one shared context manager that does nothing, so the spans cost next to
+nothing in normal use.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()  # This module is imported first by cli.py, the time before a command is the import time
+
+TRACE_ENVIRONMENT_VARIABLE = 'CHECK_TRACE'
+PROFILE_FUNCTIONS = 20  # Functions shown on stderr by --profile without --profile-output
+_NO_SPAN = contextlib.nullcontext()
+_tracer = None
+_import_traced = False  # 'check serve' traces many commands, the import is only part of the first
+
+
+class Tracer:
+    """ Collects the spans of one command
+
+    :param trace_path: str
+        Write the spans as a Chrome trace-event file
+    :param profile: bool
+        Run cProfile while the command runs
+    :param profile_path: str
+        Write the cProfile stats to this file instead of showing them
+    """
+    def __init__(self, trace_path: str = None, profile: bool = False, profile_path: str = None) -> None:
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.spans = []  # (name, start, duration, thread ID, depth, args)
+        self._local = threading.local()
+        self.started = time.perf_counter()
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter() - start, threading.get_ident(), depth, args))
+            self._local.depth = depth
+
+    def finish(self, stream=None) -> None:
+        """ Stop the profiler, show the summary and write the files """
+        stream = stream or sys.stderr
+        if self.profiler is not None:
+            self.profiler.disable()
+        stream.write(self.summary())
+        if self.trace_path:
+            with open(self.trace_path, 'w', encoding='utf-8') as file:
+                json.dump(self.trace_events(), file)
+            stream.write(f'Trace written to {self.trace_path}\n')
+        if self.profiler is not None:
+            import pstats
+            if self.profile_path:
+                self.profiler.dump_stats(self.profile_path)
+                stream.write(f'Profile written to {self.profile_path}\n')
+            else:
+                pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_FUNCTIONS)
+
+    def summary(self) -> str:
+        """ Total time of every span name, in the order in which they started, indented by nesting """
+        totals = {}
+        for name, start, duration, _, depth, _ in sorted(self.spans, key=lambda span: span[1]):
+            total = totals.setdefault(name, {'depth': depth, 'count': 0, 'seconds': 0})
+            total['count'] += 1
+            total['seconds'] += duration
+        first_start = min([span[1] for span in self.spans] + [self.started])
+        lines = [f'check trace, {(time.perf_counter() - first_start) * 1000:.1f} ms in total\n']
+        for name, total in totals.items():
+            label = '  ' * (total['depth'] + 1) + name
+            count = f' ({total["count"]}x)' if total['count'] > 1 else ''
+            lines.append(f'{label:<40}{total["seconds"] * 1000:>10.1f} ms{count}\n')
+        return ''.join(lines)
+
+    def trace_events(self) -> dict:
+        """ The spans in the Chrome trace-event format, complete events in microseconds """
+        events = [{
+            'name': name,
+            'cat': 'check',
+            'ph': 'X',
+            'ts': (start - STARTED) * 1e6,
+            'dur': duration * 1e6,
+            'pid': os.getpid(),
+            'tid': thread,
+            'args': args,
+        } for name, start, duration, thread, _, args in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def start(profile: bool = False, profile_path: str = None) -> bool:
+    """ Start tracing if --profile was given or CHECK_TRACE is set
+
+    :return: bool
+        True if tracing was started, finish must then be called
+    """
+    global _tracer, _import_traced
+    setting = os.environ.get(TRACE_ENVIRONMENT_VARIABLE, '')
+    if setting == '0':
+        setting = ''
+    if not (profile or profile_path or setting):
+        return False
+    trace_path = setting if setting.lower().endswith('.json') else None
+    _tracer = Tracer(trace_path, profile or bool(profile_path), profile_path)
+    if not _import_traced:
+        _tracer.spans.append(('import', STARTED, _tracer.started - STARTED, threading.get_ident(), 0, {}))
+        _import_traced = True
+    return True
+
+
+def finish() -> None:
+    global _tracer
+    if _tracer is not None:
+        tracer, _tracer = _tracer, None
+        tracer.finish()
+
+
+def span(name: str, **args):
+    """ Time the block of a with statement as a span, if tracing is on
+
+    :param args:
+        Shown with the span in the trace-event file, e.g. the Jira method
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, **args)
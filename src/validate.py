@@ -1,32 +1,27 @@
 """ Module to handle validations """
-from src.file_handler import JsonFile
+from src.settings_cache import settings_cache
 from src.constants import SETTINGS_PATH
 
 
 class Priority:
 
     @staticmethod
-    def is_valid_option(option: str) -> bool:
+    def is_valid_option(option: str, settings: dict = None) -> bool:
         """ Check that the option is a valid option
 
-        The input should be in the check settings json file
+        The input should be in the check settings json file.
+        Pass already loaded settings to check against them instead, e.g. the settings of a session.
         """
-        settings = JsonFile.read(SETTINGS_PATH)
-        valid_options = settings['priority']['colors']
-
-        if option not in valid_options:
-            return False
-        return True
+        if settings is None:
+            return option in settings_cache.options(SETTINGS_PATH, 'priority')
+        return option in settings['priority']['colors']
 
 
 class Size:
 
     @staticmethod
-    def is_valid_option(option: str) -> bool:
+    def is_valid_option(option: str, settings: dict = None) -> bool:
         """ Check that the option is a valid option """
-        settings = JsonFile.read(SETTINGS_PATH)
-        valid_options = settings['size']['colors']
-
-        if option not in valid_options:
-            return False
-        return True
\ No newline at end of file
+        if settings is None:
+            return option in settings_cache.options(SETTINGS_PATH, 'size')
+        return option in settings['size']['colors']
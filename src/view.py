@@ -1,17 +1,15 @@
 """ Module for displaying things in the CLI application """
 
-from pathlib import Path
 from rich.table import Table
 from rich.text import Text
 from rich.console import Console
-from src.file_handler import JsonFile
-from src.settings_handler import Todo
-from src.constants import TODO_PATH, SETTINGS_PATH, CURRENT_DATE
+from src.session import Session
 
 class Display:
-    def __init__(self) -> None:
+    def __init__(self, session: Session = None) -> None:
         self.console = Console()
-        self.settings_dict = JsonFile.read(SETTINGS_PATH)
+        self.session = session or Session()
+        self.settings_dict = self.session.settings
 
     def todo_lists(self):
         lists_dict = self.settings_dict['lists']
@@ -19,41 +17,44 @@ class Display:
         for each in lists_dict['inactive']:
             self.console.print(each)
 
-    def tasks(self, category: str):
-        active_list = Todo.get_active_todo_list()
-        active_list_path = Path(TODO_PATH) / (active_list + '.json')
-        todo_dict = JsonFile.read(active_list_path)
-        task_dict = JsonFile.get_all_tasks(todo_dict)
+    def tasks(self, category: str, offset: int = 0, limit: int = None, tasks=None):
+        """ Show a slice of a category as a table
 
-        table = Table(title=category.upper(), show_lines=True, style='steel_blue3')
-        table.add_column("ID", style="white", justify="center", width=5)
-        table.add_column("Issue", style="white", justify="center")
-        table.add_column("Title", style="white", justify="center", width=25)
-        table.add_column("Description", style="white", justify="center", width=30)
-        table.add_column("Priority", style="white", justify="center")
-        table.add_column("Size", style="white", justify="center")
-        table.add_column("Create Date", style="white", justify="center")
-        table.add_column("Done Date", style="white", justify="center")
-        table.add_column("Done", style="white", justify="center")
-
-        for task, info in task_dict[category].items():
-            table.add_row(
-                task,
-                info['issue'],
-                info['title'],
-                info['description'],
-                self.add_color(str(info['priority']), 'priority'),
-                self.add_color(str(info['size']), 'size'),
-                str(info['create_date']),
-                str(info['done_date']),
-                self.add_color(str(info['is_done']), 'is_done')
-            )
+        :param tasks:
+            (task_id, task) to show instead of the tasks of the category in the list
+        """
+        table = self._table(category.upper())
+        if tasks is None:
+            tasks = self.session.storage.iter_tasks(category, offset, limit)
+        for task, info in tasks:
+            table.add_row(*self._cells(task, info))
 
         self.console.print(table)
 
     def filtered_tasks(self, todos: dict):
-        # TODO: Repetitive code, this should be refactored
-        table = Table(title='SEARCH_RESULT', show_lines=True, style='steel_blue3')
+        table = self._table('SEARCH_RESULT')
+        for task, info in todos.items():
+            table.add_row(*self._cells(task, info))
+
+        self.console.print(table)
+
+    def list_tasks(self, title: str, rows):
+        """ Show tasks of several lists in one table, with the name of their list in the first column
+
+        :param rows:
+            (list_name, task_id, task)
+        """
+        table = self._table(title, list_column=True)
+        for list_name, task, info in rows:
+            table.add_row(list_name, *self._cells(task, info))
+
+        self.console.print(table)
+
+    @staticmethod
+    def _table(title: str, list_column: bool = False) -> Table:
+        table = Table(title=title, show_lines=True, style='steel_blue3')
+        if list_column:
+            table.add_column("List", style="white", justify="center")
         table.add_column("ID", style="white", justify="center", width=5)
         table.add_column("Issue", style="white", justify="center")
         table.add_column("Title", style="white", justify="center", width=25)
@@ -62,22 +63,23 @@ class Display:
         table.add_column("Size", style="white", justify="center")
         table.add_column("Create Date", style="white", justify="center")
         table.add_column("Done Date", style="white", justify="center")
+        table.add_column("Due Date", style="white", justify="center")
         table.add_column("Done", style="white", justify="center")
+        return table
 
-        for task, info in todos.items():
-            table.add_row(
-                task,
-                info['issue'],
-                info['title'],
-                info['description'],
-                self.add_color(str(info['priority']), 'priority'),
-                self.add_color(str(info['size']), 'size'),
-                str(info['create_date']),
-                str(info['done_date']),
-                self.add_color(str(info['is_done']), 'is_done')
-            )
-
-        self.console.print(table)
+    def _cells(self, task: str, info) -> tuple:
+        return (
+            task,
+            info.issue,
+            info.title,
+            info.description,
+            self.add_color(str(info.priority), 'priority'),
+            self.add_color(str(info.size), 'size'),
+            str(info.create_date),
+            str(info.done_date),
+            str(info.due_date),
+            self.add_color(str(info.is_done), 'is_done')
+        )
 
     def add_color(self, text_value: str, category: str):
         color = self.settings_dict[category]['colors'][text_value]
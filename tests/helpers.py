@@ -0,0 +1,45 @@
+""" Fixtures that are shared by the tests """
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.storage import create_storage
+
+
+class AppDataTestCase(unittest.TestCase):
+    """ Runs every test against its own data directory with the settings and an empty list "work"
+
+    The paths that the session and the outbox use are patched to point into
+    the directory, so nothing is read from or written to the real data.
+    """
+    settings = {
+        'lists': {'active': 'work', 'inactive': []},
+        'priority': {'colors': {'low': 'green', 'medium': 'yellow', 'high': 'red'}},
+        'size': {'colors': {'small': 'green', 'medium': 'yellow', 'large': 'red'}},
+    }
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        self.settings_path = self.data_dir / 'todo_settings.json'
+        self.settings_path.write_text(json.dumps(self.settings))
+        create_storage(self.data_dir, 'work')
+        lock_dir = self.data_dir / 'locks'
+        self.patches = [
+            patch('src.session.SETTINGS_PATH', self.settings_path),
+            patch('src.session.TODO_PATH', self.data_dir),
+            patch('src.session.LOCK_DIR', lock_dir),
+            patch('src.session.SETTINGS_LOCK_PATH', lock_dir / 'todo_settings.lock'),
+            patch('src.outbox.TODO_PATH', self.data_dir),
+            patch('src.outbox.LOCK_DIR', lock_dir),
+            patch('src.all_lists.TODO_PATH', self.data_dir),
+            patch('src.all_lists.LISTS_SUMMARY_PATH', self.data_dir / 'lists_summary.json'),
+        ]
+        for each in self.patches:
+            each.start()
+
+    def tearDown(self) -> None:
+        for each in self.patches:
+            each.stop()
+        self.tmp_dir.cleanup()
@@ -0,0 +1,87 @@
+""" """
+import contextlib
+import csv
+import io
+import json
+import unittest
+from unittest.mock import patch
+from src.all_lists import AllLists
+from src.session import Session
+from src.storage import create_storage, open_storage
+from src.task import Read
+from src.task_record import Task
+from tests.helpers import AppDataTestCase
+
+
+class TestAllLists(AppDataTestCase):
+    settings = dict(AppDataTestCase.settings, lists={'active': 'work', 'inactive': ['home', 'empty', 'big']})
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.add_tasks('work', ['report', 'slides'])
+        self.add_tasks('home', ['laundry', 'report taxes'], engine_name='sqlite')
+        self.add_tasks('empty', [])
+        self.add_tasks('big', [f'big {number}' for number in range(1, 6)])
+        self.session = Session()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        super().tearDown()
+
+    def add_tasks(self, list_name: str, titles: list, engine_name: str = 'json') -> None:
+        if list_name != 'work':
+            create_storage(self.data_dir, list_name, engine_name)
+        storage = open_storage(self.data_dir, list_name)
+        for task_id, title in enumerate(titles, 1):
+            storage.add_task('todo', str(task_id), Task(title=title, description='d', priority='low', size='small'))
+        storage.set_id_count(len(titles))
+        storage.flush()
+        storage.close()
+
+    def output(self, method: str, *args, **kwargs) -> list:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            getattr(Read(self.session), method)(*args, file_format='jsonl', all_lists=True, **kwargs)
+        return [(record['list'], record['title']) for record in map(json.loads, output.getvalue().splitlines())]
+
+    def test_list_shows_every_list_in_order(self):
+        self.assertEqual(self.output('tasks', 'todo'), [
+            ('work', 'report'), ('work', 'slides'), ('home', 'laundry'), ('home', 'report taxes'),
+            ('big', 'big 1'), ('big', 'big 2'), ('big', 'big 3'), ('big', 'big 4'), ('big', 'big 5'),
+        ])
+
+    def test_offset_and_limit_count_all_lists(self):
+        self.assertEqual(self.output('tasks', 'todo', offset=3, limit=3),
+                         [('home', 'report taxes'), ('big', 'big 1'), ('big', 'big 2')])
+
+    def test_lists_outside_the_slice_are_not_opened(self):
+        self.output('tasks', 'todo')  # Counts every list
+        with patch.object(AllLists, 'map', autospec=True, side_effect=AllLists.map) as map_lists:
+            self.assertEqual(self.output('tasks', 'todo', limit=3), [('work', 'report'), ('work', 'slides'), ('home', 'laundry')])
+            self.assertEqual(map_lists.call_args.args[2], ['work', 'home'])
+            self.assertEqual(self.output('tasks', 'todo', offset=4, limit=1), [('big', 'big 1')])
+            self.assertEqual(map_lists.call_args.args[2], ['big'])
+
+    def test_counts_are_read_again_when_a_list_changes(self):
+        self.output('tasks', 'todo')
+        self.add_tasks('empty', ['new'])
+        self.assertEqual(self.output('tasks', 'todo', offset=4, limit=1), [('empty', 'new')])
+
+    def test_search_merges_the_lists(self):
+        self.assertEqual(self.output('search_task', 'report'), [('work', 'report'), ('home', 'report taxes')])
+        self.assertEqual(self.output('search_task', 'report', limit=1), [('work', 'report')])
+
+    def test_csv_has_a_list_column(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            Read(self.session).search_task('laundry', file_format='csv', all_lists=True)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual([(row['list'], row['id']) for row in rows], [('home', '1')])
+
+    def test_map_keeps_the_order_of_the_lists(self):
+        results = AllLists(self.session).map(lambda name, index, counts: counts['todo'], ['big', 'work', 'home'])
+        self.assertEqual([(name, result) for name, _, result in results], [('big', 5), ('work', 2), ('home', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
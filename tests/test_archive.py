@@ -0,0 +1,75 @@
+""" """
+import contextlib
+import io
+import json
+import unittest
+from src.archive import Archive
+from src.session import Session
+from src.storage import open_storage
+from src.task import Create, Read, Update
+from tests.helpers import AppDataTestCase
+
+
+class TestArchive(AppDataTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.session = Session()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        super().tearDown()
+
+    def add_done_task(self, title: str, done_date: str) -> str:
+        task_id = Create(title, 'description', 'medium', 'medium', None, self.session).new_task()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Update(self.session).end_task(task_id)
+        self.session.storage.update_task(task_id, done_date=done_date)
+        self.session.save_todo()
+        return task_id
+
+    def test_old_done_tasks_are_moved_to_the_archive(self):
+        self.add_done_task('january', '2025-01-15')
+        self.add_done_task('february', '2025-02-01')
+        self.add_done_task('another january', '2025-01-20')
+        recent = self.add_done_task('recent', '2099-01-01')
+
+        storage = open_storage(self.data_dir, 'work')
+        self.assertEqual([task_id for task_id, _ in storage.iter_tasks('done')], [recent])
+        archive = Archive(storage.file_path)
+        self.assertEqual(archive.months(), {'2025-01': 2, '2025-02': 1})
+        self.assertEqual([task.title for task in archive.read_month('2025-01').values()], ['january', 'another january'])
+        self.assertEqual(self.session.search_index.search('january'), [])
+
+    def test_archive_age_comes_from_the_settings(self):
+        self.session.settings['archive'] = {'after_days': 0}
+        task_id = self.add_done_task('old', '2025-01-15')
+        self.assertEqual(open_storage(self.data_dir, 'work').find_category(task_id), 'done')
+
+    def test_list_shows_the_archive_only_when_asked(self):
+        for day in range(1, 6):
+            self.add_done_task(f'old {day}', f'2025-0{day}-01')
+        self.add_done_task('recent', '2099-01-01')
+        read = Read(self.session)
+
+        def titles(**options):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                read.tasks('done', file_format='jsonl', **options)
+            return [json.loads(line)['title'] for line in output.getvalue().splitlines()]
+
+        self.assertEqual(titles(), ['recent'])
+        self.assertEqual(titles(include_archive=True), ['old 1', 'old 2', 'old 3', 'old 4', 'old 5', 'recent'])
+        self.assertEqual(titles(include_archive=True, offset=4, limit=2), ['old 5', 'recent'])
+
+    def test_search_finds_archived_tasks_last(self):
+        self.add_done_task('report archived', '2025-01-15')
+        Create('report open', 'description', 'medium', 'medium', None, self.session).new_task()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            Read(self.session).search_task('report', file_format='jsonl', include_archive=True)
+        self.assertEqual([json.loads(line)['title'] for line in output.getvalue().splitlines()],
+                         ['report open', 'report archived'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+""" """
+import unittest
+from unittest.mock import patch
+from src.batch import Batch
+from src.session import Session
+from src.storage import open_storage
+from tests.helpers import AppDataTestCase
+
+
+class TestBatch(AppDataTestCase):
+    def test_jsonl_operations_are_applied_with_one_write(self):
+        """ All operations end up in the list, written by a single flush """
+        lines = [
+            '{"op": "add", "title": "first", "description": "d"}',
+            '{"op": "add", "title": "second", "description": "d", "priority": "high"}',
+            '{"op": "start", "id": "1"}',
+            '{"op": "done", "id": 2}',
+            '{"op": "change", "id": "1", "title": "changed"}',
+        ]
+        batch = Batch(Session())
+        operations = batch.read_operations(lines)
+        self.assertEqual(batch.validate(operations), [])
+        with patch('src.storage.JsonStorage.flush', autospec=True, side_effect=lambda storage: None) as mock_flush:
+            batch.apply(operations)
+            self.assertEqual(mock_flush.call_count, 1)
+
+    def test_csv_operations(self):
+        """ Empty csv cells are left out of the operation """
+        lines = ['op,id,title,description,size', 'add,,first,d,large', 'move,1,,,']
+        operations = Batch.read_operations(lines, 'csv')
+        self.assertEqual(operations[0], {'op': 'add', 'title': 'first', 'description': 'd', 'size': 'large'})
+        self.assertEqual(operations[1], {'op': 'move', 'id': '1'})
+
+    def test_lines_that_are_not_operations_are_rejected(self):
+        """ A json value that is not an object, or a csv row with extra cells, cannot be read """
+        with self.assertRaisesRegex(ValueError, 'Line 2'):
+            Batch.read_operations(['{"op": "start", "id": "1"}', '["start", "1"]'])
+        with self.assertRaisesRegex(ValueError, 'Row 3'):
+            Batch.read_operations(['op,id', 'start,1', 'move,2,done'], 'csv')
+
+    def test_invalid_operations_are_reported(self):
+        """ Every invalid operation gets its own error message """
+        operations = [
+            {'op': 'add', 'title': 'no description'},
+            {'op': 'unknown'},
+            {'op': 'add', 'title': 't', 'description': 'd', 'priority': 'urgent'},
+            {'op': 'move', 'id': '1', 'destination': 'somewhere'},
+        ]
+        self.assertEqual(len(Batch(Session()).validate(operations)), 4)
+
+    def test_applied_operations_are_stored(self):
+        """ Moving a task to done through a batch marks it as done """
+        batch = Batch(Session())
+        batch.apply([
+            {'op': 'add', 'title': 'first', 'description': 'd'},
+            {'op': 'move', 'id': '1', 'destination': 'done'},
+        ])
+        storage = open_storage(self.data_dir, 'work')
+        self.assertEqual(storage.find_category('1'), 'done')
+        self.assertEqual(storage.get_task('1')['is_done'], 'yes')
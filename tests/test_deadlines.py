@@ -0,0 +1,124 @@
+""" """
+import contextlib
+import datetime
+import io
+import json
+import unittest
+from unittest.mock import patch
+from src.deadlines import DeadlineIndex, parse_days, parse_due
+from src.query import Query
+from src.session import Session
+from src.storage import create_storage, open_storage
+from src.task import Create, Read, Update
+from tests.helpers import AppDataTestCase
+
+
+TODAY = datetime.date(2026, 3, 10)
+
+
+class TestParse(unittest.TestCase):
+    def test_days(self):
+        self.assertEqual(parse_days('3'), 3)
+        self.assertEqual(parse_days('3d'), 3)
+        self.assertEqual(parse_days('2w'), 14)
+        with self.assertRaises(ValueError):
+            parse_days('soon')
+
+    def test_due_dates(self):
+        self.assertEqual(parse_due('2026-04-01', TODAY), datetime.date(2026, 4, 1))
+        self.assertEqual(parse_due('today', TODAY), TODAY)
+        self.assertEqual(parse_due('tomorrow', TODAY), datetime.date(2026, 3, 11))
+        self.assertEqual(parse_due('1w', TODAY), datetime.date(2026, 3, 17))
+        self.assertIsNone(parse_due('none', TODAY))
+        with self.assertRaises(ValueError):
+            parse_due('next week', TODAY)
+
+
+class TestDeadlineIndex(AppDataTestCase):
+    engine_name = 'json'
+
+    def setUp(self) -> None:
+        super().setUp()
+        if self.engine_name != 'json':
+            create_storage(self.data_dir, 'work', self.engine_name)
+            (self.data_dir / 'work.json').unlink()
+            (self.data_dir / 'work.journal').unlink(missing_ok=True)
+        self.session = Session()
+        self.add('Pay rent', '2026-03-01')
+        self.add('No due date', None)
+        self.add('Report', '2026-03-12')
+        self.add('Slides', '2026-03-10')
+        self.add('Later', '2026-05-01')
+
+    def tearDown(self) -> None:
+        self.session.close()
+        super().tearDown()
+
+    def add(self, title: str, due_date: str) -> str:
+        due_date = due_date and datetime.date.fromisoformat(due_date)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Create(title, 'd', 'low', 'small', None, self.session, due_date).new_task()
+
+    def index(self) -> DeadlineIndex:
+        return DeadlineIndex.open(open_storage(self.data_dir, 'work'))
+
+    def due(self, until: datetime.date, since: datetime.date = None, **options) -> list:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            Read(self.session).due_tasks(until, since, file_format='jsonl', **options)
+        return [record['title'] for record in map(json.loads, output.getvalue().splitlines())]
+
+    def test_tasks_are_sorted_by_due_date(self):
+        self.assertEqual(self.index().task_ids(datetime.date(2026, 12, 31)), ['1', '4', '3', '5'])
+        self.assertEqual(self.due(datetime.date(2026, 3, 12), TODAY), ['Slides', 'Report'])
+
+    def test_counts_of_the_warning(self):
+        self.assertEqual(Read(self.session).due_counts(3, TODAY), (1, 2))
+        self.assertEqual(Read(self.session).due_counts(0, TODAY), (1, 1))
+
+    def test_the_warning_does_not_read_the_list(self):
+        self.session.close()
+        session = Session()
+        Read(session).due_counts(3, TODAY)
+        if self.engine_name == 'json':
+            self.assertIsNone(session.storage._data)
+        else:
+            self.assertIsNone(session.storage._connection)
+        session.close()
+
+    def test_flush_updates_only_the_changed_tasks(self):
+        self.index()
+        with patch.object(DeadlineIndex, 'build') as build, contextlib.redirect_stdout(io.StringIO()):
+            Update(self.session).change_task('2', due_date='2026-03-09')
+            Update(self.session).end_task('1')
+            Update(self.session).change_task('5', due_date=None)
+        build.assert_not_called()
+        self.assertEqual(self.index().task_ids(datetime.date(2026, 12, 31)), ['2', '4', '3'])
+
+    def test_index_is_built_again_when_the_list_changed_elsewhere(self):
+        storage = open_storage(self.data_dir, 'work')
+        storage.update_task('3', due_date='2026-02-01')
+        storage.flush()
+        storage.close()
+        self.assertEqual(self.index().task_ids(TODAY, None), ['3', '1', '4'])
+
+    def test_index_is_built_again_when_it_is_damaged(self):
+        path = DeadlineIndex(self.session.active_list_path).path
+        path.write_bytes(b'not an index')
+        self.assertEqual(self.index().count(TODAY), 2)
+
+    def test_categories_and_where(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            Update(self.session).start_task('3')
+        until = datetime.date(2026, 12, 31)
+        self.assertEqual(self.due(until, categories=('active',)), ['Report'])
+        self.assertEqual(self.due(until, where=Query('title~re sort:-due')), ['Report', 'Pay rent'])
+        self.assertEqual(self.due(until, offset=1, limit=2), ['Slides', 'Report'])
+
+
+class TestDeadlineIndexSqlite(TestDeadlineIndex):
+    engine_name = 'sqlite'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,13 @@
 """ """
+import tempfile
+import threading
+import time
 import unittest
+from pathlib import Path
 from unittest.mock import patch, mock_open
+from src.file_handler import FileLock, JsonFile, get_optional_module
+from src.storage import JsonStorage, convert
+from src.task_record import Task
 from src.task import Create, Read, Update, Delete
 
 
@@ -8,4 +15,73 @@ class TestCreate(unittest.TestCase):
     def setUp(self) -> None:
         create = Create()
 
-    
\ No newline at end of file
+    
+
+
+class TestFileLock(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lock_path = Path(self.tmp_dir.name) / 'list.lock'
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_lock_is_reentrant_in_one_thread(self):
+        with FileLock(self.lock_path):
+            with FileLock(self.lock_path, timeout=0):
+                pass
+
+    def test_threads_wait_for_each_other(self):
+        inside = []
+        overlaps = []
+
+        def work():
+            for _ in range(20):
+                with FileLock(self.lock_path):
+                    inside.append(1)
+                    if len(inside) > 1:
+                        overlaps.append(1)
+                    time.sleep(0.001)
+                    inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [])
+
+
+class TestJsonFile(unittest.TestCase):
+    data = {'id_count': 1, 'todo': {'1': {'title': 'ä', 'done_date': None}}, 'active': {}, 'done': {}}
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'work.json'
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_json_is_written_compact(self):
+        JsonFile.write(self.path, self.data)
+        self.assertNotIn(b'\n', self.path.read_bytes())
+        self.assertEqual(JsonFile.read(self.path), self.data)
+
+    @unittest.skipIf(get_optional_module('msgpack') is None, 'msgpack is not installed')
+    def test_codec_is_detected_when_read(self):
+        JsonFile.write(self.path, self.data, codec='msgpack')
+        self.assertEqual(JsonFile.get_codec(self.path), 'msgpack')
+        self.assertEqual(JsonFile.read(self.path), self.data)
+
+    @unittest.skipIf(get_optional_module('msgpack') is None, 'msgpack is not installed')
+    def test_converted_list_keeps_its_codec(self):
+        JsonStorage.create(self.path)
+        storage = JsonStorage(self.path, {'storage': {'compact_threshold': 0}})
+        storage.add_task('todo', '1', Task(title='first'))
+        storage.flush()
+        convert(self.path.parent, 'work', 'msgpack')
+        storage = JsonStorage(self.path, {'storage': {'compact_threshold': 0}})
+        storage.add_task('todo', '2', Task(title='second'))
+        storage.flush()
+        self.assertEqual(JsonFile.get_codec(self.path), 'msgpack')
+        self.assertEqual([task.title for _, _, task in JsonStorage(self.path).all_tasks()], ['first', 'second'])
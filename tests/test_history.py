@@ -0,0 +1,115 @@
+""" """
+import contextlib
+import io
+import unittest
+from unittest.mock import patch
+from src.history import History
+from src.session import Session
+from src.storage import create_storage, open_storage
+from src.task import Create, Update, Delete
+from tests.helpers import AppDataTestCase
+
+
+class TestHistory(AppDataTestCase):
+    engine_name = 'json'
+
+    def setUp(self) -> None:
+        super().setUp()
+        if self.engine_name != 'json':
+            create_storage(self.data_dir, 'work', self.engine_name)
+            (self.data_dir / 'work.json').unlink()
+            (self.data_dir / 'work.journal').unlink(missing_ok=True)
+        self.session = Session()
+        self.output = io.StringIO()
+        self.quiet = contextlib.redirect_stdout(self.output)
+        self.quiet.__enter__()
+        for title in ('report', 'slides', 'mail'):
+            Create(title, 'd', 'low', 'small', None, self.session).new_task()
+
+    def tearDown(self) -> None:
+        self.quiet.__exit__(None, None, None)
+        self.session.close()
+        super().tearDown()
+
+    def titles(self) -> dict:
+        storage = open_storage(self.data_dir, 'work')
+        titles = {task_id: (category, task['title']) for category, task_id, task in storage.all_tasks()}
+        storage.close()
+        return titles
+
+    def test_undo_and_redo_a_change(self):
+        Update(self.session).change_task('1', title='changed', priority='high')
+        Update(self.session).undo()
+        self.assertEqual(self.titles()['1'], ('todo', 'report'))
+        self.assertEqual(open_storage(self.data_dir, 'work').get_task('1')['priority'], 'low')
+        Update(self.session).redo()
+        self.assertEqual(self.titles()['1'], ('todo', 'changed'))
+
+    def test_undo_several_steps_in_order(self):
+        Update(self.session).start_task('2')
+        Update(self.session).end_task('2')
+        Delete(self.session).task('3')
+        Update(self.session).undo(3)
+        self.assertEqual(self.titles(), {'1': ('todo', 'report'), '2': ('todo', 'slides'), '3': ('todo', 'mail')})
+        self.assertIsNone(open_storage(self.data_dir, 'work').get_task('2')['done_date'])
+        Update(self.session).redo(2)
+        self.assertEqual(self.titles()['2'], ('done', 'slides'))
+        self.assertIn('3', self.titles())
+
+    def test_undo_of_an_add_removes_the_task_and_redo_adds_it_again(self):
+        Update(self.session).undo()
+        self.assertNotIn('3', self.titles())
+        self.assertEqual(self.session.search_index.search('mail'), [])
+        Update(self.session).redo()
+        self.assertEqual(self.titles()['3'], ('todo', 'mail'))
+        self.assertEqual(self.session.search_index.search('mail'), ['3'])
+
+    def test_a_new_change_clears_the_redo_steps(self):
+        Update(self.session).undo()
+        Update(self.session).change_task('1', title='changed')
+        Update(self.session).redo()
+        self.assertIn('Nothing to redo', self.output.getvalue())
+        self.assertNotIn('3', self.titles())
+
+    def test_a_task_that_was_deleted_since_is_skipped(self):
+        Update(self.session).change_task('1', title='changed')
+        storage = open_storage(self.data_dir, 'work')
+        storage.delete_task('1')
+        storage.flush()
+        storage.close()
+        self.session.reset()
+        Update(self.session).undo()
+        self.assertIn('Task with ID: 1 has been changed since', self.output.getvalue())
+        self.assertNotIn('1', self.titles())
+
+    def test_steps_only_keep_what_changed(self):
+        size = History(self.session.active_list_path).undo_journal.size()
+        Update(self.session).change_task('1', title='changed')
+        self.assertLess(History(self.session.active_list_path).undo_journal.size() - size, 150)
+
+    def test_steps_of_other_processes_are_kept(self):
+        if self.engine_name == 'sqlite':
+            self.skipTest('SQLite lets one session at a time have changes that are not flushed')
+        other = Session(autoflush=False)
+        Update(other).change_task('1', title='other')
+        Update(self.session).change_task('2', title='ours')
+        other.close()
+        Update(self.session).undo(2)
+        self.assertEqual(self.titles()['1'], ('todo', 'report'))
+        self.assertEqual(self.titles()['2'], ('todo', 'slides'))
+
+    def test_the_oldest_steps_are_dropped(self):
+        with patch('src.history.HISTORY_TRIM_BYTES', 2000), patch('src.history.HISTORY_STEPS', 5):
+            for number in range(30):
+                Update(self.session).change_task('1', title=f'title {number}')
+            history = History(self.session.active_list_path)
+            self.assertLessEqual(history.undo_journal.size(), 2000)
+            self.assertEqual(history.undo_journal.read()[-1]['tasks'][0][4], {'title': 'title 29'})
+
+
+class TestHistorySqlite(TestHistory):
+    engine_name = 'sqlite'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+""" """
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from src.jira_bulk import JiraBulk
+from src.jira_gateway import JiraGateway
+from src.session import Session
+from src.storage import open_storage
+from src.task import Create, Update
+from tests.helpers import AppDataTestCase
+
+
+class StubApi:
+    created = 0
+    lock = threading.Lock()
+
+    def create_issue(self, title, *args):
+        if title == 'broken':
+            return None
+        with StubApi.lock:
+            StubApi.created += 1
+            return f'ABC-{StubApi.created}'
+
+    def transition_issue(self, issue, transition):
+        return True
+
+    def move_issue_to_done(self, issue, transition):
+        return True
+
+    def get_complete_issue_data(self, issue):
+        return None if issue == 'ABC-404' else {'key': issue}
+
+    def get_issue_title(self, issue_dict):
+        return f'Title of {issue_dict["key"]}'
+
+    def get_issue_description(self, issue_dict):
+        return 'From Jira'
+
+
+class TestJiraBulk(AppDataTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        StubApi.created = 0
+        gateway = JiraGateway(api_factory=StubApi, retries=0)
+        self.gateway_patch = patch('src.jira_gateway.JiraGateway', lambda: gateway)
+        self.gateway_patch.start()
+        self.session = Session()
+        self.bulk = JiraBulk(self.session, MagicMock())
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.gateway_patch.stop()
+        super().tearDown()
+
+    def add_task(self, title: str, issue: str = None) -> None:
+        Create(title, 'd', 'medium', 'medium', issue, self.session).new_task()
+
+    def test_export_adds_the_issues_and_reports_failures_per_task(self):
+        self.add_task('first')
+        self.add_task('broken')
+        self.add_task('exported', 'ABC-99')
+        self.add_task('second')
+        Update(self.session).start_task('4')
+        exported, skipped, failures = self.bulk.export_tasks(['1', '2', '3', '4', '5'])
+        self.assertEqual(sorted(exported), ['1', '4'])
+        self.assertEqual(skipped, {'3': 'ABC-99'})
+        self.assertEqual(sorted(failures), ['2', '5'])
+        storage = open_storage(self.data_dir, 'work')
+        self.assertEqual(storage.get_task('1')['issue'], exported['1'])
+        self.assertIsNone(storage.get_task('2')['issue'])
+
+    def test_export_writes_the_list_once(self):
+        for number in range(10):
+            self.add_task(f'task {number}')
+        progress = MagicMock()
+        with patch('src.storage.JsonStorage.flush', autospec=True) as mock_flush:
+            exported, _, _ = self.bulk.export_tasks([str(number) for number in range(1, 11)], progress)
+            self.assertEqual(mock_flush.call_count, 1)
+        self.assertEqual(len(exported), 10)
+        self.assertEqual(progress.call_count, 10)
+
+    def test_load_adds_tasks_in_the_order_of_the_issues(self):
+        self.add_task('known', 'ABC-1')
+        loaded, skipped, failures = self.bulk.load_issues(['ABC-3', 'ABC-404', 'ABC-1', 'ABC-2'])
+        self.assertEqual(loaded, {'ABC-3': '2', 'ABC-2': '3'})
+        self.assertEqual(skipped, {'ABC-1': '1'})
+        self.assertEqual(list(failures), ['ABC-404'])
+        self.assertEqual(open_storage(self.data_dir, 'work').get_task('2')['title'], 'Title of ABC-3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+""" """
+import http.client
+import http.server
+import threading
+import time
+import unittest
+from src.jira_gateway import JiraGateway
+
+
+class StubJiraHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like Jira
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append(self.path)
+        status = 204
+        if self.path.startswith('/slow'):
+            time.sleep(self.server.delay)
+        if self.path.startswith('/flaky') and self.server.requests.count(self.path) <= self.server.failures:
+            status = 503
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubApi:
+    """ Makes the calls of simple_vira over one persistent connection to the stub server """
+    def __init__(self, port: int) -> None:
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    def _post(self, path: str) -> bool:
+        self.connection.request('POST', path, body=b'{}')
+        response = self.connection.getresponse()
+        response.read()
+        return response.status == 204
+
+    def transition_issue(self, issue, transition):
+        return self._post(f'/{issue}/transitions/{transition}')
+
+    def create_issue(self, title, *args):
+        return self._post(f'/{title}/create') and title
+
+    def assign_issue(self, issue, assignee):
+        return self._post(f'/{issue}/assignee/{assignee}')
+
+    def close(self):
+        self.connection.close()
+
+
+class TestJiraGateway(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubJiraHandler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.delay = 0.3
+        self.server.failures = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        port = self.server.server_address[1]
+        self.gateway = JiraGateway(api_factory=lambda: StubApi(port), timeout=2, retries=2, backoff=0.01, workers=4)
+
+    def tearDown(self) -> None:
+        self.gateway.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_calls_reuse_the_pooled_connection(self):
+        for _ in range(5):
+            self.assertTrue(self.gateway.call('transition_issue', 'ABC-1', '31'))
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_run_makes_independent_calls_at_the_same_time(self):
+        started = time.monotonic()
+        results = self.gateway.run(
+            ('assign_issue', 'slow-1', 'me'),
+            ('transition_issue', 'slow-1', '31')
+        )
+        self.assertEqual(results, [True, True])
+        self.assertLess(time.monotonic() - started, 2 * self.server.delay)
+
+    def test_failed_call_is_retried(self):
+        self.server.failures = 2
+        self.assertTrue(self.gateway.call('transition_issue', 'flaky-1', '31'))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_call_gives_up_after_the_last_retry(self):
+        self.server.failures = 10
+        self.assertFalse(self.gateway.call('transition_issue', 'flaky-1', '31'))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_call_that_times_out_returns_none(self):
+        self.gateway.timeout = 0.05
+        self.gateway.retries = 0
+        started = time.monotonic()
+        self.assertIsNone(self.gateway.call('transition_issue', 'slow-1', '31'))
+        self.assertLess(time.monotonic() - started, self.server.delay)
+
+    def test_create_that_times_out_is_not_sent_again(self):
+        """ The first create may still reach Jira, a retry would make a second issue """
+        self.gateway.timeout = 0.05
+        self.assertIsNone(self.gateway.call('create_issue', 'slow-1'))
+        self.assertIn('did not answer create_issue', self.gateway.last_error)
+        time.sleep(self.server.delay + 0.1)
+        self.assertEqual(self.server.requests, ['/slow-1/create'])
+
+    def test_failed_call_keeps_the_reason(self):
+        self.server.failures = 10
+        self.gateway.call('transition_issue', 'flaky-1', '31')
+        self.assertEqual(self.gateway.last_error, 'Jira could not transition issue')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+""" """
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.jira_gateway import JiraGateway
+from src.outbox import Outbox
+from src.storage import create_storage, open_storage
+
+
+class StubApi:
+    calls = []
+    down = False
+
+    def create_issue(self, title, *args):
+        StubApi.calls.append(('create_issue', title))
+        return None if StubApi.down else f'ABC-{len(StubApi.calls)}'
+
+    def transition_issue(self, issue, transition):
+        StubApi.calls.append(('transition_issue', issue, transition))
+        return not StubApi.down
+
+    def assign_issue(self, issue, assignee):
+        StubApi.calls.append(('assign_issue', issue, assignee))
+        return not StubApi.down
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        create_storage(self.data_dir, 'work')
+        storage = open_storage(self.data_dir, 'work')
+        storage.add_task('todo', '1', {'issue': None, 'title': 'first', 'description': 'd'})
+        storage.flush()
+        self.patches = [
+            patch('src.outbox.TODO_PATH', self.data_dir),
+            patch('src.outbox.LOCK_DIR', self.data_dir / 'locks'),
+        ]
+        for each in self.patches:
+            each.start()
+        StubApi.calls = []
+        StubApi.down = False
+        self.gateway = JiraGateway(api_factory=StubApi, retries=0)
+        locks = self.data_dir / 'locks'
+        self.outbox = Outbox(self.data_dir / 'outbox.json', locks / 'outbox.lock', locks / 'outbox_flush.lock')
+
+    def tearDown(self) -> None:
+        for each in self.patches:
+            each.stop()
+        self.tmp_dir.cleanup()
+
+    def test_later_call_with_the_same_key_replaces_the_queued_one(self):
+        self.outbox.add('transition_issue', ['21'], issue='ABC-1', task=['work', '1'], key=['status', 'work', '1'])
+        self.outbox.add('transition_issue', ['31'], issue='ABC-1', task=['work', '1'], key=['status', 'work', '1'])
+        self.assertEqual(self.outbox.flush(self.gateway), (1, []))
+        self.assertEqual(StubApi.calls, [('transition_issue', 'ABC-1', '31')])
+        self.assertTrue(self.outbox.is_empty())
+
+    def test_calls_for_a_task_wait_for_the_create_of_its_issue(self):
+        self.outbox.add('create_issue', ['first'], task=['work', '1'], key=['create', 'work', '1'])
+        self.assertTrue(self.outbox.has_pending_create(['work', '1']))
+        self.outbox.add('transition_issue', ['31'], task=['work', '1'], key=['status', 'work', '1'])
+        sent, left = self.outbox.flush(self.gateway)
+        self.assertEqual((sent, left), (2, []))
+        self.assertEqual(StubApi.calls[1], ('transition_issue', 'ABC-1', '31'))
+        self.assertEqual(self.outbox.created_issue(['work', '1']), 'ABC-1')
+
+        self.assertEqual(self.outbox.set_issues(), [['work', '1', 'ABC-1']])
+        self.assertEqual(open_storage(self.data_dir, 'work').get_task('1')['issue'], 'ABC-1')
+        self.assertFalse(self.outbox.has_pending_create(['work', '1']))
+        self.assertTrue(self.outbox.is_empty())
+
+    def test_failed_calls_stay_in_the_outbox(self):
+        StubApi.down = True
+        self.outbox.add('create_issue', ['first'], task=['work', '1'], key=['create', 'work', '1'])
+        self.outbox.add('assign_issue', ['me'], task=['work', '1'], key=['assign', 'work', '1'])
+        sent, left = self.outbox.flush(self.gateway)
+        self.assertEqual(sent, 0)
+        self.assertEqual([entry['attempts'] for entry in left], [1, 1])
+        self.assertEqual(len(StubApi.calls), 1)  # The assignment waits for the create
+
+        StubApi.down = False
+        self.assertEqual(self.outbox.flush(self.gateway)[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
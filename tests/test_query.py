@@ -0,0 +1,86 @@
+""" """
+import contextlib
+import heapq
+import io
+import json
+import unittest
+from unittest.mock import patch
+from src.query import Query
+from src.session import Session
+from src.task import Create, Read
+from src.task_record import Task
+from tests.helpers import AppDataTestCase
+
+
+SETTINGS = {
+    'priority': {'colors': {'low': 'green', 'medium': 'yellow', 'high': 'red', 'critical': 'red'}},
+    'size': {'colors': {'small': 'green', 'medium': 'yellow', 'large': 'red'}},
+}
+TASKS = [
+    ('1', Task(title='Write report', priority='high', size='small', create_date='2026-01-05')),
+    ('2', Task(title='Ship it', priority='critical', size='large', create_date='2025-12-24', done_date='2026-01-02')),
+    ('3', Task(title='Read mail', priority='low', size='small', create_date='2026-02-01')),
+    ('4', Task(title='Plan', priority='high', size='medium', create_date='2026-03-01')),
+]
+
+
+def ids(query: str, **options) -> list:
+    return [task_id for task_id, _ in Query(query, SETTINGS).select(TASKS, **options)]
+
+
+class TestQuery(unittest.TestCase):
+    def test_priority_is_compared_by_its_order(self):
+        self.assertEqual(ids('priority>=high'), ['1', '2', '4'])
+        self.assertEqual(ids('priority<high'), ['3'])
+
+    def test_conditions_with_and_and_or(self):
+        self.assertEqual(ids('priority>=high and created>2026-01-01'), ['1', '4'])
+        self.assertEqual(ids('priority>=high created>2026-01-01'), ['1', '4'])
+        self.assertEqual(ids('title~report or size=large and priority=critical'), ['1', '2'])
+
+    def test_dates_and_none(self):
+        self.assertEqual(ids('done!=none'), ['2'])
+        self.assertEqual(ids('done=none created<=2026-01-05'), ['1'])
+
+    def test_quoted_text(self):
+        self.assertEqual(ids('title="read MAIL"'), ['3'])
+
+    def test_sort_with_ties_by_id(self):
+        self.assertEqual(ids('sort:-priority,created'), ['2', '1', '4', '3'])
+        self.assertEqual(ids('sort:-title'), ['1', '2', '3', '4'])
+        self.assertEqual(ids('sort:done'), ['2', '1', '3', '4'])  # Not set is last
+
+    def test_limit_takes_the_first_of_the_sort(self):
+        self.assertEqual(ids('sort:created', offset=1, limit=2), ['1', '3'])
+        with patch('src.query.heapq.nsmallest', wraps=heapq.nsmallest) as nsmallest:
+            ids('sort:created', limit=2)
+        nsmallest.assert_called_once()
+
+    def test_invalid_queries(self):
+        for text in ('priority>=urgent', 'colour=red', 'title>b', 'created>yesterday', 'sort:', 'priority=high or', 'what'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                Query(text, SETTINGS)
+
+
+class TestReadWhere(AppDataTestCase):
+    def test_list_and_search_use_the_query(self):
+        session = Session()
+        for title, priority in (('low one', 'low'), ('high one', 'high'), ('high two', 'high')):
+            Create(title, 'd', priority, 'small', None, session).new_task()
+        read = Read(session)
+        where = Query('priority=high sort:-id', dict(self.settings, **SETTINGS))
+
+        def titles(method, *args, **kwargs):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                getattr(read, method)(*args, file_format='jsonl', where=where, **kwargs)
+            return [json.loads(line)['title'] for line in output.getvalue().splitlines()]
+
+        self.assertEqual(titles('tasks', 'todo'), ['high two', 'high one'])
+        self.assertEqual(titles('tasks', 'todo', limit=1), ['high two'])
+        self.assertEqual(titles('search_task', 'one'), ['high one'])
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+""" """
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.search_index import SearchIndex, tokenize
+from src.storage import create_storage, open_storage
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        create_storage(self.directory, 'work')
+        self.storage = open_storage(self.directory, 'work')
+        tasks = {
+            '1': {'title': 'Write report', 'description': 'Quarterly numbers', 'issue': None},
+            '2': {'title': 'Review', 'description': 'Read the report draft', 'issue': 'PRJ-12'},
+            '3': {'title': 'Reply to mail', 'description': 'About the offsite', 'issue': None},
+        }
+        for task_id, task in tasks.items():
+            self.storage.add_task('todo', task_id, task)
+        self.storage.flush()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Fix PRJ-12, now!'), ['fix', 'prj', '12', 'now'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_title_match_outweighs_description_match(self):
+        """ A word in the title weighs more than the same word in the description """
+        index = SearchIndex(self.storage)
+        self.assertEqual(index.search('report'), ['1', '2'])
+
+    def test_prefix_and_every_word(self):
+        """ Words match the start of tokens and every word has to match """
+        index = SearchIndex(self.storage)
+        # Task 2 has "re" once in its title and twice in its description, which weighs more than once in a title
+        self.assertEqual(index.search('re'), ['2', '1', '3'])
+        self.assertEqual(index.search('re draft'), ['2'])
+        self.assertEqual(index.search('re', limit=2), ['2', '1'])
+        self.assertEqual(index.search('prj'), ['2'])
+
+    def test_changes_are_kept_between_sessions(self):
+        """ Flushed changes are found by a new index, which does not build the index again """
+        index = SearchIndex(self.storage)
+        index.search('anything')  # Builds and stores the index
+        index.add('1', {'title': 'Budget', 'description': '', 'issue': None})
+        index.remove('3')
+        index.flush()
+
+        index = SearchIndex(self.storage)
+        with patch.object(self.storage, 'all_tasks') as mock_all_tasks:
+            self.assertEqual(index.search('budget'), ['1'])
+            self.assertEqual(index.search('reply'), [])
+            mock_all_tasks.assert_not_called()
+
+    def test_changes_are_found_before_the_flush(self):
+        """ The changes in memory replace what the index has stored for their tasks """
+        index = SearchIndex(self.storage)
+        index.search('anything')
+        index.add('1', {'title': 'Budget', 'description': '', 'issue': None})
+        index.remove('2')
+        self.assertEqual(index.search('budget'), ['1'])
+        self.assertEqual(index.search('report'), [])
@@ -0,0 +1,46 @@
+""" """
+import unittest
+from unittest.mock import patch
+from cli import check
+from src.server import Server
+from src.storage import create_storage
+from tests.helpers import AppDataTestCase
+
+
+class TestServer(AppDataTestCase):
+    settings = dict(AppDataTestCase.settings, lists={'active': 'work', 'inactive': ['home']})
+
+    def setUp(self) -> None:
+        super().setUp()
+        create_storage(self.data_dir, 'home')
+        lock_dir = self.data_dir / 'locks'
+        self.patches += [
+            patch('src.settings_handler.SETTINGS_PATH', self.settings_path),
+            patch('src.settings_handler.SETTINGS_LOCK_PATH', lock_dir / 'todo_settings.lock'),
+            patch('src.setup_data.Files.is_setup_complete', return_value=True),
+        ]
+        for each in self.patches[-3:]:
+            each.start()
+        self.server = Server(self.data_dir / 'check.sock', check)
+
+    def tearDown(self) -> None:
+        self.server.server_close()
+        super().tearDown()
+
+    def run_command(self, *args) -> dict:
+        return self.server.run_command({'args': list(args)})
+
+    def test_commands_after_use_see_the_new_list(self):
+        """ 'todo use' writes the settings itself, the next command must not use the old list """
+        self.run_command('add', '-t', 'work task', '-ds', 'd')
+        self.assertEqual(self.run_command('todo', 'use', '-n', 'home')['exit_code'], 0)
+        self.run_command('add', '-t', 'home task', '-ds', 'd')
+
+        output = self.run_command('list', '-a', '--format', 'plain')['output']
+        self.assertIn('home task', output)
+        self.assertNotIn('work task', output)
+        self.assertEqual(self.server.session.active_list_name, 'home')
+
+
+if __name__ == '__main__':
+    unittest.main()
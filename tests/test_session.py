@@ -0,0 +1,126 @@
+""" """
+import json
+import multiprocessing
+import os
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.file_handler import FileLock
+from src.session import Session
+from src.settings_handler import Todo
+from src.task import Create, Update
+from src.storage import ENGINES, create_storage, open_storage
+from tests.helpers import AppDataTestCase
+
+
+class TestSession(AppDataTestCase):
+    def test_list_is_read_once_and_written_on_flush(self):
+        """ Several operations in one session only read and write the list once """
+        session = Session(autoflush=False)
+        read_json = lambda path, object_hook=None: json.loads(Path(path).read_text(), object_hook=object_hook)
+        with patch('src.session.JsonFile.read', side_effect=read_json) as mock_read:
+            Create('title', 'description', 'medium', 'medium', None, session).new_task()
+            Update(session).start_task('1')
+            Update(session).change_task('1', title='changed')
+            self.assertEqual(mock_read.call_count, 2)  # Settings and the active list
+
+        self.assertEqual(open_storage(self.data_dir, 'work').get_id_count(), 0)
+
+        session.flush()
+        on_disk = open_storage(self.data_dir, 'work')
+        self.assertEqual(on_disk.get_task('1')['title'], 'changed')
+
+    def test_autoflush_writes_right_away(self):
+        """ A session with autoflush writes every change directly """
+        session = Session()
+        Create('title', 'description', 'medium', 'medium', None, session).new_task()
+        on_disk = open_storage(self.data_dir, 'work')
+        self.assertEqual(on_disk.find_category('1'), 'todo')
+
+    def test_refresh_reloads_files_changed_elsewhere(self):
+        """ A long lived session sees changes that another process wrote """
+        session = Session(autoflush=False)
+        self.assertEqual(session.storage.get_id_count(), 0)
+
+        other = Session()
+        Create('title', 'description', 'medium', 'medium', None, other).new_task()
+
+        session.refresh()
+        self.assertEqual(session.storage.get_id_count(), 1)
+
+    @unittest.skipIf(os.name == 'nt', 'Needs fork to share the patched paths with the child processes')
+    def test_parallel_writers_do_not_lose_tasks(self):
+        """ Sessions in different processes take turns instead of overwriting each other """
+        def add_tasks():
+            for _ in range(20):
+                Create('title', 'description', 'medium', 'medium', None, Session()).new_task()
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=add_tasks) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        storage = open_storage(self.data_dir, 'work')
+        self.assertEqual(storage.get_id_count(), 80)
+        self.assertEqual(len(storage.tasks('todo')), 80)
+
+    def test_reading_does_not_wait_for_the_lock(self):
+        """ Only flush locks the list, a command that only reads never waits for a writer """
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            with FileLock(self.data_dir / 'locks' / 'work.lock'):
+                held.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        held.wait()
+        try:
+            session = Session(autoflush=False)
+            self.assertEqual(session.storage.get_id_count(), 0)
+        finally:
+            release.set()
+            thread.join()
+
+    def test_interleaved_writers_keep_both_tasks(self):
+        """ A writer that read an older version makes its changes again on top of the new one """
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                for path in self.data_dir.glob('work.*'):
+                    path.unlink()
+                create_storage(self.data_dir, 'work', engine_name)
+                second = Session(autoflush=False)
+                self.assertEqual(second.storage.get_id_count(), 0)
+                first = Session(autoflush=False)
+                Create('first', 'description', 'medium', 'medium', None, first).new_task()
+                first.close()
+                task_id = Create('second', 'description', 'medium', 'medium', None, second).new_task()
+                second.flush()
+
+                self.assertEqual(second.new_id(task_id), '2')
+                storage = open_storage(self.data_dir, 'work')
+                self.assertEqual(storage.get_id_count(), 2)
+                self.assertEqual(storage.get_task('1')['title'], 'first')
+                self.assertEqual(storage.get_task('2')['title'], 'second')
+                self.assertEqual(second.search_index.search('second'), ['2'])
+                second.close()
+                storage.close()
+
+    def test_settings_changes_are_merged(self):
+        """ Saving the settings keeps what another process changed in between """
+        session = Session(autoflush=False)
+        session.settings['priority']['colors']['low'] = 'blue'
+        session.save_settings()
+        with patch('src.settings_handler.SETTINGS_PATH', self.settings_path), \
+                patch('src.settings_handler.SETTINGS_LOCK_PATH', self.data_dir / 'locks' / 'todo_settings.lock'):
+            Todo.create_todo_list('home')
+        session.flush()
+
+        settings = json.loads(self.settings_path.read_text())
+        self.assertEqual(settings['priority']['colors']['low'], 'blue')
+        self.assertEqual(settings['lists']['inactive'], ['home'])
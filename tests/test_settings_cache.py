@@ -0,0 +1,42 @@
+""" """
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.file_handler import JsonFile
+from src.settings_cache import SettingsCache
+
+
+class TestSettingsCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'todo_settings.json'
+        self.write({'lists': {'active': 'work', 'inactive': ['home']}, 'priority': {'colors': {'low': 'green'}}})
+        self.cache = SettingsCache()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write(self, settings: dict) -> None:
+        self.path.write_text(json.dumps(settings))
+
+    def test_file_is_read_once(self):
+        with patch('src.settings_cache.JsonFile.read', wraps=JsonFile.read) as read:
+            for _ in range(3):
+                self.assertEqual(self.cache.get(self.path)['lists']['active'], 'work')
+                self.assertIn('low', self.cache.options(self.path, 'priority'))
+            self.assertEqual(read.call_count, 1)
+
+    def test_changed_file_is_read_again(self):
+        self.assertEqual(self.cache.list_names(self.path), {'work', 'home'})
+        self.write({'lists': {'active': 'work', 'inactive': ['home', 'garden']}, 'priority': {'colors': {}}})
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))  # Also when the clock did not move
+        self.assertEqual(self.cache.list_names(self.path), {'work', 'home', 'garden'})
+        self.assertEqual(self.cache.options(self.path, 'priority'), frozenset())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+""" """
+import unittest
+from unittest.mock import patch
+from src.session import Session
+from src.setup_data import Files
+from tests.helpers import AppDataTestCase
+
+
+class TestSetupMarker(AppDataTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.marker_path = self.data_dir / '.setup_complete'
+        self.patches += [
+            patch('src.setup_data.SETUP_MARKER_PATH', self.marker_path),
+            patch('src.setup_data.TODO_PATH', self.data_dir),
+        ]
+        for each in self.patches[-2:]:
+            each.start()
+
+    def test_setup_is_complete_after_marking(self):
+        """ The marker is only valid for the version that wrote it """
+        self.assertFalse(Files.is_setup_complete(Session()))
+        Files.mark_setup_complete()
+        self.assertTrue(Files.is_setup_complete(Session()))
+        self.marker_path.write_text('0.0.1')
+        self.assertFalse(Files.is_setup_complete(Session()))
+
+    def test_setup_runs_again_when_the_data_was_removed(self):
+        """ A removed list or settings file is created again instead of failing every command """
+        Files.mark_setup_complete()
+        (self.data_dir / 'work.json').unlink()
+        self.assertFalse(Files.is_setup_complete(Session()))
+        self.settings_path.unlink()
+        self.assertFalse(Files.is_setup_complete(Session()))
@@ -0,0 +1,166 @@
+""" """
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.storage import SqliteStorage, create_storage, migrate, open_storage
+
+
+class StorageTests:
+    """ The same tests are run against every storage engine """
+    engine_name = None
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        create_storage(self.directory, 'work', self.engine_name)
+        self.storage = open_storage(self.directory, 'work')
+
+    def tearDown(self) -> None:
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def _task(self, title: str) -> dict:
+        return {
+            'issue': None,
+            'title': title,
+            'description': 'description',
+            'priority': 'medium',
+            'size': 'small',
+            'create_date': '2024-01-01',
+            'done_date': None,
+            'is_done': 'no',
+        }
+
+    def test_add_move_update_delete(self):
+        """ Task operations are kept after a flush and a reopen """
+        self.storage.add_task('todo', '1', self._task('first'))
+        self.storage.add_task('todo', '2', self._task('second'))
+        self.storage.set_id_count(2)
+        self.storage.move_task('1', 'active')
+        self.storage.update_task('1', title='changed')
+        self.storage.delete_task('2')
+        self.storage.flush()
+        self.storage.close()
+
+        storage = open_storage(self.directory, 'work')
+        self.assertEqual(storage.get_id_count(), 2)
+        self.assertEqual(storage.find_category('1'), 'active')
+        self.assertEqual(storage.get_task('1')['title'], 'changed')
+        self.assertIsNone(storage.get_task('2'))
+        self.assertEqual(storage.tasks('todo'), {})
+        storage.close()
+
+    def test_find_category_follows_changes(self):
+        """ The category of a task is up to date after every change """
+        self.storage.add_task('todo', '1', self._task('first'))
+        self.assertEqual(self.storage.find_category('1'), 'todo')
+        self.storage.move_task('1', 'done')
+        self.assertEqual(self.storage.find_category('1'), 'done')
+        self.storage.add_task('active', '1', self._task('again'))
+        self.assertEqual(self.storage.find_category('1'), 'active')
+        self.assertEqual(self.storage.tasks('done'), {})
+        self.storage.delete_task('1')
+        self.assertIsNone(self.storage.find_category('1'))
+
+    def test_iter_tasks_slice(self):
+        """ Only the requested slice of a category is returned, in list order """
+        for task_id in range(1, 6):
+            self.storage.add_task('todo', str(task_id), self._task(f'task {task_id}'))
+        self.assertEqual([task_id for task_id, _ in self.storage.iter_tasks('todo', 1, 2)], ['2', '3'])
+        self.assertEqual([task_id for task_id, _ in self.storage.iter_tasks('todo', 3)], ['4', '5'])
+
+    def test_unknown_fields_are_kept(self):
+        """ Fields that are not columns in the database are stored too """
+        task = self._task('first')
+        task['custom'] = 'value'
+        self.storage.add_task('todo', '1', task)
+        self.assertEqual(self.storage.get_task('1')['custom'], 'value')
+
+
+class TestJsonStorage(StorageTests, unittest.TestCase):
+    engine_name = 'json'
+
+
+class TestSqliteStorage(StorageTests, unittest.TestCase):
+    engine_name = 'sqlite'
+
+
+class TestJsonJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        create_storage(self.directory, 'work', 'json')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_changes_are_appended_to_the_journal(self):
+        """ A flush below the threshold leaves the snapshot alone """
+        snapshot = (self.directory / 'work.json').read_text()
+        storage = open_storage(self.directory, 'work')
+        storage.add_task('todo', '1', {'title': 'first'})
+        storage.move_task('1', 'done')
+        storage.flush()
+
+        self.assertEqual((self.directory / 'work.json').read_text(), snapshot)
+        self.assertTrue((self.directory / 'work.journal').exists())
+        self.assertEqual(open_storage(self.directory, 'work').find_category('1'), 'done')
+
+    def test_journal_is_compacted_past_the_threshold(self):
+        """ The journal is folded into the snapshot once it is too big """
+        settings = {'storage': {'compact_threshold': 1}}
+        storage = open_storage(self.directory, 'work', settings)
+        storage.add_task('todo', '1', {'title': 'first'})
+        storage.flush()
+        storage.update_task('1', title='changed')
+        storage.flush()
+
+        self.assertFalse((self.directory / 'work.journal').exists())
+        self.assertEqual(open_storage(self.directory, 'work').get_task('1')['title'], 'changed')
+
+    def test_half_written_record_is_skipped(self):
+        """ A record that was cut off in a crash does not break the list """
+        storage = open_storage(self.directory, 'work')
+        storage.add_task('todo', '1', {'title': 'first'})
+        storage.flush()
+        with open(self.directory / 'work.journal', 'a', encoding='utf-8') as file:
+            file.write('["delete","1"')
+
+        self.assertEqual(open_storage(self.directory, 'work').find_category('1'), 'todo')
+
+    def test_records_after_a_half_written_record_are_kept(self):
+        """ The next flush does not append its records to the line that was cut off """
+        storage = open_storage(self.directory, 'work')
+        storage.add_task('todo', '1', {'title': 'first'})
+        storage.flush()
+        with open(self.directory / 'work.journal', 'a', encoding='utf-8') as file:
+            file.write('["delete","1"')
+
+        storage = open_storage(self.directory, 'work')
+        storage.add_task('todo', '2', {'title': 'second'})
+        storage.flush()
+
+        storage = open_storage(self.directory, 'work')
+        self.assertEqual(storage.find_category('1'), 'todo')
+        self.assertEqual(storage.find_category('2'), 'todo')
+
+
+class TestMigrate(unittest.TestCase):
+    def test_json_to_sqlite(self):
+        """ All tasks and the id count are imported into SQLite """
+        with tempfile.TemporaryDirectory() as tmp_dir, patch('src.storage.DELETED_DIR', Path(tmp_dir) / 'deleted'):
+            create_storage(tmp_dir, 'work', 'json')
+            storage = open_storage(tmp_dir, 'work')
+            storage.add_task('done', '4', {'title': 'old', 'is_done': 'yes'})
+            storage.set_id_count(4)
+            storage.flush()
+
+            migrate(tmp_dir, 'work', 'sqlite')
+
+            storage = open_storage(tmp_dir, 'work')
+            self.assertIsInstance(storage, SqliteStorage)
+            self.assertEqual(storage.get_id_count(), 4)
+            self.assertEqual(storage.get_task('4')['title'], 'old')
+            storage.close()
+            self.assertTrue((Path(tmp_dir) / 'deleted' / 'work.json').exists())
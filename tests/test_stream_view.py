@@ -0,0 +1,64 @@
+""" """
+import csv
+import io
+import json
+import unittest
+
+from src.stream_view import StreamDisplay
+
+
+ROWS = [
+    ('todo', '1', {'issue': None, 'title': 'Write, report', 'description': 'a', 'priority': 'high', 'size': 'small',
+                   'create_date': '2026-01-01', 'done_date': None, 'is_done': 'no'}),
+    ('done', '2', {'issue': 'ABC-1', 'title': 'Ship', 'description': 'b', 'priority': 'low', 'size': 'large',
+                   'create_date': '2026-01-02', 'done_date': '2026-01-03', 'is_done': 'yes'}),
+]
+
+
+class TestStreamDisplay(unittest.TestCase):
+    def write(self, file_format: str) -> str:
+        stream = io.StringIO()
+        StreamDisplay(file_format, stream).tasks(iter(ROWS))
+        return stream.getvalue()
+
+    def test_json_is_one_array(self):
+        records = json.loads(self.write('json'))
+        self.assertEqual([record['id'] for record in records], ['1', '2'])
+        self.assertEqual(records[1]['category'], 'done')
+
+    def test_json_without_tasks_is_an_empty_array(self):
+        stream = io.StringIO()
+        StreamDisplay('json', stream).tasks([])
+        self.assertEqual(json.loads(stream.getvalue()), [])
+
+    def test_jsonl_is_one_object_per_line(self):
+        lines = self.write('jsonl').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['title'], 'Write, report')
+
+    def test_csv_quotes_values_and_has_a_header(self):
+        rows = list(csv.DictReader(io.StringIO(self.write('csv'))))
+        self.assertEqual(rows[0]['title'], 'Write, report')
+        self.assertEqual(rows[1]['issue'], 'ABC-1')
+
+    def test_tsv_uses_tabs(self):
+        header = self.write('tsv').splitlines()[0]
+        self.assertEqual(header.split('\t')[:3], ['id', 'category', 'issue'])
+
+    def test_plain_has_a_title_per_category(self):
+        output = self.write('plain')
+        self.assertIn('TODO\n', output)
+        self.assertIn('DONE\n', output)
+
+    def test_plain_with_a_title_has_a_header_without_tasks(self):
+        stream = io.StringIO()
+        StreamDisplay('plain', stream).tasks([], 'ACTIVE')
+        self.assertEqual(stream.getvalue().splitlines()[0], 'ACTIVE')
+        self.assertTrue(stream.getvalue().splitlines()[1].startswith('ID'))
+
+    def test_plain_shows_missing_values_as_empty(self):
+        self.assertNotIn('None', self.write('plain'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+""" """
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+from src.jira_gateway import JiraGateway
+from src.outbox import Outbox
+from src.session import Session
+from src.storage import open_storage
+from src.sync import JiraSync, merge_fields
+from src.task import Create, Update
+from tests.helpers import AppDataTestCase
+
+
+TRANSITIONS = {'11': 'new', '21': 'indeterminate'}
+
+
+class StubApi:
+    """ Jira with issues that can be changed by the tests, and a log of the calls """
+    issues = {}
+    updated = set()
+    calls = []
+
+    def search_issues(self, jql):
+        StubApi.calls.append(('search_issues', jql))
+        return [{'key': issue} for issue in sorted(StubApi.updated)]
+
+    def get_complete_issue_data(self, issue):
+        StubApi.calls.append(('get_complete_issue_data', issue))
+        if issue not in StubApi.issues:
+            return None
+        fields = StubApi.issues[issue]
+        return {'key': issue, 'fields': {
+            'summary': fields['title'],
+            'description': fields['description'],
+            'status': {'statusCategory': {'key': fields['status']}},
+        }}
+
+    def get_issue_title(self, issue_dict):
+        return issue_dict['fields']['summary']
+
+    def get_issue_description(self, issue_dict):
+        return issue_dict['fields']['description']
+
+    def update_issue(self, issue, title, description):
+        StubApi.calls.append(('update_issue', issue))
+        StubApi.issues[issue].update(title=title, description=description)
+        return True
+
+    def transition_issue(self, issue, transition):
+        StubApi.calls.append(('transition_issue', issue))
+        StubApi.issues[issue]['status'] = TRANSITIONS[transition]
+        return True
+
+    def move_issue_to_done(self, issue, transition):
+        StubApi.calls.append(('move_issue_to_done', issue))
+        StubApi.issues[issue]['status'] = 'done'
+        return True
+
+
+class TestJiraSync(AppDataTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        StubApi.issues = {}
+        StubApi.updated = set()
+        StubApi.calls = []
+        gateway = JiraGateway(api_factory=StubApi, retries=0)
+        self.patches.append(patch('src.jira_gateway.JiraGateway', lambda: gateway))
+        self.patches.append(patch('src.sync.LOCK_DIR', self.data_dir / 'locks'))
+        for each in self.patches[-2:]:
+            each.start()
+        self.config = MagicMock()
+        self.config.get_transition_todo.return_value = '11'
+        self.config.get_transition_in_progress.return_value = '21'
+        self.outbox = Outbox(self.data_dir / 'outbox.json', self.data_dir / 'outbox.lock', self.data_dir / 'flush.lock')
+        self.session = Session()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        super().tearDown()
+
+    def add_linked_task(self, title: str, issue: str) -> None:
+        Create(title, 'd', 'medium', 'medium', issue, self.session).new_task()
+        StubApi.issues[issue] = {'title': title, 'description': 'd', 'status': 'new'}
+
+    def sync(self, prefer: str = 'jira') -> tuple:
+        StubApi.calls = []
+        result = JiraSync(self.session, self.config, prefer, self.outbox).run()
+        StubApi.updated = set()
+        return result
+
+    def loaded_issues(self) -> list:
+        return [args for method, args in StubApi.calls if method == 'get_complete_issue_data']
+
+    def test_only_changed_tasks_and_updated_issues_are_loaded(self):
+        for number in range(1, 6):
+            self.add_linked_task(f'task {number}', f'ABC-{number}')
+        self.sync()
+        self.assertEqual(len(self.loaded_issues()), 5)  # The first sync loads every issue
+
+        self.assertEqual(self.sync(), ({}, {}, {}, {}))
+        self.assertEqual(self.loaded_issues(), [])
+
+        Update(self.session).change_task('2', title='changed in check')
+        StubApi.issues['ABC-4']['title'] = 'changed in Jira'
+        StubApi.updated.add('ABC-4')
+        pulled, pushed, conflicts, failures = self.sync()
+        self.assertEqual(sorted(self.loaded_issues()), ['ABC-2', 'ABC-4'])
+        self.assertEqual(pulled, {'4': ['title']})
+        self.assertEqual(pushed, {'2': ['title']})
+        self.assertEqual((conflicts, failures), ({}, {}))
+        self.assertEqual(StubApi.issues['ABC-2']['title'], 'changed in check')
+        self.assertEqual(open_storage(self.data_dir, 'work').get_task('4')['title'], 'changed in Jira')
+
+    def test_status_is_synced_both_ways(self):
+        self.add_linked_task('first', 'ABC-1')
+        self.add_linked_task('second', 'ABC-2')
+        self.sync()
+        Update(self.session).start_task('1')
+        StubApi.issues['ABC-2']['status'] = 'done'
+        StubApi.updated.add('ABC-2')
+        pulled, pushed, _, _ = self.sync()
+        self.assertEqual(pushed, {'1': ['category']})
+        self.assertEqual(pulled, {'2': ['category']})
+        self.assertEqual(StubApi.issues['ABC-1']['status'], 'indeterminate')
+        storage = open_storage(self.data_dir, 'work')
+        self.assertEqual(storage.find_category('2'), 'done')
+        self.assertEqual(storage.get_task('2')['is_done'], 'yes')
+
+    def test_conflicts_are_won_by_the_preferred_side(self):
+        for prefer, expected in (('jira', 'from Jira'), ('local', 'from check')):
+            with self.subTest(prefer=prefer):
+                self.add_linked_task('title', f'ABC-{prefer}')
+                task_id = str(self.session.storage.get_id_count())
+                self.sync()
+                Update(self.session).change_task(task_id, title='from check')
+                StubApi.issues[f'ABC-{prefer}']['title'] = 'from Jira'
+                StubApi.updated.add(f'ABC-{prefer}')
+                _, _, conflicts, _ = self.sync(prefer)
+                self.assertEqual(conflicts, {task_id: ['title']})
+                self.assertEqual(self.session.storage.get_task(task_id)['title'], expected)
+                self.assertEqual(StubApi.issues[f'ABC-{prefer}']['title'], expected)
+
+    def test_failed_tasks_are_tried_again_by_the_next_sync(self):
+        self.add_linked_task('first', 'ABC-1')
+        self.sync()
+        StubApi.issues['ABC-1']['title'] = 'changed in Jira'
+        StubApi.updated.add('ABC-1')
+        issue = StubApi.issues.pop('ABC-1')
+        _, _, _, failures = self.sync()
+        self.assertEqual(list(failures), ['1'])
+        StubApi.issues['ABC-1'] = issue
+        pulled, _, _, failures = self.sync()  # Not in the search any more, but still synced
+        self.assertEqual(pulled, {'1': ['title']})
+        self.assertEqual(failures, {})
+
+    def test_tasks_with_calls_in_the_outbox_wait_for_them(self):
+        self.add_linked_task('first', 'ABC-1')
+        self.sync()
+        Update(self.session).start_task('1')
+        self.outbox.add('transition_issue', ['21'], issue='ABC-1', task=['work', '1'])
+        _, pushed, _, failures = self.sync()
+        self.assertEqual(pushed, {})
+        self.assertIn('in the outbox', failures['1'])
+        self.assertEqual(self.loaded_issues(), [])
+
+    def test_state_keeps_the_revision_and_the_cursor(self):
+        self.add_linked_task('first', 'ABC-1')
+        self.sync()
+        Update(self.session).change_task('1', title='second')
+        self.sync()
+        state = json.loads((self.data_dir / 'work.sync.json').read_text())
+        self.assertEqual(state['tasks']['1']['revision'], 2)
+        self.assertEqual(state['tasks']['1']['fields']['title'], 'second')
+        self.assertIsNotNone(state['cursor'])
+        self.sync()
+        self.assertIn(f'updated >= "{state["cursor"]}"', StubApi.calls[0][1])
+
+
+class TestMergeFields(unittest.TestCase):
+    base = {'title': 'a', 'description': 'd', 'category': 'todo'}
+
+    def test_changes_of_both_sides_are_kept(self):
+        merged, conflicts = merge_fields(self.base, dict(self.base, title='b'), dict(self.base, category='done'), 'jira')
+        self.assertEqual(merged, {'title': 'b', 'description': 'd', 'category': 'done'})
+        self.assertEqual(conflicts, [])
+
+    def test_unknown_status_in_jira_keeps_the_category(self):
+        merged, conflicts = merge_fields(self.base, dict(self.base, category='active'), dict(self.base, category=None), 'jira')
+        self.assertEqual(merged['category'], 'active')
+        self.assertEqual(conflicts, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
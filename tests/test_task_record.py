@@ -0,0 +1,59 @@
+""" """
+import datetime
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from src.storage import JsonStorage, SqliteStorage
+from src.task_record import Task
+
+
+TASK = {
+    'issue': None,
+    'title': 'title',
+    'description': 'description',
+    'priority': 'medium',
+    'size': 'small',
+    'create_date': '2026-01-31',
+    'done_date': None,
+    'is_done': 'no',
+}
+
+
+class TestTask(unittest.TestCase):
+    def test_json_form_is_kept(self):
+        task = Task.from_json(dict(TASK, color='blue'))
+        self.assertEqual(task.to_json(), dict(TASK, color='blue'))
+        self.assertEqual(dict(task), dict(TASK, color='blue'))
+        self.assertEqual(task['create_date'], '2026-01-31')
+        self.assertEqual(task.create_date, datetime.date(2026, 1, 31))
+
+    def test_tasks_share_their_codes_and_dates(self):
+        first = Task.from_json(json.loads(json.dumps(TASK)))
+        second = Task.from_json(json.loads(json.dumps(TASK)))
+        self.assertIs(first.priority, second.priority)
+        self.assertIs(first.create_date, second.create_date)
+        self.assertFalse(hasattr(first, '__dict__'))
+
+    def test_update_takes_the_json_form(self):
+        task = Task.from_json(TASK)
+        task.update(done_date='2026-02-01', is_done='yes')
+        self.assertEqual(task.done_date, datetime.date(2026, 2, 1))
+        self.assertEqual(task['done_date'], '2026-02-01')
+
+    def test_storage_engines_return_tasks(self):
+        for engine in (JsonStorage, SqliteStorage):
+            with self.subTest(engine=engine.__name__), tempfile.TemporaryDirectory() as tmp_dir:
+                path = Path(tmp_dir) / ('work' + engine.suffix)
+                engine.create(path)
+                storage = engine(path)
+                storage.add_task('todo', '1', Task.from_json(TASK))
+                storage.compact()
+                storage.close()
+                task = engine(path).get_task('1')
+                self.assertIsInstance(task, Task)
+                self.assertEqual(task, TASK)
+
+
+if __name__ == '__main__':
+    unittest.main()
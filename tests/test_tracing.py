@@ -0,0 +1,50 @@
+""" """
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src import tracing
+
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self) -> None:
+        tracing._tracer = None
+
+    def test_spans_are_free_when_tracing_is_off(self):
+        with patch.dict(os.environ, {tracing.TRACE_ENVIRONMENT_VARIABLE: ''}):
+            self.assertFalse(tracing.start())
+        self.assertIs(tracing.span('list load'), tracing.span('write'))
+
+    def test_summary_nests_and_adds_up_spans(self):
+        tracer = tracing.Tracer()
+        with tracer.span('command list'):
+            with tracer.span('list load'):
+                pass
+            with tracer.span('list load'):
+                pass
+        lines = tracer.summary().splitlines()
+        self.assertTrue(lines[1].startswith('  command list'))
+        self.assertTrue(lines[2].startswith('    list load'))
+        self.assertTrue(lines[2].endswith('(2x)'))
+
+    def test_trace_file_has_complete_events(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'trace.json'
+            with patch.dict(os.environ, {tracing.TRACE_ENVIRONMENT_VARIABLE: str(path)}):
+                self.assertTrue(tracing.start())
+            with tracing.span('jira assign_issue', attempt=1):
+                pass
+            tracer = tracing._tracer
+            tracing._tracer = None
+            tracer.finish(io.StringIO())
+            events = json.loads(path.read_text())['traceEvents']
+        event = next(event for event in events if event['name'] == 'jira assign_issue')
+        self.assertEqual((event['ph'], event['args']), ('X', {'attempt': 1}))
+        self.assertGreaterEqual(event['dur'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,46 +1,63 @@
 """ """
+import json
+import tempfile
 import unittest
-from unittest.mock import patch, mock_open
+from pathlib import Path
+from unittest.mock import patch
 from src.validate import Priority, Size
 from src.constants import CURRENT_DATE
 
 
-class TestPriority(unittest.TestCase):
-
-    @patch('src.validate.JsonFile.read')
-    def test_is_valid_option(self, mock_read):
-        """ Test that the is_valid_option returns True if the option is valid """
-        mock_read.return_value = {
-            "priority": {
-                "colors": {
-                    "low": "green",
-                    "medium": "yellow",
-                    "high": "red",
-                    "critical": "red"
-                }
+class SettingsFileTestCase(unittest.TestCase):
+    settings = {
+        "priority": {
+            "colors": {
+                "low": "green",
+                "medium": "yellow",
+                "high": "red",
+                "critical": "red"
+            }
+        },
+        "size": {
+            "colors": {
+                "small": "green",
+                "medium": "yellow",
+                "large": "red"
             }
         }
+    }
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        settings_path = Path(self.tmp_dir.name) / 'todo_settings.json'
+        settings_path.write_text(json.dumps(self.settings))
+        self.patch = patch('src.validate.SETTINGS_PATH', settings_path)
+        self.patch.start()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        self.tmp_dir.cleanup()
+
+
+class TestPriority(SettingsFileTestCase):
+
+    def test_is_valid_option(self):
+        """ Test that the is_valid_option returns True if the option is valid """
         self.assertTrue(Priority.is_valid_option('low'))
         self.assertTrue(Priority.is_valid_option('medium'))
         self.assertTrue(Priority.is_valid_option('high'))
         self.assertTrue(Priority.is_valid_option('critical'))
+        self.assertFalse(Priority.is_valid_option('urgent'))
 
+    def test_is_valid_option_with_settings(self):
+        self.assertFalse(Priority.is_valid_option('critical', {'priority': {'colors': {'low': 'green'}}}))
 
-class TestSize(unittest.TestCase):
 
-    @patch('src.validate.JsonFile.read')
-    def test_is_valid_option(self, mock_read):
+class TestSize(SettingsFileTestCase):
+
+    def test_is_valid_option(self):
         """ Test that the is_valid_option returns True if the option is valid """
-        with patch('src.validate.JsonFile.read') as mock_read:
-            mock_read.return_value = {
-                "size": {
-                    "colors": {
-                        "small": "green",
-                        "medium": "yellow",
-                        "large": "red"
-                    }
-                }
-            }
-            self.assertTrue(Size.is_valid_option('small'))
-            self.assertTrue(Size.is_valid_option('medium'))
-            self.assertTrue(Size.is_valid_option('large'))
\ No newline at end of file
+        self.assertTrue(Size.is_valid_option('small'))
+        self.assertTrue(Size.is_valid_option('medium'))
+        self.assertTrue(Size.is_valid_option('large'))
+        self.assertFalse(Size.is_valid_option('huge'))